@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+API HTTP local para ingestão de contracheques
+
+Endpoints:
+    POST /documentos?arquivo=<nome>      corpo = bytes do PDF/imagem -> 202 {"id": ...}
+    GET  /documentos/<id>                status do processamento
+    GET  /documentos/<id>/resultado      dados extraídos e validação
+    GET  /contracheques?periodo=&nome=   consulta ao banco
+    GET  /saude                          estado da fila
+
+O OCR roda em processos isolados (OCRSandbox), com tempo limite por documento
+e por página; a fila é limitada e responde 429 quando cheia.
+
+Cada upload é copiado para API_CONFIG["spool_folder"] e acompanhado pelo
+manifesto de ingestão (IngestionManifest): ao reiniciar, os arquivos não
+concluídos voltam para a fila a partir da última etapa registrada, e um
+arquivo já salvo é respondido na hora com o id existente.
+
+Uso:
+    python api.py [--host 127.0.0.1] [--port 8502] [--workers N]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+
+# Adicionar diretório atual ao path para imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import API_CONFIG, create_required_folders
+
+SUPPORTED_EXTENSIONS = ['.pdf', '.png', '.jpg', '.jpeg', '.tif', '.tiff']
+
+HTTP_STATUS = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error"
+}
+
+class IngestionAPI:
+    """Servidor HTTP assíncrono com fila limitada de documentos"""
+    
+    def __init__(self, ocr_workers=None, queue_size=None):
+        from utils import DataExtractor, IngestionManifest, TemplateRegistry, create_database
+        
+        self.database = create_database()
+        self.manifest = IngestionManifest(self.database)
+        self.template_registry = TemplateRegistry(self.database)
+        self.data_extractor = DataExtractor()
+        self.ocr_workers = ocr_workers or API_CONFIG["ocr_workers"]
+        self.queue_size = queue_size or API_CONFIG["queue_size"]
+        self.max_upload = API_CONFIG["max_upload_mb"] * 1024 * 1024
+        
+        self.jobs = OrderedDict()
+        self.queue = None
+        self.pool = None
+        self.sandbox = None
+    
+    async def start(self, host, port):
+        """Inicia os processos de OCR, os consumidores da fila e o servidor"""
+        from utils import OCRSandbox
+        
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.sandbox = OCRSandbox(self.ocr_workers)
+        
+        # Uma thread por worker acompanha o processo de OCR e faz a extração
+        self.pool = ThreadPoolExecutor(max_workers=self.ocr_workers)
+        
+        for _ in range(self.ocr_workers):
+            asyncio.create_task(self._worker())
+        
+        retomados = self._resume()
+        if retomados:
+            print(f"⏯️ {retomados} documento(s) de uma execução anterior retomado(s)")
+        
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        print(f"🌐 API de ingestão em http://{host}:{port} ({self.ocr_workers} workers de OCR)")
+        
+        async with server:
+            await server.serve_forever()
+    
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            job_id, conteudo, arquivo, arquivo_hash = await self.queue.get()
+            job = self.jobs.get(job_id)
+            
+            try:
+                if job is None:
+                    continue
+                
+                job["status"] = "processing"
+                resultado = await loop.run_in_executor(self.pool, self._process, conteudo, arquivo, arquivo_hash)
+                
+                ocr_result = resultado["ocr"]
+                if ocr_result['status'] == 'error':
+                    job.update(status="error", erro=ocr_result.get('error', 'Erro desconhecido'))
+                    continue
+                
+                job.update(
+                    dados=resultado["dados"],
+                    validacao=resultado["validacao"],
+                    confianca=ocr_result['confidence'],
+                    paginas=ocr_result['pages'],
+                    dpi=ocr_result.get('dpi')
+                )
+                
+                # Banco e templates acessados fora do laço de eventos
+                if resultado["validacao"]['is_valid']:
+                    job["contracheque_id"] = await loop.run_in_executor(
+                        None, self._save, resultado, arquivo, conteudo, arquivo_hash
+                    )
+                    job["anomalias"] = await loop.run_in_executor(
+                        None, self._anomalies, job["contracheque_id"]
+                    )
+                else:
+                    await loop.run_in_executor(None, self._fail, arquivo_hash, "Dados inválidos: "
+                                               + "; ".join(resultado["validacao"].get('errors', [])))
+                
+                job["status"] = "done"
+            
+            except Exception as e:
+                if job is not None:
+                    job.update(status="error", erro=str(e))
+            
+            finally:
+                if job is not None:
+                    job["finished_at"] = datetime.now().isoformat(timespec='seconds')
+                self.queue.task_done()
+    
+    def _process(self, conteudo, arquivo, arquivo_hash):
+        """Executa OCR (em processo isolado), extração e validação de um documento
+        
+        Etapas já registradas no manifesto (de uma execução interrompida) são
+        reaproveitadas em vez de refeitas.
+        """
+        from utils import UploadedDocument
+        
+        entrada = self.manifest.get(arquivo_hash) or {}
+        
+        ocr_result = entrada.get('resultado_ocr')
+        if ocr_result is None:
+            # Templates aprendidos por outros processos desde o último documento
+            self.template_registry.reload()
+            
+            document = UploadedDocument(conteudo, name=arquivo)
+            try:
+                ocr_result = self.sandbox.extract_text(document, templates=self.template_registry.templates)
+            finally:
+                document.close()
+            
+            if ocr_result['status'] == 'error':
+                self._fail(arquivo_hash, ocr_result.get('error', 'Erro desconhecido'))
+                return {"ocr": ocr_result}
+            
+            self.manifest.ocr_done(arquivo_hash, ocr_result)
+        
+        elif entrada['estado'] == 'extracted':
+            return {"ocr": ocr_result, "dados": entrada['dados'], "validacao": entrada['validacao']}
+        
+        extracted_data = self.data_extractor.extract_from_ocr_result(ocr_result)
+        validation_result = self.data_extractor.validate_data(extracted_data)
+        self.manifest.extracted(arquivo_hash, extracted_data, validation_result)
+        
+        return {"ocr": ocr_result, "dados": extracted_data, "validacao": validation_result}
+    
+    def _save(self, resultado, arquivo, conteudo, arquivo_hash):
+        self.template_registry.learn(resultado["dados"], resultado["ocr"])
+        
+        # Gravação idempotente: repetir esta etapa ao retomar não duplica o registro
+        contracheque_id = self.database.insert_contracheque(
+            resultado["dados"],
+            resultado["ocr"]['confidence'],
+            arquivo,
+            resultado["validacao"],
+            resultado["ocr"],
+            conteudo
+        )
+        
+        self.manifest.saved(arquivo_hash, contracheque_id)
+        self.manifest.discard_spool(arquivo_hash, arquivo)
+        
+        return contracheque_id
+    
+    def _fail(self, arquivo_hash, erro):
+        entrada = self.manifest.get(arquivo_hash)
+        self.manifest.failed(arquivo_hash, erro)
+        if entrada:
+            self.manifest.discard_spool(arquivo_hash, entrada['arquivo'])
+    
+    def _admit(self, conteudo, arquivo):
+        """Registra o upload no manifesto e o copia para a pasta de espera
+        
+        Retorna (hash, entrada anterior); arquivos já salvos não são copiados.
+        """
+        arquivo_hash = self.manifest.file_hash(conteudo)
+        entrada = self.manifest.get(arquivo_hash)
+        
+        if entrada and entrada['estado'] == 'saved':
+            return arquivo_hash, entrada
+        
+        caminho = self.manifest.spool(arquivo_hash, arquivo, conteudo)
+        self.manifest.queue(arquivo_hash, arquivo, caminho)
+        
+        return arquivo_hash, entrada
+    
+    def _resume(self):
+        """Recoloca na fila os documentos não concluídos de uma execução anterior
+        
+        Só entram os que ainda têm a cópia em disco; os que não couberem na
+        fila ficam para o próximo início. Retorna quantos foram retomados.
+        """
+        retomados = 0
+        
+        for entrada in self.manifest.resumable():
+            with open(entrada['caminho'], 'rb') as f:
+                conteudo = f.read()
+            
+            if self._enqueue(conteudo, entrada['arquivo'], entrada['arquivo_hash'], retomado=True) is None:
+                break
+            retomados += 1
+        
+        return retomados
+    
+    def _anomalies(self, contracheque_id):
+        if not self.database.supports('anomalias'):
+            return []
+        
+        anomalias = self.database.get_anomalies(contracheque_id)
+        return anomalias[['tipo', 'score', 'detalhe']].to_dict(orient='records')
+    
+    def _enqueue(self, conteudo, arquivo, arquivo_hash, retomado=False):
+        job_id = uuid.uuid4().hex
+        
+        try:
+            self.queue.put_nowait((job_id, conteudo, arquivo, arquivo_hash))
+        except asyncio.QueueFull:
+            return None
+        
+        self._add_job(job_id, arquivo, status="queued", retomado=retomado)
+        
+        return job_id
+    
+    def _add_job(self, job_id, arquivo, **campos):
+        self.jobs[job_id] = {
+            "id": job_id,
+            "arquivo": arquivo,
+            "created_at": datetime.now().isoformat(timespec='seconds'),
+            **campos
+        }
+        
+        # Descartar os resultados mais antigos
+        while len(self.jobs) > API_CONFIG["max_jobs_kept"]:
+            self.jobs.popitem(last=False)
+    
+    async def _handle_connection(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                writer.close()
+                return
+            
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            
+            length = int(headers.get('content-length', 0))
+            if length > self.max_upload:
+                status, body = 413, {"erro": f"Arquivo maior que {API_CONFIG['max_upload_mb']}MB"}
+            else:
+                conteudo = await reader.readexactly(length) if length else b''
+                status, body = await self._route(method, target, headers, conteudo)
+        
+        except (ValueError, asyncio.IncompleteReadError):
+            status, body = 400, {"erro": "Requisição inválida"}
+        except Exception as e:
+            status, body = 500, {"erro": str(e)}
+        
+        payload = json.dumps(body, ensure_ascii=False, default=str).encode('utf-8')
+        response_headers = [
+            f"HTTP/1.1 {status} {HTTP_STATUS.get(status, '')}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(payload)}",
+            "Connection: close"
+        ]
+        if status == 429:
+            response_headers.append("Retry-After: 5")
+        
+        writer.write(("\r\n".join(response_headers) + "\r\n\r\n").encode('latin-1') + payload)
+        
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+    
+    async def _route(self, method, target, headers, conteudo):
+        url = urlsplit(target)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+        
+        if parts == ['saude'] and method == 'GET':
+            return 200, {
+                "status": "ok",
+                "fila": self.queue.qsize(),
+                "capacidade_fila": self.queue_size,
+                "workers": self.ocr_workers
+            }
+        
+        if parts == ['documentos']:
+            if method != 'POST':
+                return 405, {"erro": "Use POST para enviar documentos"}
+            
+            arquivo = params.get('arquivo') or headers.get('x-filename', '')
+            if not any(arquivo.lower().endswith(ext) for ext in SUPPORTED_EXTENSIONS):
+                return 400, {"erro": "Informe ?arquivo= com extensão PDF, PNG, JPG, JPEG ou TIFF"}
+            if not conteudo:
+                return 400, {"erro": "Corpo da requisição vazio"}
+            if self.queue.full():
+                return 429, {"erro": "Fila cheia, tente novamente mais tarde"}
+            
+            loop = asyncio.get_running_loop()
+            arquivo_hash, entrada = await loop.run_in_executor(None, self._admit, conteudo, arquivo)
+            
+            # Arquivo já salvo: nada a reprocessar
+            if entrada and entrada['estado'] == 'saved':
+                job_id = uuid.uuid4().hex
+                self._add_job(job_id, arquivo, status="done", contracheque_id=entrada['contracheque_id'],
+                              finished_at=datetime.now().isoformat(timespec='seconds'))
+                return 200, {"id": job_id, "status": "done", "contracheque_id": entrada['contracheque_id']}
+            
+            # Sem vaga agora, o arquivo continua registrado e é retomado ao reiniciar
+            job_id = self._enqueue(conteudo, arquivo, arquivo_hash)
+            if job_id is None:
+                return 429, {"erro": "Fila cheia, tente novamente mais tarde"}
+            
+            return 202, {"id": job_id, "status": "queued"}
+        
+        if len(parts) in (2, 3) and parts[0] == 'documentos' and method == 'GET':
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return 404, {"erro": "Documento não encontrado"}
+            
+            if len(parts) == 2:
+                return 200, {key: job[key] for key in
+                             ['id', 'arquivo', 'status', 'created_at', 'finished_at', 'erro', 'contracheque_id',
+                              'anomalias', 'retomado']
+                             if key in job}
+            
+            if parts[2] == 'resultado':
+                if job["status"] not in ("done", "error"):
+                    return 409, {"erro": "Processamento ainda não concluído", "status": job["status"]}
+                return 200, job
+        
+        if parts == ['contracheques'] and method == 'GET':
+            limit = params.get('limit', '1000')
+            if not limit.isdigit():
+                return 400, {"erro": "limit deve ser um número inteiro não negativo"}
+            limit = int(limit)
+            
+            loop = asyncio.get_running_loop()
+            df = await loop.run_in_executor(None, self._query, params, limit)
+            return 200, {"registros": df.to_dict(orient='records')}
+        
+        return 404, {"erro": "Rota não encontrada"}
+    
+    def _query(self, params, limit):
+        # O limite vai para o SQL: só as linhas devolvidas são lidas
+        if params.get('periodo'):
+            df = self.database.get_contracheques_by_period(params['periodo'], limit)
+        elif params.get('nome'):
+            df = self.database.get_contracheques_by_name(params['nome'], limit)
+        else:
+            df = self.database.get_all_contracheques(limit)
+        
+        return df.astype(object).where(df.notna(), None)
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP local de ingestão de contracheques")
+    parser.add_argument("--host", default=API_CONFIG["host"])
+    parser.add_argument("--port", type=int, default=API_CONFIG["port"])
+    parser.add_argument("--workers", type=int, default=API_CONFIG["ocr_workers"])
+    args = parser.parse_args()
+    
+    create_required_folders()
+    
+    api = IngestionAPI(ocr_workers=args.workers)
+    
+    try:
+        asyncio.run(api.start(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n👋 API encerrada")
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,15 @@
 import streamlit as st
-import pandas as pd
-from datetime import datetime
 import os
+from datetime import datetime
 import sys
 
 # Adicionar diretório atual ao path para imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Importar módulos personalizados
-from config import APP_CONFIG, create_required_folders
-from utils import OCRProcessor, DataExtractor, Database
-from components import FileUploader, DataDisplay
+# Importar módulos personalizados (os pacotes carregam cada classe sob demanda)
+from config import APP_CONFIG, CHART_CONFIG, LOG_CONFIG, OCR_SANDBOX_CONFIG, STORAGE_CONFIG, SNAPSHOT_CONFIG, create_required_folders
+import utils
+import components
 
 def main():
     # Configurar página
@@ -24,12 +23,8 @@ def main():
     # Criar pastas necessárias
     create_required_folders()
     
-    # Inicializar componentes
-    ocr_processor = OCRProcessor()
-    data_extractor = DataExtractor()
-    database = Database()
-    file_uploader = FileUploader()
-    data_display = DataDisplay()
+    # Inicializar apenas o banco; os demais componentes são criados por página
+    database = utils.create_database()
     
     # Título principal
     st.title(APP_CONFIG["title"])
@@ -44,19 +39,29 @@ def main():
             "📤 Processar Documentos",
             "📊 Visualizar Dados",
             "📈 Análises e Relatórios",
+            "🦆 Consultas Analíticas",
             "⚙️ Configurações",
             "📋 Logs do Sistema"
         ]
     )
     
     if opcao == "📤 Processar Documentos":
-        processar_documentos(file_uploader, ocr_processor, data_extractor, database, data_display)
+        processar_documentos(
+            components.FileUploader(),
+            utils.OCRProcessor(utils.TemplateRegistry(database)),
+            utils.DataExtractor(),
+            database,
+            components.DataDisplay()
+        )
     
     elif opcao == "📊 Visualizar Dados":
-        visualizar_dados(database, data_display)
+        visualizar_dados(database, components.DataDisplay())
     
     elif opcao == "📈 Análises e Relatórios":
-        analises_relatorios(database, data_display)
+        analises_relatorios(database, components.DataDisplay())
+    
+    elif opcao == "🦆 Consultas Analíticas":
+        consultas_analiticas(database)
     
     elif opcao == "⚙️ Configurações":
         configuracoes(database)
@@ -68,51 +73,128 @@ def processar_documentos(file_uploader, ocr_processor, data_extractor, database,
     """Processa documentos enviados pelo usuário"""
     st.header("📤 Processamento de Documentos")
     
+    # Manifesto de ingestão: etapas já concluídas de cada arquivo
+    manifest = utils.IngestionManifest(database)
+    
     # Upload de arquivos
     uploaded_files = file_uploader.render()
     
-    if uploaded_files:
+    documentos = [(uploaded_file.name, file_uploader.get_document(uploaded_file))
+                  for uploaded_file in uploaded_files or []]
+    
+    # Arquivos interrompidos numa execução anterior e não reenviados agora
+    enviados = {document.sha256 for _, document in documentos}
+    pendentes = [entrada for entrada in manifest.pending() if entrada['arquivo_hash'] not in enviados]
+    if pendentes:
+        st.info(f"⏯️ {len(pendentes)} arquivo(s) de um processamento anterior não foram salvos: "
+                + ", ".join(entrada['arquivo'] or entrada['arquivo_hash'][:12] for entrada in pendentes))
+        
+        # Com a cópia guardada, continuam da última etapa sem novo envio
+        guardados = [entrada for entrada in manifest.resumable() if entrada['arquivo_hash'] not in enviados]
+        if guardados and st.checkbox(f"▶️ Retomar {len(guardados)} arquivo(s) guardado(s) de onde pararam",
+                                     key="retomar_pendentes"):
+            documentos += [
+                (entrada['arquivo'], file_uploader.get_spooled_document(entrada['caminho'], entrada['arquivo']))
+                for entrada in guardados
+            ]
+        if len(guardados) < len(pendentes):
+            st.caption("Os arquivos sem cópia guardada precisam ser enviados novamente.")
+    
+    if documentos:
         # Barra de progresso
         progress_bar = st.progress(0)
         status_text = st.empty()
         
         resultados = []
         
-        for i, uploaded_file in enumerate(uploaded_files):
+        # Resultados de OCR por hash do conteúdo, preservados entre reruns
+        if 'ocr_cache' not in st.session_state:
+            st.session_state.ocr_cache = {}
+        
+        for i, (nome_arquivo, document) in enumerate(documentos):
             # Atualizar progresso
-            progress = (i + 1) / len(uploaded_files)
-            progress_bar.progress(progress)
-            status_text.text(f"Processando {uploaded_file.name}... ({i+1}/{len(uploaded_files)})")
+            progress_bar.progress(i / len(documentos))
+            status_text.text(f"Processando {nome_arquivo}... ({i+1}/{len(documentos)})")
             
-            # Validar arquivo
-            validation = file_uploader.validate_file(uploaded_file)
+            # Validar arquivo (o documento é lido uma única vez e compartilhado pelas etapas)
+            validation = file_uploader.validate_file(document)
             
             if not validation['is_valid']:
-                st.error(f"❌ Erro no arquivo {uploaded_file.name}:")
+                st.error(f"❌ Erro no arquivo {nome_arquivo}:")
                 for error in validation['errors']:
                     st.write(f"• {error}")
                 continue
             
+            # Arquivos já salvos não são processados de novo
+            entrada = manifest.get(document.sha256)
+            if entrada and entrada['estado'] == 'saved':
+                st.info(f"⏭️ {nome_arquivo} já foi salvo (ID {entrada['contracheque_id']})")
+                continue
+            
             # Processar arquivo
-            with st.expander(f"📄 Processando: {uploaded_file.name}"):
-                # OCR
+            with st.expander(f"📄 Processando: {nome_arquivo}"):
+                # OCR (ou o resultado guardado de uma execução interrompida)
                 st.write("🔍 Extraindo texto via OCR...")
                 
-                if uploaded_file.type == "application/pdf":
-                    ocr_result = ocr_processor.extract_text_from_pdf(uploaded_file)
-                else:
-                    ocr_result = ocr_processor.extract_text_from_image(uploaded_file)
+                ocr_result = st.session_state.ocr_cache.get(document.sha256)
+                if ocr_result is None and entrada and entrada['resultado_ocr']:
+                    ocr_result = entrada['resultado_ocr']
+                    st.session_state.ocr_cache[document.sha256] = ocr_result
+                novo_ocr = ocr_result is None
+                cancel_key = f"cancelado_{document.sha256}"
                 
-                if ocr_result['status'] == 'error':
+                if novo_ocr and st.session_state.get(cancel_key):
+                    st.warning("⏹️ Processamento cancelado")
+                    if st.button("🔄 Reprocessar", key=f"retry_{i}"):
+                        del st.session_state[cancel_key]
+                        st.rerun()
+                    continue
+                
+                if novo_ocr:
+                    # O clique interrompe esta execução; o OCR em andamento é liberado
+                    st.button("⏹️ Cancelar", key=f"cancel_{i}",
+                              on_click=lambda key=cancel_key: st.session_state.update({key: True}))
+                    
+                    # Cópia em disco: uma execução interrompida é retomada sem novo envio
+                    manifest.queue(document.sha256, nome_arquivo,
+                                   manifest.spool(document.sha256, nome_arquivo, document.view))
+                    ocr_result = ocr_streaming(ocr_processor, data_extractor, document,
+                                               progress_bar, i, len(documentos))
+                    
+                    if ocr_result['status'] == 'success':
+                        st.session_state.ocr_cache[document.sha256] = ocr_result
+                        manifest.ocr_done(document.sha256, ocr_result)
+                    else:
+                        manifest.failed(document.sha256, ocr_result.get('error', 'Erro desconhecido'))
+                        manifest.discard_spool(document.sha256, nome_arquivo)
+                    entrada = None
+                
+                if ocr_result['status'] != 'success':
                     st.error(f"Erro no OCR: {ocr_result.get('error', 'Erro desconhecido')}")
                     continue
                 
-                # Extração de dados
+                # Extração de dados (reaproveitada se já concluída)
                 st.write("📋 Extraindo dados estruturados...")
-                extracted_data = data_extractor.extract_all_data(ocr_result['text'])
+                if entrada and entrada['estado'] == 'extracted':
+                    extracted_data = entrada['dados']
+                    validation_result = entrada['validacao']
+                else:
+                    extracted_data = data_extractor.extract_from_ocr_result(ocr_result)
+                    
+                    # Validação
+                    validation_result = data_extractor.validate_data(extracted_data)
+                    
+                    if validation_result['is_valid']:
+                        manifest.extracted(document.sha256, extracted_data, validation_result)
+                    elif entrada is None or entrada['estado'] != 'failed':
+                        # Dados inválidos não ficam pendentes (ainda podem ser salvos abaixo)
+                        manifest.failed(document.sha256, "Dados inválidos: "
+                                        + "; ".join(validation_result.get('errors', [])))
+                        manifest.discard_spool(document.sha256, nome_arquivo)
                 
-                # Validação
-                validation_result = data_extractor.validate_data(extracted_data)
+                # Aprender layout da empresa a partir de documentos válidos
+                if novo_ocr and validation_result['is_valid']:
+                    ocr_processor.template_registry.learn(extracted_data, ocr_result)
                 
                 # Exibir resultados
                 data_display.show_extraction_results(extracted_data, validation_result, ocr_result)
@@ -122,10 +204,18 @@ def processar_documentos(file_uploader, ocr_processor, data_extractor, database,
                     contracheque_id = database.insert_contracheque(
                         extracted_data,
                         ocr_result['confidence'],
-                        uploaded_file.name,
-                        validation_result
+                        nome_arquivo,
+                        validation_result,
+                        ocr_result,
+                        document.view
                     )
+                    manifest.saved(document.sha256, contracheque_id)
+                    manifest.discard_spool(document.sha256, nome_arquivo)
                     st.success(f"✅ Contracheque salvo com ID: {contracheque_id}")
+                    
+                    if database.supports('anomalias'):
+                        for anomalia in database.get_anomalies(contracheque_id).itertuples():
+                            st.warning(f"🚨 {anomalia.tipo.replace('_', ' ').capitalize()}: {anomalia.detalhe}")
                 
                 # Mostrar texto original se solicitado
                 if st.checkbox(f"🔍 Ver texto OCR completo", key=f"text_{i}"):
@@ -137,10 +227,11 @@ def processar_documentos(file_uploader, ocr_processor, data_extractor, database,
                     )
                 
                 resultados.append({
-                    'arquivo': uploaded_file.name,
+                    'arquivo': nome_arquivo,
                     'dados': extracted_data,
                     'validacao': validation_result,
-                    'ocr': ocr_result
+                    'ocr': ocr_result,
+                    'documento': document
                 })
         
         # Finalizar progresso
@@ -153,18 +244,56 @@ def processar_documentos(file_uploader, ocr_processor, data_extractor, database,
             
             # Opção para salvar todos
             if st.button("💾 Salvar Todos no Banco"):
-                saved_count = 0
-                for resultado in resultados:
-                    if resultado['validacao']['is_valid']:
-                        database.insert_contracheque(
-                            resultado['dados'],
-                            resultado['ocr']['confidence'],
-                            resultado['arquivo'],
-                            resultado['validacao']
-                        )
-                        saved_count += 1
+                # Inserção em lote, numa única transação
+                validos = [resultado for resultado in resultados if resultado['validacao']['is_valid']]
+                ids = database.insert_contracheques([
+                    {**resultado, 'conteudo': resultado['documento'].view}
+                    for resultado in validos
+                ])
                 
-                st.success(f"✅ {saved_count} contracheques salvos no banco de dados!")
+                for resultado, contracheque_id in zip(validos, ids):
+                    manifest.saved(resultado['documento'].sha256, contracheque_id)
+                    manifest.discard_spool(resultado['documento'].sha256, resultado['arquivo'])
+                
+                st.success(f"✅ {len(ids)} contracheques salvos no banco de dados!")
+
+def ocr_streaming(ocr_processor, data_extractor, document, progress_bar, file_index, file_count):
+    """Executa o OCR exibindo páginas concluídas e campos parciais em tempo real"""
+    page_counter = st.empty()
+    partial_fields = st.empty()
+    page_texts = {}
+    
+    # Em processo isolado, um arquivo problemático não trava nem derruba o app
+    if OCR_SANDBOX_CONFIG["enabled"]:
+        eventos = utils.OCRSandbox.shared().iter_document(
+            document, templates=ocr_processor.template_registry.templates
+        )
+    else:
+        eventos = ocr_processor.iter_document(document)
+    
+    for event in eventos:
+        if event['tipo'] == 'resultado':
+            page_counter.empty()
+            partial_fields.empty()
+            return event['resultado']
+        
+        page_texts[event['pagina']] = event['texto']
+        total = event['total']
+        
+        progress_bar.progress((file_index + len(page_texts) / total) / file_count)
+        page_counter.text(
+            f"📄 Página {event['pagina'] + 1} concluída ({event['nivel']}) • "
+            f"{event['concluidas']}/{event['pendentes']} nesta etapa • {len(page_texts)}/{total} páginas"
+        )
+        
+        # Campos encontrados até agora, com as páginas na ordem original
+        parcial = data_extractor.extract_all_data(
+            "\n".join(page_texts[p] for p in sorted(page_texts))
+        )
+        campos = [f"**{campo.replace('_', ' ').title()}:** {parcial[campo]}"
+                  for campo in ['nome', 'cpf', 'periodo', 'empresa', 'salario_liquido']
+                  if parcial.get(campo)]
+        partial_fields.markdown("🧩 Campos parciais — " + (" • ".join(campos) or "nenhum ainda"))
 
 def visualizar_dados(database, data_display):
     """Visualiza dados do banco de dados"""
@@ -199,7 +328,13 @@ def visualizar_dados(database, data_display):
     
     # Exibir dados
     if not df.empty:
-        df_filtrado = data_display.show_dataframe(df, "Contracheques Encontrados")
+        def exportar_excel():
+            # Exportação lida do banco em blocos (período buscado ou tudo)
+            caminho = os.path.join(APP_CONFIG["export_folder"],
+                                   f"contracheques_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
+            return caminho if database.export_to_excel(caminho, periodo_busca or None) else None
+        
+        df_filtrado = data_display.show_dataframe(df, "Contracheques Encontrados", export_excel=exportar_excel)
         
         # Gráficos
         if len(df_filtrado) > 1:
@@ -211,17 +346,37 @@ def analises_relatorios(database, data_display):
     """Seção de análises e relatórios"""
     st.header("📈 Análises e Relatórios")
     
-    df = database.get_all_contracheques()
+    # Consultas pesadas leem a cópia dos painéis, sem disputar o banco com a ingestão
+    leitura = database.read_replica()
+    
+    if leitura.snapshot_time:
+        col1, col2 = st.columns([4, 1])
+        
+        with col1:
+            idade = (datetime.now() - leitura.snapshot_time).total_seconds() / 60
+            st.caption(f"📸 Dados de {leitura.snapshot_time.strftime('%d/%m/%Y %H:%M')} "
+                       f"(há {idade:.0f} min; atualizados a cada {SNAPSHOT_CONFIG['refresh_minutes']} min)")
+        
+        with col2:
+            if st.button("🔄 Atualizar Dados"):
+                leitura.refresh(wait=True)
+                st.rerun()
+    
+    # Estatísticas acumuladas em blocos; nunca a tabela inteira em memória
+    sal_stats = leitura.get_salary_statistics()
     
-    if df.empty:
+    if sal_stats is None:
         st.info("Nenhum dado disponível para análise.")
         return
     
+    def moeda(valor):
+        return f"R$ {valor:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+    
     # Tabs para diferentes análises
     tab1, tab2, tab3 = st.tabs(["📊 Resumo Geral", "💰 Análise Salarial", "📅 Análise Temporal"])
     
     with tab1:
-        stats = database.get_summary_statistics()
+        stats = leitura.get_summary_statistics()
         data_display.show_database_summary(stats)
         
         # Métricas adicionais
@@ -230,52 +385,54 @@ def analises_relatorios(database, data_display):
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            if 'salario_liquido' in df.columns:
-                maior_salario = df['salario_liquido'].max()
-                st.metric("💎 Maior Salário", f"R$ {maior_salario:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
+            st.metric("💎 Maior Salário", moeda(sal_stats['maximo']))
         
         with col2:
-            if 'salario_liquido' in df.columns:
-                menor_salario = df['salario_liquido'].min()
-                st.metric("📉 Menor Salário", f"R$ {menor_salario:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
+            st.metric("📉 Menor Salário", moeda(sal_stats['minimo']))
         
         with col3:
-            if 'confianca_ocr' in df.columns:
-                confianca_min = df['confianca_ocr'].min()
-                st.metric("🎯 Menor Confiança OCR", f"{confianca_min:.1f}%")
+            if sal_stats['confianca_min'] is not None:
+                st.metric("🎯 Menor Confiança OCR", f"{sal_stats['confianca_min']:.1f}%")
     
     with tab2:
         st.subheader("💰 Análise Salarial Detalhada")
-        data_display.show_charts(df)
+        
+        # Histogramas acumulados em blocos (salário e empresa), sem carregar a tabela
+        distribuicao = leitura.get_salary_distribution(
+            sal_stats['minimo'], sal_stats['maximo'],
+            CHART_CONFIG["histogram_bins"] * CHART_CONFIG["box_resolution"]
+        )
+        
+        data_display.show_charts(
+            None,
+            distribuicao=distribuicao,
+            resumo_periodo=leitura.get_period_summary(),
+            top_funcionarios=leitura.get_top_employees(10)
+        )
         
         # Estatísticas salariais
-        if 'salario_liquido' in df.columns:
-            sal_stats = df['salario_liquido'].describe()
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.write("**Estatísticas Salariais:**")
-                st.write(f"• Média: R$ {sal_stats['mean']:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
-                st.write(f"• Mediana: R$ {sal_stats['50%']:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
-                st.write(f"• Desvio Padrão: R$ {sal_stats['std']:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
-            
-            with col2:
-                st.write("**Quartis:**")
-                st.write(f"• Q1: R$ {sal_stats['25%']:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
-                st.write(f"• Q3: R$ {sal_stats['75%']:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
-                st.write(f"• Amplitude: R$ {sal_stats['max'] - sal_stats['min']:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.write("**Estatísticas Salariais:**")
+            st.write(f"• Média: {moeda(sal_stats['media'])}")
+            st.write(f"• Mediana: {moeda(sal_stats['mediana'])}")
+            st.write(f"• Desvio Padrão: {moeda(sal_stats['desvio'])}")
+        
+        with col2:
+            st.write("**Quartis:**")
+            st.write(f"• Q1: {moeda(sal_stats['q1'])}")
+            st.write(f"• Q3: {moeda(sal_stats['q3'])}")
+            st.write(f"• Amplitude: {moeda(sal_stats['maximo'] - sal_stats['minimo'])}")
     
     with tab3:
         st.subheader("📅 Análise Temporal")
         
-        if 'periodo' in df.columns and 'salario_liquido' in df.columns:
-            # Evolução temporal
-            df_tempo = df.groupby('periodo').agg({
-                'salario_liquido': ['mean', 'count', 'sum'],
-                'nome': 'nunique'
-            }).round(2)
-            
+        # Resumo lido dos agregados materializados no banco
+        df_tempo = leitura.get_period_summary()
+        
+        if not df_tempo.empty:
+            df_tempo = df_tempo.set_index('periodo')
             df_tempo.columns = ['Salário Médio', 'Qtd Registros', 'Total Pago', 'Funcionários Únicos']
             
             st.write("**Resumo por Período:**")
@@ -284,6 +441,52 @@ def analises_relatorios(database, data_display):
         else:
             st.info("Dados de período não disponíveis para análise temporal.")
 
+def consultas_analiticas(database):
+    """Consultas ad hoc sobre a cópia colunar (DuckDB) dos contracheques"""
+    st.header("🦆 Consultas Analíticas")
+    
+    try:
+        from utils.analytics_engine import AnalyticsEngine, PREDEFINED_QUERIES
+    except ImportError as e:
+        st.warning(f"⚠️ {e}")
+        return
+    
+    engine = AnalyticsEngine.for_database(database)
+    
+    col1, col2 = st.columns([4, 1])
+    
+    with col2:
+        recarregar = st.button("🔄 Recarregar Cópia")
+    
+    if recarregar or engine.load_info() is None:
+        status_carga = st.empty()
+        engine.load(lambda registros: status_carga.text(f"{registros} contracheques carregados..."))
+        status_carga.empty()
+    else:
+        with st.spinner("Verificando cópia analítica..."):
+            engine.ensure_loaded()
+    
+    info = engine.load_info()
+    with col1:
+        st.caption(f"📦 {info['registros']} contracheques carregados em "
+                   f"{info['carregado_em'].strftime('%d/%m/%Y %H:%M')} ({info['tempo']:.1f}s)")
+    
+    consulta = st.selectbox("Consulta predefinida", list(PREDEFINED_QUERIES))
+    
+    # A consulta pode ser editada; só um SELECT roda, sobre a cópia aberta somente para leitura
+    sql = st.text_area("SQL (tabela contracheques)", PREDEFINED_QUERIES[consulta].strip(),
+                       height=220, key=f"sql_{consulta}")
+    
+    if st.button("▶️ Executar"):
+        try:
+            df, tempo = engine.query(sql)
+        except Exception as e:
+            st.error(f"❌ Erro na consulta: {e}")
+            return
+        
+        st.write(f"**{len(df)} linhas em {tempo * 1000:.1f} ms**")
+        st.dataframe(df, use_container_width=True)
+
 def configuracoes(database):
     """Seção de configurações"""
     st.header("⚙️ Configurações do Sistema")
@@ -296,7 +499,7 @@ def configuracoes(database):
     with col1:
         st.write(f"**Versão:** {APP_CONFIG['version']}")
         st.write(f"**Autor:** {APP_CONFIG['author']}")
-        st.write(f"**Banco de Dados:** {APP_CONFIG['database_file']}")
+        st.write(f"**Banco de Dados:** {APP_CONFIG['database_file'] if STORAGE_CONFIG['backend'] == 'sqlite' else 'PostgreSQL'}")
     
     with col2:
         st.write(f"**Pasta de Exports:** {APP_CONFIG['export_folder']}")
@@ -321,26 +524,113 @@ def configuracoes(database):
         if st.button("🔄 Resetar Configurações"):
             # Implementar reset
             st.warning("Funcionalidade de reset será implementada")
+    
+    # Reextração a partir do OCR guardado
+    if database.supports('ocr'):
+        st.subheader("🔁 Reextração de Dados")
+        st.write(f"**Contracheques com OCR guardado:** {database.count_ocr_results()}")
+        
+        if st.button("🔁 Reextrair Dados"):
+            from utils.reextraction import reextract_all
+            
+            progress_bar = st.progress(0)
+            
+            def atualizar_progresso(processados, total):
+                progress_bar.progress(processados / total if total else 1.0)
+            
+            stats = reextract_all(database, progress=atualizar_progresso)
+            st.success(f"✅ {stats['processados']} contracheques reprocessados, "
+                       f"{stats['atualizados']} atualizados em {stats['tempo']:.1f}s")
+    
+    # Anomalias no histórico salarial
+    if database.supports('anomalias'):
+        st.subheader("🚨 Anomalias Salariais")
+        
+        if st.button("🚨 Reavaliar Histórico Completo"):
+            with st.spinner("Reavaliando histórico..."):
+                quantidade = database.rebuild_anomalies()
+            st.success(f"✅ {quantidade} anomalias encontradas")
+        
+        anomalias = database.get_anomalies()
+        if anomalias.empty:
+            st.info("Nenhuma anomalia detectada")
+        else:
+            st.dataframe(anomalias, use_container_width=True, height=300)
+    
+    # Auditoria de qualidade dos dados
+    if database.supports('auditoria'):
+        st.subheader("🔎 Auditoria de Dados")
+        
+        if st.button("🔎 Executar Auditoria"):
+            from utils.audit import run_audit
+            
+            status_auditoria = st.empty()
+            
+            def mostrar_progresso(registros):
+                status_auditoria.text(f"{registros} contracheques auditados...")
+            
+            stats = run_audit(database, progress=mostrar_progresso)
+            status_auditoria.empty()
+            st.success(f"✅ {stats['achados']} achados em {stats['registros']} contracheques "
+                       f"({stats['tempo']:.1f}s)")
+        
+        resumo = database.get_audit_summary()
+        if resumo:
+            st.write(f"**Última auditoria:** {resumo['concluida_em']} — "
+                     f"{resumo['achados']} achados em {resumo['registros']} contracheques")
+            
+            if not resumo['por_regra'].empty:
+                st.dataframe(resumo['por_regra'], use_container_width=True)
+                
+                regra = st.selectbox("Ver achados da regra", resumo['por_regra']['regra'].tolist())
+                st.dataframe(database.get_audit_findings(regra), use_container_width=True, height=300)
 
 def logs_sistema(database):
     """Exibe logs do sistema"""
     st.header("📋 Logs do Sistema")
     
+    # Cursores das páginas já visitadas (paginação keyset)
+    if 'logs_cursores' not in st.session_state:
+        st.session_state.logs_cursores = [None]
+    
     # Controles
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     
     with col1:
-        limit = st.selectbox("Número de logs", [50, 100, 200, 500], index=1)
+        limit = st.selectbox("Logs por página", [50, 100, 200, 500], index=1)
     
     with col2:
         if st.button("🔄 Atualizar Logs"):
+            st.session_state.logs_cursores = [None]
             st.rerun()
     
-    # Buscar logs
-    logs_df = database.get_logs(limit)
+    with col3:
+        if st.button("🗄️ Arquivar Logs Antigos"):
+            arquivados = database.rotate_logs()
+            st.session_state.logs_cursores = [None]
+            st.success(f"{arquivados} logs arquivados em '{LOG_CONFIG['archive_folder']}'")
+    
+    # Buscar página atual
+    cursor = st.session_state.logs_cursores[-1]
+    logs_df = database.get_logs_page(limit, before=cursor)
     
     if not logs_df.empty:
+        pagina = len(st.session_state.logs_cursores)
+        st.write(f"**Página {pagina}**")
         st.dataframe(logs_df, use_container_width=True, height=400)
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            if pagina > 1 and st.button("⬅️ Mais recentes"):
+                st.session_state.logs_cursores.pop()
+                st.rerun()
+        
+        with col2:
+            if len(logs_df) == limit and st.button("Mais antigos ➡️"):
+                ultimo = logs_df.iloc[-1]
+                st.session_state.logs_cursores.append((ultimo['timestamp'], int(ultimo['id'])))
+                st.rerun()
     else:
         st.info("Nenhum log encontrado.")
 
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark da validação de CPF: escalar x vetorizada (NumPy)
+
+Uso:
+    python benchmarks/benchmark_cpf.py [--quantidade 200000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# Adicionar diretório do projeto ao path para imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.data_extractor import DataExtractor
+
+def gerar_cpfs(quantidade, seed=42):
+    """Gera CPFs válidos e inválidos em formatos variados, como saem do OCR"""
+    rng = random.Random(seed)
+    cpfs = []
+    
+    for _ in range(quantidade):
+        base = [rng.randrange(10) for _ in range(9)]
+        for pesos in (range(10, 1, -1), range(11, 1, -1)):
+            resto = sum(d * p for d, p in zip(base, pesos)) % 11
+            base.append(0 if resto < 2 else 11 - resto)
+        digitos = ''.join(map(str, base))
+        
+        sorteio = rng.random()
+        if sorteio < 0.2:
+            digitos = digitos[:10] + str((int(digitos[10]) + 1) % 10)   # dígito verificador errado
+        elif sorteio < 0.25:
+            digitos = digitos[:9]                                      # CPF incompleto
+        
+        if rng.random() < 0.6:
+            digitos = f"{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}"
+        
+        cpfs.append(digitos)
+    
+    return cpfs
+
+def medir(func, repeticoes=3):
+    """Menor tempo entre as repetições"""
+    melhor = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = func()
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor, resultado
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da validação de CPF")
+    parser.add_argument("--quantidade", type=int, default=200000)
+    args = parser.parse_args()
+    
+    extractor = DataExtractor()
+    cpfs = gerar_cpfs(args.quantidade)
+    
+    print(f"📊 {len(cpfs)} CPFs\n")
+    
+    for nome, escalar, lote in [
+        ("validate_cpf",
+         lambda: [extractor.validate_cpf(cpf) for cpf in cpfs],
+         lambda: extractor.validate_cpf_batch(cpfs).tolist())
+    ]:
+        tempo_escalar, resultado_escalar = medir(escalar)
+        tempo_lote, resultado_lote = medir(lote)
+        
+        assert resultado_escalar == resultado_lote, f"{nome}: resultados divergentes"
+        
+        print(f"{nome}")
+        print(f"  escalar:    {tempo_escalar * 1000:8.1f} ms  ({len(cpfs) / tempo_escalar:,.0f} CPFs/s)")
+        print(f"  vetorizada: {tempo_lote * 1000:8.1f} ms  ({len(cpfs) / tempo_lote:,.0f} CPFs/s)")
+        print(f"  ganho:      {tempo_escalar / tempo_lote:8.1f}x\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark do OCR por idiomas e variante de modelo: velocidade x acerto
+
+Gera contracheques sintéticos (em português e alguns com rótulos em
+inglês), reconhece cada página com cada combinação de idiomas (por,
+por+eng) e variante de modelo (padrão e as pastas de OCR_CONFIG["tessdata"])
+e compara o texto com o original. Mostra também quais idiomas a detecção
+por documento escolheria.
+
+Uso:
+    python benchmarks/benchmark_ocr_idiomas.py [--paginas 10] [--nivel completo] [--fonte DejaVuSans.ttf]
+"""
+
+import argparse
+import difflib
+import os
+import random
+import sys
+import time
+
+# Adicionar diretório do projeto ao path para imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFont
+from config import OCR_CONFIG
+from utils.data_extractor import DataExtractor
+from utils.ocr_processor import OCRProcessor
+
+NOMES = ["JOAO DA SILVA SANTOS", "MARIA APARECIDA SOUZA", "CARLOS EDUARDO LIMA", "ANA PAULA FERREIRA"]
+CARGOS = ["ANALISTA DE SISTEMAS", "AUXILIAR ADMINISTRATIVO", "TECNICO DE ENFERMAGEM", "OPERADOR DE CAIXA"]
+
+def formatar_valor(valor):
+    return f"{valor:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+
+def gerar_pagina(rng, ingles, fonte, dpi=300):
+    """Gera (imagem, texto, campos) de um contracheque sintético"""
+    nome = rng.choice(NOMES)
+    cpf = f"{rng.randrange(1000):03d}.{rng.randrange(1000):03d}.{rng.randrange(1000):03d}-{rng.randrange(100):02d}"
+    bruto = rng.uniform(1500, 15000)
+    descontos = bruto * rng.uniform(0.08, 0.3)
+    liquido = bruto - descontos
+    
+    linhas = [
+        "EMPRESA: COMERCIAL EXEMPLO LTDA",
+        f"Nome do Funcionario: {nome}",
+        f"CPF: {cpf}",
+        f"Cargo: {rng.choice(CARGOS)}",
+        f"Competencia: {rng.randrange(1, 13):02d}/{rng.randrange(2020, 2026)}",
+        f"Salario Base: R$ {formatar_valor(bruto)}",
+        f"Total Descontos: R$ {formatar_valor(descontos)}",
+        f"Valor Liquido: R$ {formatar_valor(liquido)}"
+    ]
+    if ingles:
+        linhas += [
+            "Payslip for the employee - gross pay and net pay",
+            f"Earnings: {formatar_valor(bruto)}  Deductions and tax: {formatar_valor(descontos)}",
+            "Overtime hours are paid to the employee by the employer"
+        ]
+    
+    tamanho = int(10 * dpi / 72)
+    imagem = Image.new('L', (int(8.27 * dpi), int(11.69 * dpi)), 255)
+    desenho = ImageDraw.Draw(imagem)
+    font = fonte(tamanho)
+    
+    y = int(0.6 * dpi)
+    for linha in linhas:
+        desenho.text((int(0.6 * dpi), y), linha, font=font, fill=0)
+        y += int(tamanho * 1.8)
+    
+    imagem.info['dpi'] = (dpi, dpi)
+    campos = {"nome": nome, "cpf": cpf, "salario_liquido": round(liquido, 2)}
+    
+    return imagem, "\n".join(linhas), campos
+
+def carregar_fonte(caminho):
+    """Fonte TrueType do argumento, DejaVu Sans ou a fonte padrão do Pillow"""
+    for candidato in [caminho, "DejaVuSans.ttf"]:
+        if not candidato:
+            continue
+        try:
+            ImageFont.truetype(candidato, 10)
+            return lambda tamanho: ImageFont.truetype(candidato, tamanho)
+        except OSError:
+            pass
+    return lambda tamanho: ImageFont.load_default(size=tamanho)
+
+def similaridade(original, reconhecido):
+    """Acerto de caracteres (0-1), ignorando quebras de linha e espaços repetidos"""
+    return difflib.SequenceMatcher(None, " ".join(original.split()), " ".join(reconhecido.split())).ratio()
+
+def campo_correto(extraido, esperado):
+    """Valores iguais; textos comparados sem diferenciar maiúsculas"""
+    if isinstance(esperado, float):
+        return extraido == esperado
+    return str(esperado).upper() in str(extraido or "").upper()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do OCR por idiomas e variante de modelo")
+    parser.add_argument("--paginas", type=int, default=10)
+    parser.add_argument("--nivel", choices=[tier["nome"] for tier in OCR_CONFIG["tiers"]],
+                        default=OCR_CONFIG["tiers"][min(1, len(OCR_CONFIG["tiers"]) - 1)]["nome"])
+    parser.add_argument("--fonte", default=None, help="Arquivo .ttf usado nas páginas sintéticas")
+    args = parser.parse_args()
+    
+    rng = random.Random(42)
+    fonte = carregar_fonte(args.fonte)
+    paginas = [gerar_pagina(rng, ingles=(i % 4 == 3), fonte=fonte) for i in range(args.paginas)]
+    
+    processor = OCRProcessor()
+    extractor = DataExtractor()
+    tier = next(tier for tier in OCR_CONFIG["tiers"] if tier["nome"] == args.nivel)
+    
+    # Variantes disponíveis: padrão e as pastas configuradas que existem
+    variantes = [None] + [modelo for modelo, pasta in OCR_CONFIG["tessdata"].items() if pasta and os.path.isdir(pasta)]
+    
+    print(f"📊 {len(paginas)} páginas sintéticas • nível {tier['nome']} ({tier['dpi']} DPI, psm {tier['psm']})\n")
+    
+    # Idiomas que a detecção escolheria a partir do texto de cada página
+    # (no OCR real, a partir do texto do nível rápido)
+    escolhas = [processor._detect_languages(texto) for _, texto, _ in paginas]
+    com_ingles = sum(1 for _, texto, _ in paginas if "Payslip" in texto)
+    detectados = sum(1 for (_, texto, _), idiomas in zip(paginas, escolhas) if ("eng" in idiomas) == ("Payslip" in texto))
+    print(f"Detecção de idiomas: {detectados}/{len(paginas)} corretas ({com_ingles} páginas com inglês)\n")
+    
+    print(f"{'modelo':<8} {'idiomas':<10} {'págs/s':>8} {'s/pág':>7} {'acerto':>8} {'campos':>8}")
+    
+    for modelo in variantes:
+        for idiomas in (["por"], ["por", "eng"], "detectados"):
+            inicio = time.perf_counter()
+            acertos = []
+            campos_corretos = 0
+            
+            for (imagem, texto, campos), escolha in zip(paginas, escolhas):
+                nivel = dict(tier, modelo=modelo, idiomas=escolha if idiomas == "detectados" else idiomas)
+                resultado = processor._ocr_image(processor._scale_image(imagem, tier["dpi"]), nivel)
+                
+                acertos.append(similaridade(texto, resultado["text"]))
+                
+                extraidos = extractor.extract_all_data(resultado["text"])
+                campos_corretos += sum(1 for campo, valor in campos.items()
+                                       if campo_correto(extraidos.get(campo), valor))
+            
+            decorrido = time.perf_counter() - inicio
+            rotulo = idiomas if isinstance(idiomas, str) else "+".join(idiomas)
+            print(f"{modelo or 'padrão':<8} {rotulo:<10} {len(paginas) / decorrido:8.2f} "
+                  f"{decorrido / len(paginas):7.2f} {sum(acertos) / len(acertos):8.1%} "
+                  f"{campos_corretos / (len(paginas) * 3):8.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,24 @@
 # Pacote de componentes de interface para o leitor de contracheques
+#
+# Os componentes são carregados sob demanda (PEP 562), para que páginas que
+# não exibem gráficos não paguem pela importação do Plotly.
 
-from .file_uploader import FileUploader
-from .data_display import DataDisplay
+import importlib
 
-__all__ = ['FileUploader', 'DataDisplay'] 
\ No newline at end of file
+_LAZY_ATTRIBUTES = {
+    'FileUploader': '.file_uploader',
+    'DataDisplay': '.data_display'
+}
+
+__all__ = ['FileUploader', 'DataDisplay']
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,9 +1,12 @@
 import streamlit as st
 import pandas as pd
+import os
 import plotly.express as px
 import plotly.graph_objects as go
+import numpy as np
 from datetime import datetime
 import json
+from config import CHART_CONFIG
 
 class DataDisplay:
     def __init__(self):
@@ -38,6 +41,36 @@ class DataDisplay:
             warnings_count = len(validation_result.get('warnings', []))
             st.metric("⚠️ Avisos", warnings_count, delta_color="inverse" if warnings_count > 0 else "normal")
         
+        # Distribuição das páginas entre os níveis de OCR
+        tiers = ocr_result.get('tiers')
+        if tiers:
+            distribuicao = " • ".join(f"{nome}: {qtd}" for nome, qtd in tiers.items())
+            st.caption(
+                f"⚡ Níveis de OCR — {distribuicao} • "
+                f"tempo: {ocr_result.get('tempo_ocr', 0):.1f}s • "
+                f"economia estimada: {ocr_result.get('tempo_economizado', 0):.1f}s • "
+                f"idiomas: {'+'.join(ocr_result.get('idiomas', []))}"
+            )
+        
+        # DPIs escolhidos pela altura do texto
+        ajuste_dpi = ocr_result.get('dpi')
+        if ajuste_dpi:
+            dpis = " • ".join(f"{nome}: {dpi}" for nome, dpi in ajuste_dpi['niveis'].items())
+            altura = f"{ajuste_dpi['altura_x']:.1f}px" if ajuste_dpi.get('altura_x') else "não medida"
+            if ajuste_dpi.get('altura_x') and ajuste_dpi.get('dpi_probe'):
+                altura += f" a {ajuste_dpi['dpi_probe']:.0f} DPI"
+            st.caption(f"🔎 DPI — {dpis} • altura-x no probe: {altura}")
+        
+        # Páginas giradas ou inclinadas corrigidas antes do OCR
+        orientacao = ocr_result.get('orientacao')
+        if orientacao and orientacao['paginas']:
+            paginas = " • ".join(f"p.{p['pagina'] + 1}: {p['rotacao']}° / {p['inclinacao']:+.1f}°"
+                                 for p in orientacao['paginas'])
+            st.caption(
+                f"🧭 Orientação corrigida — {paginas} • custo: {orientacao['tempo']:.2f}s • "
+                f"retentativas evitadas (estimativa): {orientacao['economia_estimada']:.1f}s"
+            )
+        
         # Dados extraídos
         st.subheader("📋 Dados Extraídos")
         
@@ -133,8 +166,12 @@ class DataDisplay:
             media_confianca = db_stats.get('media_confianca_ocr', 0)
             st.metric("🎯 Confiança Média OCR", f"{media_confianca:.1f}%")
     
-    def show_dataframe(self, df, title="Dados"):
-        """Exibe DataFrame com funcionalidades de filtro e busca"""
+    def show_dataframe(self, df, title="Dados", export_excel=None):
+        """Exibe DataFrame com funcionalidades de filtro e busca
+        
+        export_excel, se informado, é chamado sem argumentos e retorna o
+        caminho do arquivo Excel gerado (ou None, se não houver dados).
+        """
         if df.empty:
             st.info("Nenhum dado encontrado.")
             return
@@ -222,18 +259,32 @@ class DataDisplay:
                     )
             
             with col2:
-                if st.button("📊 Exportar Excel"):
-                    # Esta funcionalidade seria implementada no app principal
-                    st.info("Funcionalidade de exportação Excel será implementada")
+                if export_excel and st.button("📊 Exportar Excel"):
+                    caminho = export_excel()
+                    if caminho:
+                        with open(caminho, 'rb') as arquivo:
+                            st.download_button(
+                                label="💾 Download Excel",
+                                data=arquivo.read(),
+                                file_name=os.path.basename(caminho),
+                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                            )
+                    else:
+                        st.info("Nenhum dado para exportar.")
         
         else:
             st.info("Nenhum registro corresponde aos filtros aplicados.")
         
         return df_filtrado
     
-    def show_charts(self, df):
-        """Exibe gráficos dos dados"""
-        if df.empty:
+    def show_charts(self, df, resumo_periodo=None, top_funcionarios=None, distribuicao=None):
+        """Exibe gráficos dos dados
+        
+        resumo_periodo e top_funcionarios podem vir pré-calculados dos
+        agregados do banco, e distribuicao (de get_salary_distribution) no
+        lugar dos salários de df; quando ausentes, são calculados a partir de df.
+        """
+        if distribuicao is None and (df is None or df.empty):
             return
         
         st.subheader("📈 Gráficos e Análises")
@@ -242,36 +293,70 @@ class DataDisplay:
         tab1, tab2, tab3 = st.tabs(["💰 Salários", "📅 Períodos", "👥 Funcionários"])
         
         with tab1:
-            if 'salario_liquido' in df.columns:
+            if distribuicao is not None:
+                st.plotly_chart(self._distribution_histogram(
+                    distribuicao, "Distribuição de Salários Líquidos", CHART_CONFIG["histogram_bins"]
+                ), use_container_width=True)
+                
+                fig = self._distribution_box(distribuicao, "Salários por Empresa")
+                fig.update_xaxes(tickangle=45)
+                st.plotly_chart(fig, use_container_width=True)
+                
+                total = int(distribuicao['contagens'].sum())
+                st.caption(f"ℹ️ {total:,} registros: gráficos exibidos a partir de dados resumidos".replace(',', '.'))
+            
+            elif 'salario_liquido' in df.columns:
+                # Acima do limite, os pontos são resumidos no servidor
+                resumir = len(df) > CHART_CONFIG["downsample_threshold"]
+                
                 # Histograma de salários
-                fig = px.histogram(
-                    df, 
-                    x='salario_liquido',
-                    title="Distribuição de Salários Líquidos",
-                    nbins=20
-                )
+                if resumir:
+                    fig = self._binned_histogram(
+                        df['salario_liquido'],
+                        title="Distribuição de Salários Líquidos",
+                        nbins=CHART_CONFIG["histogram_bins"]
+                    )
+                else:
+                    fig = px.histogram(
+                        df, 
+                        x='salario_liquido',
+                        title="Distribuição de Salários Líquidos",
+                        nbins=CHART_CONFIG["histogram_bins"]
+                    )
                 st.plotly_chart(fig, use_container_width=True)
                 
                 # Box plot por empresa
                 if 'empresa' in df.columns:
-                    fig = px.box(
-                        df,
-                        x='empresa',
-                        y='salario_liquido',
-                        title="Salários por Empresa"
-                    )
+                    if resumir:
+                        fig = self._summary_box(df, x='empresa', y='salario_liquido',
+                                                title="Salários por Empresa")
+                    else:
+                        fig = px.box(
+                            df,
+                            x='empresa',
+                            y='salario_liquido',
+                            title="Salários por Empresa"
+                        )
                     fig.update_xaxes(tickangle=45)
                     st.plotly_chart(fig, use_container_width=True)
+                
+                if resumir:
+                    st.caption(f"ℹ️ {len(df):,} registros: gráficos exibidos a partir de dados resumidos".replace(',', '.'))
         
         with tab2:
-            if 'periodo' in df.columns:
+            if resumo_periodo is not None:
+                df_periodo = resumo_periodo
+            elif df is not None and 'periodo' in df.columns:
                 # Evolução temporal
                 df_periodo = df.groupby('periodo').agg({
                     'salario_liquido': 'mean',
                     'nome': 'count'
                 }).reset_index()
                 df_periodo.columns = ['periodo', 'salario_medio', 'quantidade']
-                
+            else:
+                df_periodo = None
+            
+            if df_periodo is not None:
                 fig = px.line(
                     df_periodo,
                     x='periodo',
@@ -281,14 +366,134 @@ class DataDisplay:
                 st.plotly_chart(fig, use_container_width=True)
         
         with tab3:
-            if 'nome' in df.columns:
+            if top_funcionarios is not None:
+                df_funcionarios = top_funcionarios.set_index('nome')['salario_medio']
+            elif df is not None and 'nome' in df.columns:
                 # Top funcionários por salário
                 df_funcionarios = df.groupby('nome')['salario_liquido'].mean().sort_values(ascending=False).head(10)
-                
+            else:
+                df_funcionarios = None
+            
+            if df_funcionarios is not None:
                 fig = px.bar(
                     x=df_funcionarios.values,
                     y=df_funcionarios.index,
                     orientation='h',
                     title="Top 10 Funcionários por Salário Médio"
                 )
-                st.plotly_chart(fig, use_container_width=True) 
\ No newline at end of file
+                st.plotly_chart(fig, use_container_width=True) 
+    
+    def _binned_histogram(self, values, title, nbins=20):
+        """Monta histograma com contagens calculadas no servidor (NumPy)"""
+        name = values.name
+        values = pd.to_numeric(values, errors='coerce').dropna().to_numpy()
+        
+        if values.size == 0:
+            return go.Figure(layout={"title": title})
+        
+        counts, edges = np.histogram(values, bins=nbins)
+        
+        return self._histogram_figure(counts, edges, name, title)
+    
+    def _distribution_histogram(self, distribuicao, title, nbins):
+        """Histograma a partir das contagens acumuladas em blocos (agrupa as subfaixas)"""
+        counts = distribuicao['contagens']
+        edges = distribuicao['faixas']
+        
+        if len(counts) % nbins == 0:
+            counts = counts.reshape(nbins, -1).sum(axis=1)
+            edges = edges[::len(distribuicao['contagens']) // nbins]
+        
+        return self._histogram_figure(counts, edges, 'salario_liquido', title)
+    
+    def _histogram_figure(self, counts, edges, name, title):
+        fig = go.Figure(data=[go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=counts,
+            width=np.diff(edges),
+            customdata=np.stack([edges[:-1], edges[1:]], axis=-1),
+            hovertemplate="%{customdata[0]:,.2f} – %{customdata[1]:,.2f}<br>count=%{y}<extra></extra>"
+        )])
+        fig.update_layout(title=title, bargap=0, xaxis_title=name, yaxis_title="count")
+        
+        return fig
+    
+    def _summary_box(self, df, x, y, title):
+        """Monta box plot a partir de quartis e whiskers pré-calculados"""
+        data = df[[x, y]].copy()
+        data[y] = pd.to_numeric(data[y], errors='coerce')
+        data = data.dropna()
+        
+        if data.empty:
+            return go.Figure(layout={"title": title})
+        
+        grupos = data.groupby(x)[y]
+        stats = grupos.quantile([0.25, 0.5, 0.75]).unstack()
+        stats.columns = ['q1', 'median', 'q3']
+        
+        # Whiskers de Tukey: valores extremos dentro de 1,5 × IQR
+        iqr = stats['q3'] - stats['q1']
+        limites = data[x].map(stats['q1'] - 1.5 * iqr), data[x].map(stats['q3'] + 1.5 * iqr)
+        dentro = data[(data[y] >= limites[0]) & (data[y] <= limites[1])]
+        stats['lowerfence'] = dentro.groupby(x)[y].min()
+        stats['upperfence'] = dentro.groupby(x)[y].max()
+        stats['mean'] = grupos.mean()
+        
+        return self._box_figure(stats, x, y, title)
+    
+    def _distribution_box(self, distribuicao, title):
+        """Box plot por empresa a partir das contagens acumuladas em blocos
+        
+        Quartis interpolados dentro da subfaixa; whiskers nas bordas da
+        primeira e da última subfaixa ocupada dentro de 1,5 × IQR.
+        """
+        edges = distribuicao['faixas']
+        linhas = {}
+        
+        for empresa, counts in distribuicao['empresas'].items():
+            total = counts.sum()
+            if not total:
+                continue
+            
+            acumulado = np.cumsum(counts)
+            
+            def quantil(q):
+                alvo = q * total
+                i = min(int(np.searchsorted(acumulado, alvo)), len(counts) - 1)
+                anterior = acumulado[i - 1] if i else 0
+                fracao = (alvo - anterior) / counts[i] if counts[i] else 0.0
+                return edges[i] + fracao * (edges[i + 1] - edges[i])
+            
+            q1, mediana, q3 = quantil(0.25), quantil(0.5), quantil(0.75)
+            iqr = q3 - q1
+            ocupadas = np.nonzero(counts)[0]
+            inferior = ocupadas[edges[ocupadas + 1] >= q1 - 1.5 * iqr]
+            superior = ocupadas[edges[ocupadas] <= q3 + 1.5 * iqr]
+            
+            linhas[empresa] = {
+                'q1': q1, 'median': mediana, 'q3': q3,
+                'lowerfence': max(edges[inferior[0]], q1 - 1.5 * iqr) if len(inferior) else q1,
+                'upperfence': min(edges[superior[-1] + 1], q3 + 1.5 * iqr) if len(superior) else q3,
+                'mean': distribuicao['somas'][empresa] / total
+            }
+        
+        if not linhas:
+            return go.Figure(layout={"title": title})
+        
+        return self._box_figure(pd.DataFrame.from_dict(linhas, orient='index'), 'empresa', 'salario_liquido', title)
+    
+    def _box_figure(self, stats, x, y, title):
+        fig = go.Figure(data=[go.Box(
+            x=stats.index.tolist(),
+            q1=stats['q1'].tolist(),
+            median=stats['median'].tolist(),
+            q3=stats['q3'].tolist(),
+            lowerfence=stats['lowerfence'].tolist(),
+            upperfence=stats['upperfence'].tolist(),
+            mean=stats['mean'].tolist(),
+            boxpoints=False,
+            name=y
+        )])
+        fig.update_layout(title=title, xaxis_title=x, yaxis_title=y)
+        
+        return fig
@@ -1,10 +1,9 @@
 import streamlit as st
-import os
-from datetime import datetime
+from utils.document import UploadedDocument
 
 class FileUploader:
     def __init__(self):
-        self.supported_types = ["pdf", "png", "jpg", "jpeg"]
+        self.supported_types = ["pdf", "png", "jpg", "jpeg", "tif", "tiff"]
     
     def render(self):
         """Renderiza a interface de upload de arquivos"""
@@ -27,7 +26,7 @@ class FileUploader:
         uploaded_file = st.file_uploader(
             "Envie um contracheque ou comprovante",
             type=self.supported_types,
-            help="Formatos suportados: PDF, PNG, JPG, JPEG"
+            help="Formatos suportados: PDF, PNG, JPG, JPEG, TIFF (inclusive multipágina)"
         )
         
         if uploaded_file:
@@ -55,7 +54,7 @@ class FileUploader:
             "Envie múltiplos contracheques ou comprovantes",
             type=self.supported_types,
             accept_multiple_files=True,
-            help="Formatos suportados: PDF, PNG, JPG, JPEG"
+            help="Formatos suportados: PDF, PNG, JPG, JPEG, TIFF (inclusive multipágina)"
         )
         
         if uploaded_files:
@@ -81,21 +80,41 @@ class FileUploader:
         
         return []
     
-    def save_temp_file(self, uploaded_file, temp_folder="temp"):
-        """Salva arquivo temporário no disco"""
-        if not os.path.exists(temp_folder):
-            os.makedirs(temp_folder)
+    def get_document(self, uploaded_file):
+        """Retorna o documento do upload, criado uma única vez por sessão
+        
+        O mesmo UploadedDocument é reaproveitado entre reruns do Streamlit,
+        evitando reler o upload a cada interação.
+        """
+        if 'documentos' not in st.session_state:
+            st.session_state.documentos = {}
+        
+        key = getattr(uploaded_file, 'file_id', None) or (uploaded_file.name, uploaded_file.size)
+        
+        if key not in st.session_state.documentos:
+            st.session_state.documentos[key] = UploadedDocument(uploaded_file)
         
-        # Criar nome único baseado em timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{uploaded_file.name}"
-        filepath = os.path.join(temp_folder, filename)
+        return st.session_state.documentos[key]
+    
+    def get_spooled_document(self, caminho, nome):
+        """Retorna o documento de uma cópia em disco (retomada), criado uma única vez por sessão"""
+        if 'documentos' not in st.session_state:
+            st.session_state.documentos = {}
+        
+        if caminho not in st.session_state.documentos:
+            with open(caminho, 'rb') as f:
+                st.session_state.documentos[caminho] = UploadedDocument(f, name=nome)
         
-        # Salvar arquivo
-        with open(filepath, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        return st.session_state.documentos[caminho]
+    
+    def save_temp_file(self, uploaded_file, temp_folder="temp"):
+        """Salva arquivo temporário no disco
         
-        return filepath
+        Documentos já gravados em disco (uploads grandes) reaproveitam o
+        mesmo arquivo em vez de gravar outra cópia.
+        """
+        document = UploadedDocument.wrap(uploaded_file)
+        return document.path(temp_folder)
     
     def validate_file(self, uploaded_file):
         """Valida o arquivo antes do processamento"""
@@ -108,8 +127,21 @@ class FileUploader:
             errors.append(f"Arquivo muito grande: {uploaded_file.size / (1024*1024):.1f}MB (máximo: 10MB)")
         
         # Verificar tipo
-        if not any(uploaded_file.name.lower().endswith(ext) for ext in ['.pdf', '.png', '.jpg', '.jpeg']):
+        if not any(uploaded_file.name.lower().endswith(ext) for ext in ['.pdf', '.png', '.jpg', '.jpeg', '.tif', '.tiff']):
             errors.append("Tipo de arquivo não suportado")
+        elif isinstance(uploaded_file, UploadedDocument):
+            # Conferir a assinatura do conteúdo com a extensão
+            header = uploaded_file.header()
+            signatures = {
+                '.pdf': [b'%PDF'],
+                '.png': [b'\x89PNG'],
+                '.jpg': [b'\xff\xd8\xff'],
+                '.jpeg': [b'\xff\xd8\xff'],
+                '.tif': [b'II*\x00', b'MM\x00*'],
+                '.tiff': [b'II*\x00', b'MM\x00*']
+            }
+            if not any(header.startswith(sig) for sig in signatures[uploaded_file.extension]):
+                errors.append("Conteúdo do arquivo não corresponde à extensão")
         
         # Avisos baseados no tamanho
         if uploaded_file.size < 50 * 1024:  # Menor que 50KB
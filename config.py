@@ -78,14 +78,169 @@ APP_CONFIG = {
     "author": "Sistema de Análise de Pagamentos",
     "database_file": "contracheques.db",
     "export_folder": "exports",
-    "temp_folder": "temp"
+    "temp_folder": "temp",
+    "read_chunk_size": 50000,  # Contracheques por bloco nas leituras em streaming (exportação, análises)
+    "upload_spill_mb": 5,  # Uploads maiores vão para arquivo temporário mapeado em memória
+    "import_budget_seconds": 1.0  # Tempo máximo para importar o necessário a operações de banco
+}
+
+# Armazenamento: "sqlite" (arquivo local) ou "postgresql" (vários nós de ingestão)
+STORAGE_CONFIG = {
+    "backend": "sqlite",
+    "postgres_dsn": "dbname=contracheques",  # String de conexão do libpq
+    "pool_min": 1,                # Conexões mantidas abertas no pool
+    "pool_max": 10                # Conexões simultâneas por processo
+}
+
+# Cópia somente leitura do SQLite para os painéis de análise
+SNAPSHOT_CONFIG = {
+    "enabled": True,
+    "path": None,                 # Padrão: <banco>_snapshot.db ao lado do banco
+    "refresh_minutes": 15,        # Idade máxima antes de atualizar em segundo plano
+    "wal_mode": True              # Journal WAL: a cópia não bloqueia as gravações
+}
+
+# Consultas analíticas ad hoc (DuckDB, opcional: pip install duckdb)
+ANALYTICS_CONFIG = {
+    "path": "contracheques_analytics.duckdb",  # Cópia colunar carregada a partir da cópia dos painéis
+    "max_rows": 10000,            # Linhas exibidas por consulta
+    "memory_limit": "1GB"         # Memória máxima do DuckDB por conexão
 }
 
 # Configurações de OCR
 OCR_CONFIG = {
-    "languages": ["por", "eng"],  # Português e Inglês
+    "languages": ["por"],           # Idiomas de todo documento (os demais, por detecção)
+    # Idiomas acrescentados nos níveis seguintes só quando suas palavras
+    # aparecem no texto do nível rápido (cada modelo a mais encarece o OCR)
+    "language_detection": {
+        "enabled": True,
+        "min_matches": 3,           # Palavras do idioma encontradas
+        "min_ratio": 0.05,          # Proporção entre as palavras reconhecidas
+        "vocabulary": {
+            "eng": ["the", "and", "of", "for", "to", "pay", "payslip", "payroll", "salary", "gross", "net",
+                    "earnings", "deductions", "employee", "employer", "amount", "tax", "hours", "overtime"]
+        }
+    },
+    # Pastas tessdata por variante de modelo (tessdata_fast / tessdata_best),
+    # escolhida em cada nível; None ou pasta sem os idiomas usa a pasta padrão
+    "tessdata": {
+        "fast": None,
+        "best": None
+    },
     "confidence_threshold": 30,
-    "preprocessing": True
+    "preprocessing": True,
+    "page_workers": max(1, min(4, os.cpu_count() or 1)),  # Páginas/frames em paralelo
+    "max_tile_pixels": 12_000_000,  # Imagens maiores são processadas em faixas
+    "tile_overlap": 120,            # Sobreposição entre faixas (pixels)
+    "max_pages": 50,                # Documentos com mais páginas/frames são recusados
+    # DPI ajustado por documento pela altura-x do texto, medida numa
+    # renderização rápida da primeira página; os níveis mantêm a proporção
+    "dpi_autotune": {
+        "enabled": True,
+        "probe_dpi": 100,
+        "target_x_height": 30,      # Altura-x (pixels) no nível de maior DPI: faixa de maior precisão do Tesseract
+        "min_dpi": 100,
+        "max_dpi": 400,
+        "min_characters": 30        # Com menos caracteres medidos, mantém os DPIs dos níveis
+    },
+    # Orientação (90/180/270°) e inclinação estimadas por perfis de projeção
+    # numa cópia reduzida da página; só páginas fora do prumo são rotacionadas
+    "deskew": {
+        "enabled": True,
+        "probe_width": 800,         # Maior lado da cópia usada na estimativa (pixels)
+        "max_angle": 10,            # Inclinação máxima procurada (graus)
+        "min_angle": 0.3,           # Inclinações menores são ignoradas
+        "flip_threshold": 0.15      # Predomínio de tinta abaixo das linhas que indica página invertida
+    },
+    # Campos que, se ausentes, fazem o documento subir de nível
+    "required_fields": ["nome", "salario_liquido"],
+    # Níveis de qualidade: começa pelo mais barato e só reprocessa
+    # páginas com baixa confiança ou campos obrigatórios ausentes
+    "tiers": [
+        {"nome": "rapido", "dpi": 150, "preprocessing": False, "psm": 6, "modelo": "fast"},
+        {"nome": "completo", "dpi": 300, "preprocessing": True, "psm": 6, "modelo": "best"},
+        {"nome": "alternativo", "dpi": 300, "preprocessing": True, "psm": 4, "modelo": "best"}
+    ]
+}
+
+# Isolamento do OCR em processos de trabalho (app e API)
+OCR_SANDBOX_CONFIG = {
+    "enabled": True,
+    "workers": 2,                   # Processos do app (a API usa API_CONFIG["ocr_workers"])
+    "document_timeout": 600,        # Segundos por documento
+    "page_timeout": 180,            # Segundos sem nenhuma página concluída
+    "max_memory_mb": 4096,          # Espaço de endereçamento por processo (inclui Tesseract/Poppler)
+    "max_documents_per_worker": 50  # Processo substituído após N documentos
+}
+
+# Templates de regiões por empresa (OCR só dos campos)
+TEMPLATE_CONFIG = {
+    "enabled": True,
+    "min_documents": 2,          # Documentos analisados antes de ativar o template
+    "header_fraction": 0.25,     # Faixa do topo usada para identificar a empresa
+    "margin": 0.01,              # Margem relativa ao redor de cada região
+    "fields": ["nome", "cpf", "periodo", "empresa", "cargo",
+               "salario_bruto", "descontos", "salario_liquido"]
+}
+
+# API HTTP local de ingestão
+API_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 8502,
+    "queue_size": 100,           # Documentos aguardando OCR; acima disso responde 429
+    "ocr_workers": max(1, (os.cpu_count() or 2) - 1),
+    "max_upload_mb": 10,
+    "max_jobs_kept": 10000,      # Resultados mantidos em memória para consulta
+    "spool_folder": "temp/fila_api"  # Uploads (API e app) ainda não concluídos, retomáveis sem novo envio
+}
+
+# Configurações de logs
+LOG_CONFIG = {
+    "batch_size": 200,            # Registros gravados por lote
+    "flush_interval": 1.0,        # Segundos entre gravações em lote
+    "max_age_days": 180,          # Logs mais antigos são arquivados
+    "max_rows": 100000,           # Máximo de logs mantidos na tabela
+    "archive_folder": "logs_archive",
+    "rotation_interval_hours": 24
+}
+
+# Vinculação de contracheques a funcionários (CPF ou nome aproximado)
+EMPLOYEE_CONFIG = {
+    "similarity_threshold": 0.85,   # Similaridade mínima (Dice de trigramas) para vincular pelo nome
+    "max_candidates": 20,           # Candidatos comparados por busca aproximada
+    "blocking_budget": 2000         # Ocorrências de chaves de blocagem percorridas por busca
+}
+
+# Auditoria de qualidade dos dados
+AUDIT_CONFIG = {
+    "chunk_size": 50000,            # Contracheques lidos por vez
+    "tolerance": 0.01,              # Diferença aceita em Bruto - Descontos = Líquido
+    "min_year": 1990,               # Anos de período aceitos: min_year até o ano seguinte ao atual
+    "outlier_zscore": 3.5,          # Desvios-padrão em relação ao histórico do funcionário
+    "min_history": 4                # Contracheques mínimos do funcionário para avaliar desvios
+}
+
+# Detecção de anomalias salariais na inserção
+ANOMALY_CONFIG = {
+    "enabled": True,
+    "window": 12,                   # Últimos salários do funcionário usados como referência
+    "min_history": 3,               # Salários mínimos no histórico para avaliar saltos e quedas
+    "threshold": 3.5,               # Escore robusto (MAD) a partir do qual o salário é anômalo
+    "min_mad_ratio": 0.02           # Piso do MAD relativo à mediana (histórico constante)
+}
+
+# Armazenamento de blobs (texto do OCR e arquivos originais)
+BLOB_CONFIG = {
+    "store_original_files": True,   # Guardar o arquivo enviado junto com o texto do OCR
+    "compression_level": 6,         # Nível do zlib
+    "min_compression_gain": 0.05    # Abaixo deste ganho o conteúdo é guardado sem compactar
+}
+
+# Configurações de gráficos
+CHART_CONFIG = {
+    "downsample_threshold": 20000,  # Acima disso, gráficos usam dados resumidos
+    "histogram_bins": 20,
+    "box_resolution": 50            # Subfaixas por faixa do histograma para os quartis em blocos
 }
 
 # Padrões de regex para extração de dados
@@ -128,7 +283,8 @@ REGEX_PATTERNS = {
 
 # Criar pastas necessárias
 def create_required_folders():
-    folders = [APP_CONFIG["export_folder"], APP_CONFIG["temp_folder"]]
+    folders = [APP_CONFIG["export_folder"], APP_CONFIG["temp_folder"],
+               LOG_CONFIG["archive_folder"], API_CONFIG["spool_folder"]]
     for folder in folders:
         if not os.path.exists(folder):
             os.makedirs(folder) 
\ No newline at end of file
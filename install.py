@@ -7,6 +7,7 @@ import os
 import sys
 import subprocess
 import platform
+import json
 from pathlib import Path
 
 def print_header():
@@ -174,6 +175,55 @@ def test_imports():
         print(f"❌ Erro de importação: {e}")
         return False
 
+def check_import_time():
+    """Verifica se operações só de banco iniciam dentro do orçamento de tempo"""
+    print("\n⏱️  Verificando tempo de importação...")
+    
+    from config import APP_CONFIG
+    budget = APP_CONFIG["import_budget_seconds"]
+    heavy_modules = ["cv2", "pytesseract", "pdf2image", "numpy", "pandas", "plotly"]
+    
+    # Interpretador limpo, para medir a importação a frio
+    script = (
+        "import sys, time, json\n"
+        "start = time.perf_counter()\n"
+        "import utils\n"
+        "utils.Database\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"loaded = [m for m in {heavy_modules!r} if m in sys.modules]\n"
+        "print(json.dumps({'elapsed': elapsed, 'loaded': loaded}))\n"
+    )
+    
+    try:
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            capture_output=True,
+            text=True,
+            timeout=30,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        
+    except (subprocess.TimeoutExpired, ValueError, IndexError):
+        print("❌ Não foi possível medir o tempo de importação")
+        return False
+    
+    ok = True
+    
+    if report['loaded']:
+        print(f"❌ Módulos pesados carregados para operações de banco: {', '.join(report['loaded'])}")
+        ok = False
+    
+    if report['elapsed'] > budget:
+        print(f"❌ Importação levou {report['elapsed']:.2f}s (orçamento: {budget:.2f}s)")
+        ok = False
+    
+    if ok:
+        print(f"✅ Importação em {report['elapsed']:.3f}s (orçamento: {budget:.2f}s)")
+    
+    return ok
+
 def run_basic_test():
     """Executa um teste básico do sistema"""
     print("\n🎯 Executando teste básico...")
@@ -183,8 +233,8 @@ def run_basic_test():
         create_required_folders()
         print("✅ Criação de pastas - OK")
         
-        from utils import Database
-        db = Database()
+        from utils import create_database
+        db = create_database()
         stats = db.get_summary_statistics()
         print("✅ Conexão com banco de dados - OK")
         
@@ -229,6 +279,7 @@ def main():
     if success:
         create_directories()
         success &= test_imports()
+        success &= check_import_time()
         success &= run_basic_test()
     
     # Resultado final
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Teste de fumaça do backend PostgreSQL contra um servidor local
+
+Roda num esquema temporário, removido ao final. Pulado quando o psycopg2
+não está instalado ou não há servidor acessível.
+
+Uso:
+    CONTRACHEQUES_TEST_DSN="dbname=contracheques" python -m unittest tests.test_postgres_smoke
+"""
+
+import os
+import sys
+import unittest
+import uuid
+
+# Adicionar diretório do projeto ao path para imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import STORAGE_CONFIG
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+DSN = os.environ.get("CONTRACHEQUES_TEST_DSN", STORAGE_CONFIG["postgres_dsn"])
+
+def servidor_disponivel():
+    """Indica se há um PostgreSQL acessível pela DSN de teste"""
+    if psycopg2 is None:
+        return False
+    try:
+        psycopg2.connect(DSN, connect_timeout=3).close()
+    except psycopg2.OperationalError:
+        return False
+    return True
+
+@unittest.skipUnless(servidor_disponivel(), "PostgreSQL local indisponível (ou psycopg2 ausente)")
+class PostgresSmokeTest(unittest.TestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        from utils.postgres_database import PostgresDatabase
+        
+        cls.schema = f"teste_{uuid.uuid4().hex[:12]}"
+        with psycopg2.connect(DSN) as conn:
+            conn.cursor().execute(f"CREATE SCHEMA {cls.schema}")
+        conn.close()
+        
+        # Todas as conexões (pool, logs, índice de funcionários) usam o esquema temporário
+        cls.db = PostgresDatabase(f"{DSN} options='-c search_path={cls.schema}'")
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.flush_logs()
+        cls.db.pool.closeall()
+        with psycopg2.connect(DSN) as conn:
+            conn.cursor().execute(f"DROP SCHEMA {cls.schema} CASCADE")
+        conn.close()
+    
+    def dados(self, nome, cpf, periodo):
+        return {
+            'nome': nome, 'cpf': cpf, 'periodo': periodo, 'empresa': 'ACME',
+            'cargo': 'Analista', 'salario_bruto': 5000.0, 'salario_liquido': 4000.0,
+            'descontos': 1000.0
+        }
+    
+    def test_recursos(self):
+        self.assertTrue(self.db.supports('funcionarios'))
+        for recurso in ('ocr', 'anomalias', 'auditoria'):
+            self.assertFalse(self.db.supports(recurso))
+    
+    def test_regravacao_idempotente(self):
+        dados = self.dados('MARIA DA SILVA', '529.982.247-25', '01/2024')
+        primeiro = self.db.insert_contracheque(dados, 95.0, 'maria.pdf', arquivo_conteudo=b'maria')
+        segundo = self.db.insert_contracheque(dados, 96.0, 'maria.pdf', arquivo_conteudo=b'maria')
+        
+        self.assertEqual(primeiro, segundo)
+    
+    def test_insercao_em_lote(self):
+        registros = [
+            {'dados': self.dados(f'FUNCIONARIO {i}', None, f'{i:02d}/2023'),
+             'arquivo': f'lote_{i}.pdf', 'conteudo': f'lote_{i}'.encode()}
+            for i in range(1, 4)
+        ]
+        ids = self.db.insert_contracheques(registros)
+        
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(self.db.insert_contracheques(registros), ids)
+        
+        stats = self.db.get_summary_statistics()
+        self.assertGreaterEqual(stats['total_registros'], 3)
+        self.assertGreaterEqual(stats['funcionarios_unicos'], 3)
+    
+    def test_exclusao_remove_manifesto(self):
+        contracheque_id = self.db.insert_contracheque(
+            self.dados('JOSE SOUZA', '111.444.777-35', '02/2024'), 90.0, 'jose.pdf', arquivo_conteudo=b'jose'
+        )
+        self.db.save_manifest_entry('hash-jose', 'saved', arquivo='jose.pdf', contracheque_id=contracheque_id)
+        
+        self.assertTrue(self.db.delete_contracheque(contracheque_id))
+        self.assertEqual(self.db.get_manifest_entries(['hash-jose']), [])
+    
+    def test_logs(self):
+        self.db.log_action('teste', 'fumaça')
+        self.db.flush_logs()
+        
+        self.assertIn('teste', list(self.db.get_logs_page(limit=10)['tipo']))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,33 @@
 # Pacote de utilitários para o leitor de contracheques
+#
+# Os módulos são carregados sob demanda (PEP 562): importar apenas Database
+# não carrega OpenCV, Tesseract, pdf2image nem NumPy.
 
-from .ocr_processor import OCRProcessor
-from .data_extractor import DataExtractor
-from .database import Database
+import importlib
 
-__all__ = ['OCRProcessor', 'DataExtractor', 'Database'] 
\ No newline at end of file
+_LAZY_ATTRIBUTES = {
+    'OCRProcessor': '.ocr_processor',
+    'OCRSandbox': '.ocr_sandbox',
+    'DataExtractor': '.data_extractor',
+    'Database': '.database',
+    'PostgresDatabase': '.postgres_database',
+    'StorageBackend': '.storage',
+    'create_database': '.storage',
+    'TemplateRegistry': '.template_registry',
+    'IngestionManifest': '.ingestion_manifest',
+    'UploadedDocument': '.document'
+}
+
+__all__ = ['OCRProcessor', 'OCRSandbox', 'DataExtractor', 'Database', 'PostgresDatabase', 'StorageBackend',
+           'create_database', 'TemplateRegistry', 'IngestionManifest', 'UploadedDocument']
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
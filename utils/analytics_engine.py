@@ -0,0 +1,242 @@
+"""
+Consultas analíticas ad hoc com DuckDB
+
+Os contracheques da cópia dos painéis (read_replica) são carregados em
+blocos numa cópia colunar em arquivo DuckDB, recarregada quando a cópia de
+origem muda. As consultas abrem esse arquivo somente para leitura, sem
+acesso a arquivos externos e com a configuração travada, e só aceitam um
+SELECT: o SQL livre não altera nada nem lê ou grava fora da cópia.
+Agregações sobre milhões de linhas respondem em milissegundos.
+
+Uso:
+    python -m utils.analytics_engine [--consulta "Custo da folha por empresa"]
+"""
+
+import argparse
+import os
+import threading
+import time
+from config import ANALYTICS_CONFIG, SNAPSHOT_CONFIG
+
+try:
+    import duckdb
+except ImportError as e:
+    raise ImportError("As consultas analíticas requerem o DuckDB (pip install duckdb)") from e
+
+# Colunas copiadas e seus tipos no DuckDB
+COLUMNS = {
+    'id': 'BIGINT', 'nome': 'VARCHAR', 'cpf': 'VARCHAR', 'periodo': 'VARCHAR',
+    'empresa': 'VARCHAR', 'cargo': 'VARCHAR', 'salario_bruto': 'DOUBLE',
+    'salario_liquido': 'DOUBLE', 'descontos': 'DOUBLE', 'confianca_ocr': 'DOUBLE',
+    'validacao_status': 'VARCHAR', 'funcionario_id': 'BIGINT', 'created_at': 'TIMESTAMP'
+}
+
+PREDEFINED_QUERIES = {
+    "Funcionários por período": """
+        SELECT periodo,
+               COUNT(DISTINCT COALESCE(CAST(funcionario_id AS VARCHAR), nome)) AS funcionarios,
+               COUNT(*) AS contracheques
+        FROM contracheques
+        WHERE competencia IS NOT NULL
+        GROUP BY competencia, periodo
+        ORDER BY competencia
+    """,
+    "Custo da folha por período": """
+        SELECT periodo,
+               ROUND(SUM(salario_bruto), 2) AS total_bruto,
+               ROUND(SUM(descontos), 2) AS total_descontos,
+               ROUND(SUM(salario_liquido), 2) AS total_liquido
+        FROM contracheques
+        WHERE competencia IS NOT NULL
+        GROUP BY competencia, periodo
+        ORDER BY competencia
+    """,
+    "Custo da folha por empresa": """
+        SELECT COALESCE(empresa, '(sem empresa)') AS empresa,
+               COUNT(*) AS contracheques,
+               ROUND(SUM(salario_bruto), 2) AS total_bruto,
+               ROUND(SUM(salario_liquido), 2) AS total_liquido,
+               ROUND(AVG(salario_liquido), 2) AS liquido_medio
+        FROM contracheques
+        GROUP BY 1
+        ORDER BY total_bruto DESC NULLS LAST
+    """,
+    "Proporção de descontos por empresa": """
+        SELECT COALESCE(empresa, '(sem empresa)') AS empresa,
+               COUNT(*) AS contracheques,
+               ROUND(AVG(descontos / salario_bruto), 4) AS proporcao_media,
+               ROUND(quantile_cont(descontos / salario_bruto, 0.5), 4) AS proporcao_mediana,
+               ROUND(quantile_cont(descontos / salario_bruto, 0.9), 4) AS proporcao_p90
+        FROM contracheques
+        WHERE salario_bruto > 0 AND descontos IS NOT NULL
+        GROUP BY 1
+        ORDER BY proporcao_media DESC
+    """,
+    "Faixas salariais (líquido)": """
+        SELECT CAST(FLOOR(salario_liquido / 1000) * 1000 AS BIGINT) AS faixa_inicio,
+               COUNT(*) AS contracheques
+        FROM contracheques
+        WHERE salario_liquido IS NOT NULL
+        GROUP BY 1
+        ORDER BY 1
+    """
+}
+
+class AnalyticsEngine:
+    """Cópia colunar (DuckDB) dos contracheques para consultas ad hoc"""
+    
+    _instances = {}
+    _instances_lock = threading.Lock()
+    
+    @classmethod
+    def for_database(cls, database):
+        """Retorna o motor compartilhado do arquivo configurado"""
+        with cls._instances_lock:
+            engine = cls._instances.get(ANALYTICS_CONFIG["path"])
+            if engine is None:
+                engine = cls(database, ANALYTICS_CONFIG["path"])
+                cls._instances[ANALYTICS_CONFIG["path"]] = engine
+            return engine
+    
+    def __init__(self, database, path):
+        self.database = database
+        self.path = path
+        self.lock = threading.Lock()
+    
+    def _connect(self, path, read_only):
+        """Conexão sem acesso a arquivos além de path (read_csv, COPY, ATTACH, extensões)
+        
+        lock_configuration impede que um SET reabilite o acesso; DataFrames
+        registrados com register() continuam disponíveis para a carga.
+        """
+        return duckdb.connect(path, read_only=read_only, config={
+            'memory_limit': ANALYTICS_CONFIG['memory_limit'],
+            'enable_external_access': False,
+            'lock_configuration': True
+        })
+    
+    def load_info(self):
+        """Versão da origem, momento e tamanho da última carga (None se não houver)"""
+        if not os.path.exists(self.path):
+            return None
+        
+        conn = self._connect(self.path, read_only=True)
+        try:
+            row = conn.execute("SELECT versao, carregado_em, registros, tempo FROM carga").fetchone()
+        finally:
+            conn.close()
+        
+        return dict(zip(['versao', 'carregado_em', 'registros', 'tempo'], row)) if row else None
+    
+    def _stale(self, replica):
+        info = self.load_info()
+        if info is None:
+            return True
+        
+        # Origem com snapshot: recarrega quando a cópia muda; senão, por idade
+        if replica.snapshot_time:
+            return info['versao'] != replica.snapshot_time.isoformat()
+        
+        return time.time() - os.path.getmtime(self.path) > SNAPSHOT_CONFIG["refresh_minutes"] * 60
+    
+    def load(self, progress=None):
+        """Recarrega a cópia colunar a partir da cópia dos painéis
+        
+        progress, se informado, recebe (registros carregados) após cada bloco.
+        Retorna o número de contracheques carregados.
+        """
+        with self.lock:
+            start = time.time()
+            replica = self.database.read_replica()
+            versao = replica.snapshot_time.isoformat() if replica.snapshot_time else None
+            
+            temporario = f"{self.path}.tmp"
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            
+            conn = self._connect(temporario, read_only=False)
+            try:
+                conn.execute(f'''
+                    CREATE TABLE contracheques (
+                        {', '.join(f"{coluna} {tipo}" for coluna, tipo in COLUMNS.items())},
+                        competencia DATE
+                    )
+                ''')
+                
+                registros = 0
+                for bloco in replica.iter_contracheques(colunas=list(COLUMNS)):
+                    conn.register('bloco', bloco)
+                    conn.execute('''
+                        INSERT INTO contracheques
+                        SELECT *, CAST(try_strptime(periodo, '%m/%Y') AS DATE) FROM bloco
+                    ''')
+                    conn.unregister('bloco')
+                    
+                    registros += len(bloco)
+                    if progress:
+                        progress(registros)
+                
+                conn.execute("CREATE TABLE carga (versao VARCHAR, carregado_em TIMESTAMP, registros BIGINT, tempo DOUBLE)")
+                conn.execute("INSERT INTO carga VALUES (?, current_timestamp, ?, ?)",
+                             [versao, registros, time.time() - start])
+                conn.execute("CHECKPOINT")
+            finally:
+                conn.close()
+            
+            os.replace(temporario, self.path)
+        
+        self.database.log_action("analytics", f"Cópia analítica carregada: {registros} contracheques",
+                                 {"tempo": round(time.time() - start, 2)})
+        
+        return registros
+    
+    def ensure_loaded(self):
+        """Recarrega a cópia colunar se a origem mudou"""
+        if self._stale(self.database.read_replica()):
+            self.load()
+        return self
+    
+    def query(self, sql, max_rows=None):
+        """Executa uma consulta somente leitura
+        
+        Retorna (DataFrame com até max_rows linhas, tempo em segundos).
+        Levanta ValueError se sql não for um único SELECT.
+        """
+        max_rows = max_rows or ANALYTICS_CONFIG["max_rows"]
+        
+        conn = self._connect(self.path, read_only=True)
+        try:
+            comandos = conn.extract_statements(sql)
+            if len(comandos) != 1 or comandos[0].type != duckdb.StatementType.SELECT:
+                raise ValueError("Só é aceita uma única consulta SELECT")
+            
+            start = time.perf_counter()
+            df = conn.sql(sql).limit(max_rows).df()
+            return df, time.perf_counter() - start
+        finally:
+            conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas analíticas ad hoc (DuckDB)")
+    parser.add_argument("--consulta", choices=list(PREDEFINED_QUERIES), default=None,
+                        help="Consulta predefinida (padrão: todas)")
+    parser.add_argument("--recarregar", action="store_true", help="Recarrega a cópia colunar antes")
+    args = parser.parse_args()
+    
+    from .storage import create_database
+    
+    engine = AnalyticsEngine.for_database(create_database())
+    
+    if args.recarregar:
+        engine.load(lambda registros: print(f"\r🦆 {registros} contracheques carregados", end="", flush=True))
+        print()
+    else:
+        engine.ensure_loaded()
+    
+    for nome in [args.consulta] if args.consulta else PREDEFINED_QUERIES:
+        df, tempo = engine.query(PREDEFINED_QUERIES[nome])
+        print(f"\n{nome} ({tempo * 1000:.1f} ms)")
+        print(df.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import statistics
+import warnings
+from config import ANOMALY_CONFIG
+
+# Fator que torna o MAD comparável ao desvio-padrão (distribuição normal)
+MAD_SCALE = 0.6745
+
+class AnomalyDetector:
+    """Detecção de anomalias no histórico salarial de cada funcionário
+    
+    Cada contracheque é comparado com a mediana e o MAD (desvio absoluto
+    mediano) dos últimos ANOMALY_CONFIG["window"] salários líquidos do
+    funcionário. Na inserção, o histórico vem da tabela historico_salarial
+    (janela fixa, custo constante); no modo em lote, todo o histórico é
+    pontuado de forma vetorizada.
+    """
+    
+    def __init__(self):
+        self.window = ANOMALY_CONFIG["window"]
+        self.min_history = ANOMALY_CONFIG["min_history"]
+        self.threshold = ANOMALY_CONFIG["threshold"]
+        self.min_mad_ratio = ANOMALY_CONFIG["min_mad_ratio"]
+    
+    def _robust_score(self, liquido, mediana, mad):
+        # Histórico constante tem MAD zero: usa um piso relativo à mediana
+        mad = max(mad, abs(mediana) * self.min_mad_ratio, 0.01)
+        return MAD_SCALE * (liquido - mediana) / mad
+    
+    def score(self, valores, periodo, liquido, duplicados=0):
+        """Avalia um contracheque contra a janela do histórico
+        
+        valores é a lista [[periodo, liquido], ...] do funcionário e
+        duplicados o número de contracheques já gravados no mesmo período.
+        Retorna lista de (tipo, score, detalhe).
+        """
+        anomalias = []
+        
+        if duplicados:
+            anomalias.append(('pagamento_duplicado', float(duplicados),
+                              f"{duplicados} contracheque(s) já registrado(s) para {periodo}"))
+        
+        salarios = [valor for _, valor in valores if valor is not None]
+        if liquido is None or len(salarios) < self.min_history:
+            return anomalias
+        
+        mediana = statistics.median(salarios)
+        mad = statistics.median(abs(valor - mediana) for valor in salarios)
+        score = self._robust_score(liquido, mediana, mad)
+        
+        if score > self.threshold:
+            anomalias.append(('salto_salarial', score, f"Líquido {liquido:.2f} acima da mediana {mediana:.2f}"))
+        elif score < -self.threshold:
+            anomalias.append(('queda_salarial', score, f"Líquido {liquido:.2f} abaixo da mediana {mediana:.2f}"))
+        
+        return anomalias
+    
+    def update(self, valores, periodo, liquido):
+        """Acrescenta o contracheque à janela do histórico"""
+        if liquido is None:
+            return valores
+        return (valores + [[periodo, liquido]])[-self.window:]
+    
+    def score_batch(self, df):
+        """Pontua todo o histórico de uma vez (pandas/NumPy)
+        
+        df tem id, funcionario_id, periodo e salario_liquido. Cada linha é
+        comparada com as anteriores do mesmo funcionário, por período (MM/AAAA).
+        Retorna (anomalias, historicos): DataFrame com contracheque_id, tipo,
+        score e detalhe, e dict funcionario_id -> janela final.
+        """
+        import numpy as np
+        import pandas as pd
+        
+        df = df[df['funcionario_id'].notna()].copy()
+        if df.empty:
+            return pd.DataFrame(columns=['contracheque_id', 'tipo', 'score', 'detalhe']), {}
+        
+        partes = df['periodo'].fillna('').str.extract(r'^(\d{2})/(\d{4})$')
+        df['ordem'] = pd.to_numeric(partes[1] + partes[0], errors='coerce')
+        df = df.sort_values(['funcionario_id', 'ordem', 'id'], na_position='first')
+        
+        liquido = df['salario_liquido'].astype(float)
+        com_salario = liquido.notna().to_numpy()
+        
+        # Matriz (n, janela) com os salários anteriores do mesmo funcionário;
+        # salários ausentes não ocupam posição na janela, como em update()
+        anteriores = np.full((len(df), self.window), np.nan)
+        if com_salario.any():
+            grupos = liquido[com_salario].groupby(df['funcionario_id'][com_salario])
+            anteriores[com_salario] = np.column_stack([grupos.shift(k).to_numpy() for k in range(1, self.window + 1)])
+        quantidade = np.sum(~np.isnan(anteriores), axis=1)
+        
+        # Linhas sem histórico geram NaN (e o aviso de fatia vazia do NumPy)
+        with warnings.catch_warnings(), np.errstate(invalid='ignore'):
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mediana = np.nanmedian(anteriores, axis=1)
+            mad = np.nanmedian(np.abs(anteriores - mediana[:, None]), axis=1)
+            
+            mad = np.fmax(np.fmax(mad, np.abs(mediana) * self.min_mad_ratio), 0.01)
+            score = MAD_SCALE * (liquido.to_numpy() - mediana) / mad
+        
+        avaliado = (quantidade >= self.min_history) & ~np.isnan(liquido.to_numpy())
+        frames = []
+        
+        for tipo, mask, texto in [
+            ('salto_salarial', avaliado & (score > self.threshold), "acima"),
+            ('queda_salarial', avaliado & (score < -self.threshold), "abaixo")
+        ]:
+            if mask.any():
+                frames.append(pd.DataFrame({
+                    'contracheque_id': df['id'].to_numpy()[mask],
+                    'tipo': tipo,
+                    'score': score[mask],
+                    'detalhe': [f"Líquido {v:.2f} {texto} da mediana {m:.2f}"
+                                for v, m in zip(liquido.to_numpy()[mask], mediana[mask])]
+                }))
+        
+        # Pagamentos duplicados: mesmo funcionário e período (exceto o primeiro)
+        com_periodo = df['periodo'].notna()
+        ordem_no_periodo = df[com_periodo].groupby(['funcionario_id', 'periodo']).cumcount()
+        duplicados = df[com_periodo][ordem_no_periodo > 0]
+        if not duplicados.empty:
+            frames.append(pd.DataFrame({
+                'contracheque_id': duplicados['id'].to_numpy(),
+                'tipo': 'pagamento_duplicado',
+                'score': ordem_no_periodo[ordem_no_periodo > 0].astype(float).to_numpy(),
+                'detalhe': [f"Contracheque repetido para {periodo}" for periodo in duplicados['periodo']]
+            }))
+        
+        anomalias = (pd.concat(frames, ignore_index=True) if frames
+                     else pd.DataFrame(columns=['contracheque_id', 'tipo', 'score', 'detalhe']))
+        
+        # Janela final de cada funcionário, para as próximas inserções
+        validos = df[liquido.notna()]
+        historicos = {
+            int(funcionario_id): [[p, float(v)] for p, v in zip(grupo['periodo'], grupo['salario_liquido'])]
+            for funcionario_id, grupo in validos.groupby('funcionario_id').tail(self.window).groupby('funcionario_id')
+        }
+        
+        return anomalias, historicos
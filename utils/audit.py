@@ -0,0 +1,158 @@
+"""
+Auditoria de qualidade dos dados
+
+Percorre todos os contracheques em blocos (memória limitada), refaz as
+verificações de consistência de forma vetorizada (pandas/NumPy) e grava os
+achados em auditoria_achados. Apenas os achados da última execução são
+mantidos.
+
+Regras:
+    valor_negativo          salário bruto ou líquido negativo
+    inconsistencia_valores  Bruto - Descontos ≠ Líquido
+    cpf_invalido            CPF presente com dígitos verificadores inválidos
+    periodo_ausente         período não extraído
+    periodo_invalido        período fora do formato MM/AAAA ou de anos plausíveis
+    salario_atipico         líquido muito distante do histórico do funcionário
+    status_desatualizado    validacao_status gravado difere do recalculado
+
+Uso:
+    python -m utils.audit [--bloco 50000]
+"""
+
+import argparse
+import time
+from datetime import datetime
+from config import AUDIT_CONFIG
+from .data_extractor import DataExtractor
+
+COLUMNS = ['id', 'nome', 'cpf', 'periodo', 'salario_bruto', 'salario_liquido',
+           'descontos', 'validacao_status', 'funcionario_id']
+
+def audit_chunk(df, stats, extractor):
+    """Aplica as regras a um bloco de contracheques
+    
+    stats é o histórico por funcionário (get_employee_salary_stats), indexado
+    por funcionario_id. Retorna lista de (contracheque_id, regra, severidade, detalhe).
+    """
+    import numpy as np
+    import pandas as pd
+    
+    frames = []
+    
+    def add(mask, regra, severidade, detalhe):
+        if mask.any():
+            frames.append(pd.DataFrame({
+                'contracheque_id': df.loc[mask, 'id'],
+                'regra': regra,
+                'severidade': severidade,
+                'detalhe': detalhe[mask] if isinstance(detalhe, pd.Series) else detalhe
+            }))
+    
+    bruto = pd.to_numeric(df['salario_bruto'], errors='coerce').fillna(0)
+    liquido = pd.to_numeric(df['salario_liquido'], errors='coerce').fillna(0)
+    descontos = pd.to_numeric(df['descontos'], errors='coerce').fillna(0)
+    
+    # Valores
+    negativo = (bruto < 0) | (liquido < 0)
+    add(negativo, 'valor_negativo', 'erro', "Salário negativo")
+    
+    diferenca = (bruto - descontos) - liquido
+    inconsistente = (bruto != 0) & (liquido != 0) & (diferenca.abs() > AUDIT_CONFIG["tolerance"])
+    add(inconsistente, 'inconsistencia_valores', 'aviso',
+        "Bruto - Descontos - Líquido = " + diferenca.round(2).astype(str))
+    
+    # CPF
+    cpf = df['cpf'].fillna('').astype(str)
+    cpf_valido = pd.Series(extractor.validate_cpf_batch(cpf.tolist()), index=df.index)
+    add((cpf != '') & ~cpf_valido, 'cpf_invalido', 'aviso', "CPF com dígitos verificadores inválidos")
+    
+    # Período
+    periodo = df['periodo'].fillna('').astype(str)
+    add(periodo == '', 'periodo_ausente', 'aviso', "Período não encontrado")
+    
+    partes = periodo.str.extract(r'^(\d{2})/(\d{4})$')
+    mes = pd.to_numeric(partes[0], errors='coerce')
+    ano = pd.to_numeric(partes[1], errors='coerce')
+    periodo_ok = (mes.between(1, 12) & ano.between(AUDIT_CONFIG["min_year"], datetime.now().year + 1))
+    add((periodo != '') & ~periodo_ok, 'periodo_invalido', 'erro', "Período inválido: " + periodo)
+    
+    # Desvio em relação ao histórico do funcionário
+    historico = stats.reindex(df['funcionario_id'])
+    media = pd.Series(historico['media'].to_numpy(), index=df.index)
+    desvio = pd.Series(np.sqrt(historico['variancia'].clip(lower=0).to_numpy()), index=df.index)
+    qtd = pd.Series(historico['qtd'].to_numpy(), index=df.index)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zscore = (liquido - media) / desvio
+    atipico = ((qtd >= AUDIT_CONFIG["min_history"]) & (desvio > 0) & df['salario_liquido'].notna()
+               & (zscore.abs() > AUDIT_CONFIG["outlier_zscore"]))
+    add(atipico, 'salario_atipico', 'aviso',
+        "z = " + zscore.round(1).astype(str) + " (média do funcionário: " + media.round(2).astype(str) + ")")
+    
+    # Status de validação gravado x recalculado (mesmas regras de validate_data)
+    nome = df['nome'].fillna('').astype(str)
+    valido = (nome != '') & (liquido != 0) & (bruto >= 0) & (liquido >= 0)
+    gravado = df['validacao_status'].fillna('') == 'válido'
+    add(valido != gravado, 'status_desatualizado', 'aviso',
+        "Gravado: " + df['validacao_status'].fillna('-').astype(str)
+        + ", recalculado: " + valido.map({True: 'válido', False: 'inválido'}))
+    
+    if not frames:
+        return []
+    
+    return list(pd.concat(frames).itertuples(index=False, name=None))
+
+def run_audit(database, chunk_size=None, progress=None):
+    """Audita todos os contracheques
+    
+    progress, se informado, recebe (registros auditados) após cada bloco.
+    Retorna estatísticas da execução.
+    """
+    start = time.time()
+    chunk_size = chunk_size or AUDIT_CONFIG["chunk_size"]
+    extractor = DataExtractor()
+    
+    stats = database.get_employee_salary_stats().set_index('funcionario_id')
+    execucao_id = database.start_audit_run()
+    
+    registros = 0
+    achados = 0
+    
+    for df in database.iter_contracheques(chunk_size, COLUMNS):
+        resultado = audit_chunk(df, stats, extractor)
+        database.save_audit_findings(execucao_id, resultado)
+        
+        registros += len(df)
+        achados += len(resultado)
+        
+        if progress:
+            progress(registros)
+    
+    tempo = time.time() - start
+    database.finish_audit_run(execucao_id, registros, achados, tempo)
+    
+    return {"execucao_id": execucao_id, "registros": registros, "achados": achados, "tempo": tempo}
+
+def main():
+    parser = argparse.ArgumentParser(description="Auditoria de qualidade dos dados dos contracheques")
+    parser.add_argument("--bloco", type=int, default=None, help="Contracheques lidos por vez")
+    args = parser.parse_args()
+    
+    from .storage import create_database
+    
+    database = create_database()
+    if not database.supports('auditoria'):
+        parser.error(f"o banco configurado ({type(database).__name__}) não oferece a auditoria")
+    
+    def mostrar_progresso(registros):
+        print(f"\r🔎 {registros} contracheques auditados", end="", flush=True)
+    
+    stats = run_audit(database, args.bloco, mostrar_progresso)
+    print(f"\n✅ {stats['achados']} achados em {stats['registros']} contracheques ({stats['tempo']:.1f}s)")
+    
+    resumo = database.get_audit_summary()
+    if resumo is not None and not resumo['por_regra'].empty:
+        print(resumo['por_regra'].to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,12 @@
 import re
-import pandas as pd
 from datetime import datetime
 from config import REGEX_PATTERNS
 
 class DataExtractor:
     def __init__(self):
         self.patterns = REGEX_PATTERNS
+        self.fields = ['nome', 'cpf', 'periodo', 'salario_bruto', 'salario_liquido', 
+                       'descontos', 'empresa', 'cargo']
     
     def clean_currency_value(self, value_str):
         """Limpa e converte valor monetário para float"""
@@ -61,6 +62,22 @@ class DataExtractor:
         
         return None
     
+    def locate_field(self, text, field_name):
+        """Retorna o trecho (início, fim) do texto que contém o campo"""
+        for pattern in self.patterns.get(field_name, []):
+            match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+            if match:
+                return match.span()
+        
+        return None
+    
+    def extract_from_ocr_result(self, ocr_result):
+        """Extrai dados do resultado do OCR (página inteira ou regiões)"""
+        if ocr_result.get('fields'):
+            return self.extract_from_fields(ocr_result['fields'], ocr_result['text'])
+        
+        return self.extract_all_data(ocr_result['text'])
+    
     def clean_text_field(self, text):
         """Limpa campos de texto removendo caracteres indesejados"""
         if not text:
@@ -80,12 +97,29 @@ class DataExtractor:
         extracted_data = {}
         
         # Campos básicos
-        fields = ['nome', 'cpf', 'periodo', 'salario_bruto', 'salario_liquido', 
-                 'descontos', 'empresa', 'cargo']
-        
-        for field in fields:
+        for field in self.fields:
             extracted_data[field] = self.extract_field(text, field)
         
+        return self._complete_data(extracted_data, text)
+    
+    def extract_from_fields(self, field_texts, text=None):
+        """Extrai dados a partir do texto OCR de cada região de campo
+        
+        Usado com templates de empresa: cada campo é procurado apenas no
+        recorte correspondente.
+        """
+        extracted_data = {}
+        
+        for field in self.fields:
+            extracted_data[field] = self.extract_field(field_texts.get(field, ""), field)
+        
+        if text is None:
+            text = "\n".join(field_texts.values())
+        
+        return self._complete_data(extracted_data, text)
+    
+    def _complete_data(self, extracted_data, text):
+        """Calcula campos derivados e adiciona metadados"""
         # Campos calculados
         bruto = extracted_data.get('salario_bruto', 0) or 0
         liquido = extracted_data.get('salario_liquido', 0) or 0
@@ -105,8 +139,11 @@ class DataExtractor:
         
         return extracted_data
     
-    def validate_data(self, data):
-        """Valida os dados extraídos"""
+    def validate_data(self, data, cpf_valid=None):
+        """Valida os dados extraídos
+        
+        cpf_valid pode vir pré-calculado (validate_data_batch).
+        """
         validation_errors = []
         warnings = []
         
@@ -133,7 +170,9 @@ class DataExtractor:
         
         # Validação de CPF
         cpf = data.get('cpf', '')
-        if cpf and not self.validate_cpf(cpf):
+        if cpf_valid is None:
+            cpf_valid = bool(cpf) and self.validate_cpf(cpf)
+        if cpf and not cpf_valid:
             warnings.append("CPF pode estar incorreto")
         
         return {
@@ -166,8 +205,60 @@ class DataExtractor:
         
         return cpf_digits[9] == str(digito1) and cpf_digits[10] == str(digito2)
     
+    def validate_data_batch(self, data_list):
+        """Valida vários registros, com os CPFs verificados de uma vez"""
+        cpf_valid = self.validate_cpf_batch([data.get('cpf') for data in data_list])
+        return [self.validate_data(data, bool(valid)) for data, valid in zip(data_list, cpf_valid)]
+    
+    def _cpf_digit_matrix(self, cpfs):
+        """Converte CPFs em matriz (n, 11) de dígitos e indica quais têm 11 dígitos"""
+        import numpy as np
+        
+        encoded = [str(cpf).encode('ascii', 'ignore') if cpf else b'' for cpf in cpfs]
+        width = max([len(cpf) for cpf in encoded] + [11])
+        
+        chars = np.frombuffer(np.array(encoded, dtype=f'S{width}').tobytes(), dtype=np.uint8)
+        chars = chars.reshape(len(encoded), width)
+        
+        is_digit = (chars >= ord('0')) & (chars <= ord('9'))
+        has_11 = is_digit.sum(axis=1) == 11
+        
+        # Posição de cada dígito entre os dígitos da linha (os 11 primeiros)
+        rank = np.cumsum(is_digit, axis=1) - 1
+        rows, cols = np.nonzero(is_digit & (rank < 11))
+        
+        digits = np.zeros((len(encoded), 11), dtype=np.int64)
+        digits[rows, rank[rows, cols]] = chars[rows, cols] - ord('0')
+        
+        return digits, has_11
+    
+    def validate_cpf_batch(self, cpfs):
+        """Valida vários CPFs de uma vez (NumPy); retorna array booleano
+        
+        Mesmo algoritmo de validate_cpf, com os dígitos verificadores
+        calculados por produto de matrizes.
+        """
+        import numpy as np
+        
+        if len(cpfs) == 0:
+            return np.zeros(0, dtype=bool)
+        
+        digits, has_11 = self._cpf_digit_matrix(cpfs)
+        
+        resto = (digits[:, :9] @ np.arange(10, 1, -1)) % 11
+        digito1 = np.where(resto < 2, 0, 11 - resto)
+        
+        resto = (digits[:, :10] @ np.arange(11, 1, -1)) % 11
+        digito2 = np.where(resto < 2, 0, 11 - resto)
+        
+        repetidos = (digits == digits[:, :1]).all(axis=1)
+        
+        return has_11 & ~repetidos & (digits[:, 9] == digito1) & (digits[:, 10] == digito2)
+    
     def create_summary_dataframe(self, data_list):
         """Cria DataFrame resumo a partir de lista de dados extraídos"""
+        import pandas as pd
+        
         if not data_list:
             return pd.DataFrame()
         
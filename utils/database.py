@@ -1,19 +1,56 @@
 import sqlite3
-import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import json
-from config import APP_CONFIG
+import hashlib
+import zlib
+from config import APP_CONFIG, LOG_CONFIG, BLOB_CONFIG, ANOMALY_CONFIG, SNAPSHOT_CONFIG
+from .log_writer import LogWriter
+from .employee_index import EmployeeIndex, normalize_name, phonetic_key
+from .anomaly_detector import AnomalyDetector
+from .storage import StorageBackend
 
-class Database:
+def _read_sql_query(query, conn, params=None):
+    """pd.read_sql_query com importação tardia do pandas"""
+    import pandas as pd
+    return pd.read_sql_query(query, conn, params=params)
+
+class Database(StorageBackend):
+    """Armazenamento em SQLite (arquivo local), implementação padrão"""
+    
+    FEATURES = frozenset({'ocr', 'funcionarios', 'anomalias', 'auditoria'})
+    
     def __init__(self, db_path=None):
         self.db_path = db_path or APP_CONFIG["database_file"]
+        self._employee_index = None
+        self.anomaly_detector = AnomalyDetector()
         self.init_database()
+        self.log_writer = LogWriter.for_database(self.db_path)
+        
+        if self._vincular_funcionarios:
+            self.link_employees()
+        self._rotate_logs_if_due()
+    
+    def read_replica(self):
+        """Banco das consultas pesadas dos painéis
+        
+        Com SNAPSHOT_CONFIG["enabled"], uma cópia somente leitura atualizada
+        periodicamente (SnapshotDatabase); senão o próprio banco.
+        """
+        if not SNAPSHOT_CONFIG["enabled"]:
+            return self
+        
+        from .snapshot import SnapshotDatabase
+        return SnapshotDatabase.for_database(self).ensure_fresh()
     
     def init_database(self):
         """Inicializa o banco de dados com as tabelas necessárias"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
             
+            # Em WAL, leitores (inclusive a cópia dos painéis) não bloqueiam gravações
+            if SNAPSHOT_CONFIG["wal_mode"]:
+                cursor.execute("PRAGMA journal_mode=WAL")
+            
             # Tabela principal de contracheques
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS contracheques (
@@ -33,6 +70,71 @@ class Database:
                     validacao_status TEXT,
                     validacao_erros TEXT,
                     validacao_avisos TEXT,
+                    texto_hash TEXT,
+                    arquivo_hash TEXT,
+                    funcionario_id INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Bancos anteriores: referências aos blobs e ao funcionário
+            cursor.execute("PRAGMA table_info(contracheques)")
+            colunas = {row[1] for row in cursor.fetchall()}
+            for coluna, tipo in [('texto_hash', 'TEXT'), ('arquivo_hash', 'TEXT'),
+                                 ('funcionario_id', 'INTEGER')]:
+                if coluna not in colunas:
+                    cursor.execute(f"ALTER TABLE contracheques ADD COLUMN {coluna} {tipo}")
+            
+            # Contracheques existentes ainda sem funcionário vinculado
+            self._vincular_funcionarios = 'funcionario_id' not in colunas
+            
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_contracheques_texto_hash ON contracheques(texto_hash)")
+            
+            # Chave da gravação idempotente (mesmo arquivo, CPF e período)
+            cursor.execute("DROP INDEX IF EXISTS idx_contracheques_arquivo_hash")
+            cursor.execute("PRAGMA index_list(contracheques)")
+            if not {row[1]: row[2] for row in cursor.fetchall()}.get('idx_contracheques_arquivo_cpf_periodo'):
+                # Bancos anteriores: índice não único, e gravações concorrentes
+                # podem ter repetido a chave; as repetições perdem o hash do
+                # arquivo (continuam gravadas, mas fora da chave)
+                cursor.execute("DROP INDEX IF EXISTS idx_contracheques_arquivo_cpf_periodo")
+                cursor.execute('''
+                    UPDATE contracheques SET arquivo_hash = NULL
+                    WHERE arquivo_hash IS NOT NULL AND id NOT IN (
+                        SELECT MIN(id) FROM contracheques
+                        WHERE arquivo_hash IS NOT NULL
+                        GROUP BY arquivo_hash, COALESCE(cpf, ''), COALESCE(periodo, '')
+                    )
+                ''')
+                cursor.execute(f'''
+                    CREATE UNIQUE INDEX idx_contracheques_arquivo_cpf_periodo
+                    ON contracheques {self.UPSERT_TARGET}
+                ''')
+            cursor.execute("DROP INDEX IF EXISTS idx_contracheques_funcionario")
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_contracheques_funcionario_periodo
+                ON contracheques(funcionario_id, periodo)
+            ''')
+            
+            # Funcionários identificados pelo CPF válido ou pelo nome
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS funcionarios (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    cpf TEXT UNIQUE,
+                    nome TEXT,
+                    nome_normalizado TEXT,
+                    chave_fonetica TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Blobs endereçados pelo conteúdo (texto completo do OCR e arquivos originais)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS blobs (
+                    hash TEXT PRIMARY KEY,
+                    tamanho INTEGER NOT NULL,
+                    compressao TEXT NOT NULL,
+                    dados BLOB NOT NULL,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
@@ -58,90 +160,1006 @@ class Database:
                 )
             ''')
             
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp)")
+            
+            # Caixas das palavras e recortes de campos do OCR (o texto fica em blobs)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS ocr_resultados (
+                    contracheque_id INTEGER PRIMARY KEY,
+                    palavras BLOB,
+                    campos BLOB,
+                    ajuste_dpi TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Bancos anteriores: DPIs escolhidos pelo ajuste automático
+            cursor.execute("PRAGMA table_info(ocr_resultados)")
+            if 'ajuste_dpi' not in {row[1] for row in cursor.fetchall()}:
+                cursor.execute("ALTER TABLE ocr_resultados ADD COLUMN ajuste_dpi TEXT")
+            
+            # Janela dos últimos salários de cada funcionário (detecção de anomalias)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS historico_salarial (
+                    funcionario_id INTEGER PRIMARY KEY,
+                    valores TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS anomalias (
+                    contracheque_id INTEGER NOT NULL,
+                    tipo TEXT NOT NULL,
+                    score REAL,
+                    detalhe TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_anomalias_contracheque ON anomalias(contracheque_id)")
+            
+            # Auditorias de qualidade dos dados (apenas os achados da última execução)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS auditoria_execucoes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    iniciada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    concluida_em TIMESTAMP,
+                    registros INTEGER,
+                    achados INTEGER,
+                    tempo REAL
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS auditoria_achados (
+                    execucao_id INTEGER NOT NULL,
+                    contracheque_id INTEGER NOT NULL,
+                    regra TEXT NOT NULL,
+                    severidade TEXT NOT NULL,
+                    detalhe TEXT
+                )
+            ''')
+            
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_auditoria_achados_execucao ON auditoria_achados(execucao_id, regra)")
+            
+            # Manifesto de ingestão: etapa de cada arquivo, para retomar lotes interrompidos
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS manifesto_arquivos (
+                    arquivo_hash TEXT PRIMARY KEY,
+                    arquivo TEXT,
+                    estado TEXT NOT NULL,
+                    caminho TEXT,
+                    resultado_ocr BLOB,
+                    dados TEXT,
+                    validacao TEXT,
+                    contracheque_id INTEGER,
+                    erro TEXT,
+                    tentativas INTEGER NOT NULL DEFAULT 0,
+                    atualizado_em TIMESTAMP
+                )
+            ''')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_manifesto_estado ON manifesto_arquivos(estado)")
+            
+            # Templates de regiões de campos por empresa
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS templates_empresa (
+                    empresa TEXT PRIMARY KEY,
+                    regioes TEXT NOT NULL,
+                    documentos INTEGER NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Tabelas de agregados materializados (mantidas por triggers)
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'resumo_periodo'")
+            agregados_existentes = cursor.fetchone() is not None
+            
+            # Bancos anteriores: agregados por funcionário eram chaveados pelo nome
+            cursor.execute("PRAGMA table_info(resumo_funcionario)")
+            if 'nome' in {row[1] for row in cursor.fetchall()}:
+                for trigger in ['trg_resumo_insert', 'trg_resumo_delete', 'trg_resumo_update']:
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+                cursor.execute("DROP TABLE resumo_funcionario")
+                cursor.execute("DROP TABLE IF EXISTS resumo_periodo_funcionario")
+                agregados_existentes = False
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS resumo_periodo (
+                    periodo TEXT PRIMARY KEY,
+                    qtd_registros INTEGER NOT NULL DEFAULT 0,
+                    qtd_salarios INTEGER NOT NULL DEFAULT 0,
+                    soma_liquido REAL NOT NULL DEFAULT 0
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS resumo_periodo_funcionario (
+                    periodo TEXT NOT NULL,
+                    funcionario_id INTEGER NOT NULL,
+                    qtd_registros INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (periodo, funcionario_id)
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS resumo_empresa (
+                    empresa TEXT PRIMARY KEY,
+                    qtd_registros INTEGER NOT NULL DEFAULT 0,
+                    qtd_salarios INTEGER NOT NULL DEFAULT 0,
+                    soma_liquido REAL NOT NULL DEFAULT 0
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS resumo_funcionario (
+                    funcionario_id INTEGER PRIMARY KEY,
+                    qtd_registros INTEGER NOT NULL DEFAULT 0,
+                    qtd_salarios INTEGER NOT NULL DEFAULT 0,
+                    soma_liquido REAL NOT NULL DEFAULT 0
+                )
+            ''')
+            
+            self._create_aggregate_triggers(cursor)
+            
+            if not agregados_existentes:
+                self._rebuild_aggregates(cursor)
+            
+            conn.commit()
+    
+    def _aggregate_statements(self, row, sign):
+        """Gera os comandos que aplicam uma linha (NEW/OLD) aos agregados"""
+        tem_salario = f"({row}.salario_liquido IS NOT NULL)"
+        valor = f"COALESCE({row}.salario_liquido, 0)"
+        
+        statements = []
+        for tabela, chave in [('resumo_periodo', 'periodo'),
+                              ('resumo_empresa', 'empresa'),
+                              ('resumo_funcionario', 'funcionario_id')]:
+            statements.append(f'''
+                INSERT INTO {tabela} ({chave}, qtd_registros, qtd_salarios, soma_liquido)
+                SELECT {row}.{chave}, {sign}1, {sign}{tem_salario}, {sign}{valor}
+                WHERE {row}.{chave} IS NOT NULL
+                ON CONFLICT({chave}) DO UPDATE SET
+                    qtd_registros = qtd_registros + excluded.qtd_registros,
+                    qtd_salarios = qtd_salarios + excluded.qtd_salarios,
+                    soma_liquido = soma_liquido + excluded.soma_liquido;
+                DELETE FROM {tabela} WHERE {chave} = {row}.{chave} AND qtd_registros <= 0;
+            ''')
+        
+        statements.append(f'''
+                INSERT INTO resumo_periodo_funcionario (periodo, funcionario_id, qtd_registros)
+                SELECT {row}.periodo, {row}.funcionario_id, {sign}1
+                WHERE {row}.periodo IS NOT NULL AND {row}.funcionario_id IS NOT NULL
+                ON CONFLICT(periodo, funcionario_id) DO UPDATE SET
+                    qtd_registros = qtd_registros + excluded.qtd_registros;
+                DELETE FROM resumo_periodo_funcionario
+                WHERE periodo = {row}.periodo AND funcionario_id = {row}.funcionario_id
+                  AND qtd_registros <= 0;
+        ''')
+        
+        return ''.join(statements)
+    
+    def _create_aggregate_triggers(self, cursor):
+        """Cria triggers que mantêm os agregados incrementalmente"""
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_resumo_insert
+            AFTER INSERT ON contracheques
+            BEGIN
+                {self._aggregate_statements('NEW', '+')}
+            END
+        ''')
+        
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_resumo_delete
+            AFTER DELETE ON contracheques
+            BEGIN
+                {self._aggregate_statements('OLD', '-')}
+            END
+        ''')
+        
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_resumo_update
+            AFTER UPDATE OF funcionario_id, periodo, empresa, salario_liquido ON contracheques
+            BEGIN
+                {self._aggregate_statements('OLD', '-')}
+                {self._aggregate_statements('NEW', '+')}
+            END
+        ''')
+    
+    def _rebuild_aggregates(self, cursor):
+        """Recalcula todos os agregados a partir da tabela principal"""
+        for tabela, chave in [('resumo_periodo', 'periodo'),
+                              ('resumo_empresa', 'empresa'),
+                              ('resumo_funcionario', 'funcionario_id')]:
+            cursor.execute(f"DELETE FROM {tabela}")
+            cursor.execute(f'''
+                INSERT INTO {tabela} ({chave}, qtd_registros, qtd_salarios, soma_liquido)
+                SELECT {chave}, COUNT(*), COUNT(salario_liquido), COALESCE(SUM(salario_liquido), 0)
+                FROM contracheques
+                WHERE {chave} IS NOT NULL
+                GROUP BY {chave}
+            ''')
+        
+        cursor.execute("DELETE FROM resumo_periodo_funcionario")
+        cursor.execute('''
+            INSERT INTO resumo_periodo_funcionario (periodo, funcionario_id, qtd_registros)
+            SELECT periodo, funcionario_id, COUNT(*)
+            FROM contracheques
+            WHERE periodo IS NOT NULL AND funcionario_id IS NOT NULL
+            GROUP BY periodo, funcionario_id
+        ''')
+    
+    def rebuild_aggregates(self):
+        """Reconstrói os agregados materializados (manutenção)"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            self._rebuild_aggregates(cursor)
+            conn.commit()
+    
+    # Colunas gravadas na inserção de contracheques
+    INSERT_COLUMNS = [
+        'nome', 'cpf', 'periodo', 'empresa', 'cargo', 'salario_bruto',
+        'salario_liquido', 'descontos', 'data_processamento',
+        'texto_original', 'confianca_ocr', 'arquivo_origem',
+        'validacao_status', 'validacao_erros', 'validacao_avisos',
+        'texto_hash', 'arquivo_hash', 'funcionario_id'
+    ]
+    
+    def _prepare_row(self, cursor, data, ocr_confidence, arquivo_origem, validacao,
+                     ocr_result, arquivo_conteudo, cpf_digits):
+        """Grava os blobs e o funcionário e monta a linha de inserção"""
+        texto_hash = None
+        if ocr_result and ocr_result.get('text'):
+            texto_hash = self._put_blob(cursor, ocr_result['text'].encode('utf-8'))
+        
+        # O hash do arquivo identifica a gravação mesmo sem guardar o original
+        arquivo_hash = None
+        if arquivo_conteudo is not None:
+            if BLOB_CONFIG["store_original_files"]:
+                arquivo_hash = self._put_blob(cursor, arquivo_conteudo)
+            else:
+                arquivo_hash = hashlib.sha256(arquivo_conteudo).hexdigest()
+        
+        funcionario_id = self._resolve_employee(cursor, data.get('nome'), cpf_digits)
+        
+        # Preparar dados de validação
+        validacao_status, validacao_erros, validacao_avisos = self._validation_fields(validacao)
+        
+        return (
+            data.get('nome'),
+            data.get('cpf'),
+            data.get('periodo'),
+            data.get('empresa'),
+            data.get('cargo'),
+            data.get('salario_bruto'),
+            data.get('salario_liquido'),
+            data.get('descontos'),
+            data.get('data_processamento'),
+            data.get('texto_original'),
+            ocr_confidence,
+            arquivo_origem,
+            validacao_status,
+            validacao_erros,
+            validacao_avisos,
+            texto_hash,
+            arquivo_hash,
+            funcionario_id
+        )
+    
+    def _upsert_sql(self):
+        """INSERT que atualiza o contracheque já gravado do mesmo arquivo, CPF e período"""
+        return f"""
+            INSERT INTO contracheques ({', '.join(self.INSERT_COLUMNS)})
+            VALUES ({', '.join('?' * len(self.INSERT_COLUMNS))})
+            ON CONFLICT {self.UPSERT_TARGET} DO UPDATE SET
+                {', '.join(f"{coluna} = excluded.{coluna}" for coluna in self.INSERT_COLUMNS)}
+        """
+    
+    def _update_sql(self):
+        return f"""
+            UPDATE contracheques SET {', '.join(f"{coluna} = ?" for coluna in self.INSERT_COLUMNS)}
+            WHERE id = ?
+        """
+    
+    def _upsert_key(self, row):
+        """Chave do índice único da linha (arquivo_hash, cpf, periodo); None sem o arquivo de origem"""
+        valores = dict(zip(self.INSERT_COLUMNS, row))
+        if valores['arquivo_hash'] is None:
+            return None
+        return valores['arquivo_hash'], valores['cpf'] or '', valores['periodo'] or ''
+    
+    def _existing_id(self, cursor, row):
+        """Id do contracheque já gravado do mesmo arquivo, CPF e período (None se não houver)
+        
+        Só distingue inserção de atualização: a unicidade vem do índice
+        único. Consultado sob o lock de escrita (BEGIN IMMEDIATE), o
+        resultado vale até o commit.
+        """
+        chave = self._upsert_key(row)
+        if chave is None:
+            return None
+        
+        cursor.execute('''
+            SELECT id FROM contracheques
+            WHERE arquivo_hash = ? AND COALESCE(cpf, '') = ? AND COALESCE(periodo, '') = ?
+        ''', chave)
+        existente = cursor.fetchone()
+        
+        return existente[0] if existente else None
+    
+    def _detect_anomalies(self, cursor, contracheque_id, row):
+        """Compara o contracheque inserido com a janela do histórico do funcionário
+        
+        Custo constante: lê e regrava apenas a janela do funcionário e conta
+        os contracheques do mesmo período pelo índice (funcionario_id, periodo).
+        """
+        if not ANOMALY_CONFIG["enabled"]:
+            return []
+        
+        valores = dict(zip(self.INSERT_COLUMNS, row))
+        funcionario_id = valores['funcionario_id']
+        periodo = valores['periodo']
+        liquido = valores['salario_liquido']
+        
+        if funcionario_id is None:
+            return []
+        
+        cursor.execute("SELECT valores FROM historico_salarial WHERE funcionario_id = ?", [funcionario_id])
+        historico = cursor.fetchone()
+        historico = json.loads(historico[0]) if historico else []
+        
+        duplicados = 0
+        if periodo:
+            cursor.execute('''
+                SELECT COUNT(*) FROM contracheques
+                WHERE funcionario_id = ? AND periodo = ? AND id <> ?
+            ''', [funcionario_id, periodo, contracheque_id])
+            duplicados = cursor.fetchone()[0]
+        
+        anomalias = self.anomaly_detector.score(historico, periodo, liquido, duplicados)
+        
+        cursor.executemany('''
+            INSERT INTO anomalias (contracheque_id, tipo, score, detalhe) VALUES (?, ?, ?, ?)
+        ''', [(contracheque_id, *anomalia) for anomalia in anomalias])
+        
+        cursor.execute('''
+            INSERT INTO historico_salarial (funcionario_id, valores, updated_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(funcionario_id) DO UPDATE SET
+                valores = excluded.valores, updated_at = CURRENT_TIMESTAMP
+        ''', [funcionario_id, json.dumps(self.anomaly_detector.update(historico, periodo, liquido))])
+        
+        return anomalias
+    
+    def get_anomalies(self, contracheque_id=None, limit=500):
+        """Retorna as anomalias detectadas (de um contracheque ou as mais recentes)"""
+        with sqlite3.connect(self.db_path) as conn:
+            query = '''
+                SELECT a.contracheque_id, c.nome, c.periodo, c.salario_liquido,
+                       a.tipo, ROUND(a.score, 2) AS score, a.detalhe
+                FROM anomalias a
+                LEFT JOIN contracheques c ON c.id = a.contracheque_id
+            '''
+            params = []
+            
+            if contracheque_id is not None:
+                query += " WHERE a.contracheque_id = ?"
+                params.append(contracheque_id)
+            
+            query += " ORDER BY a.contracheque_id DESC LIMIT ?"
+            params.append(limit)
+            
+            return _read_sql_query(query, conn, params=params)
+    
+    def rebuild_anomalies(self):
+        """Modo em lote: pontua todo o histórico e refaz as janelas por funcionário
+        
+        Usa a ordem dos períodos (a inserção usa a ordem de chegada).
+        Retorna o número de anomalias encontradas.
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            df = _read_sql_query('''
+                SELECT id, funcionario_id, periodo, salario_liquido
+                FROM contracheques
+                WHERE funcionario_id IS NOT NULL
+            ''', conn)
+            
+            anomalias, historicos = self.anomaly_detector.score_batch(df)
+            
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM anomalias")
+            cursor.executemany('''
+                INSERT INTO anomalias (contracheque_id, tipo, score, detalhe) VALUES (?, ?, ?, ?)
+            ''', list(anomalias.itertuples(index=False, name=None)))
+            
+            cursor.execute("DELETE FROM historico_salarial")
+            cursor.executemany('''
+                INSERT INTO historico_salarial (funcionario_id, valores) VALUES (?, ?)
+            ''', [(funcionario_id, json.dumps(valores)) for funcionario_id, valores in historicos.items()])
+            
             conn.commit()
+        
+        self.log_action("anomalias", f"{len(anomalias)} anomalias no histórico completo",
+                        {"registros": len(df), "anomalias": len(anomalias)})
+        
+        return len(anomalias)
     
     def insert_contracheque(self, data, ocr_confidence=None, arquivo_origem=None, 
-                           validacao=None):
-        """Insere um novo contracheque no banco"""
+                           validacao=None, ocr_result=None, arquivo_conteudo=None):
+        """Insere um novo contracheque no banco
+        
+        Se ocr_result for informado, o texto completo vai para o armazenamento
+        de blobs e as caixas das palavras e recortes de campos para
+        ocr_resultados. arquivo_conteudo (bytes/memoryview) guarda o arquivo
+        original, se habilitado em BLOB_CONFIG, e torna a gravação idempotente:
+        o mesmo arquivo com o mesmo CPF e período atualiza o contracheque já
+        gravado em vez de duplicá-lo.
+        """
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
             
-            # Preparar dados de validação
-            validacao = validacao or {}
-            validacao_status = "válido" if validacao.get('is_valid', False) else "inválido"
-            validacao_erros = json.dumps(validacao.get('errors', []))
-            validacao_avisos = json.dumps(validacao.get('warnings', []))
+            # Lock de escrita desde o início: outra conexão não grava entre a
+            # consulta ao contracheque existente e o upsert
+            cursor.execute("BEGIN IMMEDIATE")
             
-            cursor.execute('''
-                INSERT INTO contracheques (
-                    nome, cpf, periodo, empresa, cargo, salario_bruto, 
-                    salario_liquido, descontos, data_processamento, 
-                    texto_original, confianca_ocr, arquivo_origem,
-                    validacao_status, validacao_erros, validacao_avisos
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                data.get('nome'),
-                data.get('cpf'),
-                data.get('periodo'),
-                data.get('empresa'),
-                data.get('cargo'),
-                data.get('salario_bruto'),
-                data.get('salario_liquido'),
-                data.get('descontos'),
-                data.get('data_processamento'),
-                data.get('texto_original'),
-                ocr_confidence,
-                arquivo_origem,
-                validacao_status,
-                validacao_erros,
-                validacao_avisos
-            ))
+            cpf_digits = self.employee_index.valid_cpf_digits(data.get('cpf'))
+            row = self._prepare_row(cursor, data, ocr_confidence, arquivo_origem, validacao,
+                                    ocr_result, arquivo_conteudo, cpf_digits)
+            
+            novo = self._existing_id(cursor, row) is None
+            
+            cursor.execute(self._upsert_sql() + " RETURNING id", row)
+            contracheque_id = cursor.fetchone()[0]
+            
+            # Regravações não entram de novo na janela do funcionário
+            if novo:
+                self._detect_anomalies(cursor, contracheque_id, row)
+            
+            if ocr_result:
+                self._save_ocr_result(cursor, contracheque_id, ocr_result)
             
-            contracheque_id = cursor.lastrowid
             conn.commit()
             
-            # Log da inserção
-            self.log_action("insert", f"Contracheque inserido para {data.get('nome', 'N/A')}", 
-                          {"id": contracheque_id, "arquivo": arquivo_origem})
+            # Log da inserção (ou da regravação)
+            if novo:
+                self.log_action("insert", f"Contracheque inserido para {data.get('nome', 'N/A')}", 
+                              {"id": contracheque_id, "arquivo": arquivo_origem})
+            else:
+                self.log_action("update", f"Contracheque atualizado para {data.get('nome', 'N/A')}",
+                                {"id": contracheque_id, "arquivo": arquivo_origem})
             
             return contracheque_id
     
-    def get_all_contracheques(self):
-        """Retorna todos os contracheques do banco"""
+    def insert_contracheques(self, registros):
+        """Insere vários contracheques numa única transação
+        
+        registros é uma lista de dicts com 'dados' e, opcionalmente,
+        'validacao', 'arquivo', 'ocr' (resultado do OCR) e 'conteudo'
+        (arquivo original). Os CPFs são validados em lote. Registros já
+        gravados (mesmo arquivo, CPF e período) são atualizados, como em
+        insert_contracheque. Retorna os ids na ordem dos registros.
+        """
+        if not registros:
+            return []
+        
+        cpfs = self.employee_index.valid_cpf_digits_batch(
+            [registro['dados'].get('cpf') for registro in registros]
+        )
+        
         with sqlite3.connect(self.db_path) as conn:
-            df = pd.read_sql_query('''
-                SELECT id, nome, cpf, periodo, empresa, cargo, 
-                       salario_bruto, salario_liquido, descontos,
-                       data_processamento, confianca_ocr, arquivo_origem,
-                       validacao_status, created_at
+            cursor = conn.cursor()
+            
+            # Lock de escrita desde o início, como em insert_contracheque
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            rows = []
+            for registro, cpf_digits in zip(registros, cpfs):
+                ocr_result = registro.get('ocr')
+                rows.append(self._prepare_row(
+                    cursor,
+                    registro['dados'],
+                    ocr_result.get('confidence') if ocr_result else None,
+                    registro.get('arquivo'),
+                    registro.get('validacao'),
+                    ocr_result,
+                    registro.get('conteudo'),
+                    cpf_digits
+                ))
+            
+            # Só entram os registros novos; repetições dentro do lote, uma vez
+            ids = [self._existing_id(cursor, row) for row in rows]
+            primeiras = {}
+            inserir = []
+            for posicao, row in enumerate(rows):
+                chave = self._upsert_key(row)
+                if ids[posicao] is not None or chave in primeiras:
+                    continue
+                if chave is not None:
+                    primeiras[chave] = posicao
+                inserir.append(posicao)
+            
+            cursor.executemany(self._upsert_sql(), [rows[posicao] for posicao in inserir])
+            
+            # Dentro da transação, os últimos ids são os desta inserção
+            cursor.execute("SELECT id FROM contracheques ORDER BY id DESC LIMIT ?", [len(inserir)])
+            for posicao, (contracheque_id,) in zip(inserir, reversed(cursor.fetchall())):
+                ids[posicao] = contracheque_id
+                self._detect_anomalies(cursor, contracheque_id, rows[posicao])
+            
+            # Os demais atualizam o contracheque existente (vale a última versão)
+            inseridos = set(inserir)
+            atualizar = []
+            for posicao, row in enumerate(rows):
+                if posicao in inseridos:
+                    continue
+                if ids[posicao] is None:
+                    ids[posicao] = ids[primeiras[self._upsert_key(row)]]
+                atualizar.append([*row, ids[posicao]])
+            
+            cursor.executemany(self._update_sql(), atualizar)
+            
+            for contracheque_id, registro in zip(ids, registros):
+                if registro.get('ocr'):
+                    self._save_ocr_result(cursor, contracheque_id, registro['ocr'])
+            
+            conn.commit()
+        
+        atualizados = len(set(ids)) - len(inserir)
+        self.log_action("bulk_insert", f"{len(inserir)} contracheques inseridos e {atualizados} atualizados em lote",
+                        {"registros": len(ids), "inseridos": len(inserir), "atualizados": atualizados,
+                         "arquivos": [r.get('arquivo') for r in registros]})
+        
+        return ids
+    
+    def _put_blob(self, cursor, content):
+        """Guarda um conteúdo no armazenamento de blobs e retorna seu hash
+        
+        Conteúdos iguais são guardados uma única vez. A compactação só é
+        mantida quando reduz o tamanho (PDFs e imagens já vêm compactados).
+        """
+        blob_hash = hashlib.sha256(content).hexdigest()
+        
+        cursor.execute("SELECT 1 FROM blobs WHERE hash = ?", [blob_hash])
+        if cursor.fetchone():
+            return blob_hash
+        
+        tamanho = memoryview(content).nbytes
+        dados = zlib.compress(content, BLOB_CONFIG["compression_level"])
+        compressao = "zlib"
+        
+        if len(dados) > tamanho * (1 - BLOB_CONFIG["min_compression_gain"]):
+            dados = bytes(content)
+            compressao = "none"
+        
+        cursor.execute('''
+            INSERT INTO blobs (hash, tamanho, compressao, dados) VALUES (?, ?, ?, ?)
+        ''', (blob_hash, tamanho, compressao, dados))
+        
+        return blob_hash
+    
+    @staticmethod
+    def unpack_blob(dados, compressao):
+        """Descompacta o conteúdo de um blob"""
+        if dados is None:
+            return None
+        return zlib.decompress(dados) if compressao == "zlib" else bytes(dados)
+    
+    def get_blob(self, blob_hash):
+        """Retorna o conteúdo de um blob pelo hash"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT dados, compressao FROM blobs WHERE hash = ?", [blob_hash])
+            row = cursor.fetchone()
+        
+        return self.unpack_blob(*row) if row else None
+    
+    def get_original_file(self, contracheque_id):
+        """Retorna (nome, conteúdo) do arquivo original de um contracheque"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT c.arquivo_origem, b.dados, b.compressao
+                FROM contracheques c JOIN blobs b ON b.hash = c.arquivo_hash
+                WHERE c.id = ?
+            ''', [contracheque_id])
+            row = cursor.fetchone()
+        
+        if not row:
+            return None
+        
+        return row[0], self.unpack_blob(row[1], row[2])
+    
+    def _save_ocr_result(self, cursor, contracheque_id, ocr_result):
+        """Grava as caixas das palavras e os recortes de campos compactados com zlib, e os DPIs usados"""
+        def compress_json(value):
+            return zlib.compress(json.dumps(value, ensure_ascii=False).encode('utf-8')) if value else None
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO ocr_resultados (contracheque_id, palavras, campos, ajuste_dpi)
+            VALUES (?, ?, ?, ?)
+        ''', (
+            contracheque_id,
+            compress_json(ocr_result.get('words')),
+            compress_json(ocr_result.get('fields')),
+            json.dumps(ocr_result['dpi']) if ocr_result.get('dpi') else None
+        ))
+    
+    def get_ocr_result(self, contracheque_id):
+        """Retorna o texto completo, palavras e campos do OCR de um contracheque"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT b.dados, b.compressao, o.palavras, o.campos, o.ajuste_dpi
+                FROM contracheques c
+                JOIN blobs b ON b.hash = c.texto_hash
+                LEFT JOIN ocr_resultados o ON o.contracheque_id = c.id
+                WHERE c.id = ?
+            ''', [contracheque_id])
+            row = cursor.fetchone()
+        
+        if not row:
+            return None
+        
+        dados, compressao, palavras, campos, ajuste_dpi = row
+        return {
+            "text": self.unpack_blob(dados, compressao).decode('utf-8'),
+            "words": json.loads(zlib.decompress(palavras)) if palavras else [],
+            "fields": json.loads(zlib.decompress(campos)) if campos else None,
+            "dpi": json.loads(ajuste_dpi) if ajuste_dpi else None
+        }
+    
+    def iter_ocr_batches(self, batch_size=500):
+        """Percorre, em lotes, os contracheques com texto de OCR guardado
+        
+        Cada linha traz (id, texto, compressao, campos) ainda compactados, para
+        que a descompactação aconteça nos processos de reextração.
+        """
+        last_id = 0
+        
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            
+            while True:
+                cursor.execute('''
+                    SELECT c.id, b.dados, b.compressao, o.campos
+                    FROM contracheques c
+                    JOIN blobs b ON b.hash = c.texto_hash
+                    LEFT JOIN ocr_resultados o ON o.contracheque_id = c.id
+                    WHERE c.id > ?
+                    ORDER BY c.id
+                    LIMIT ?
+                ''', [last_id, batch_size])
+                rows = cursor.fetchall()
+                
+                if not rows:
+                    break
+                
+                last_id = rows[-1][0]
+                yield rows
+    
+    def count_ocr_results(self):
+        """Número de contracheques com texto de OCR guardado"""
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM contracheques WHERE texto_hash IS NOT NULL"
+            ).fetchone()[0]
+    
+    def bulk_update_contracheques(self, updates):
+        """Atualiza vários contracheques numa única transação
+        
+        updates é uma lista de (id, dados, validacao) como devolvida pela
+        reextração. Retorna o número de linhas alteradas.
+        """
+        if not updates:
+            return 0
+        
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            
+            cpfs = self.employee_index.valid_cpf_digits_batch([data.get('cpf') for _, data, _ in updates])
+            
+            rows = []
+            for (contracheque_id, data, validacao), cpf_digits in zip(updates, cpfs):
+                rows.append((
+                    data.get('nome'),
+                    data.get('cpf'),
+                    data.get('periodo'),
+                    data.get('empresa'),
+                    data.get('cargo'),
+                    data.get('salario_bruto'),
+                    data.get('salario_liquido'),
+                    data.get('descontos'),
+                    "válido" if validacao.get('is_valid', False) else "inválido",
+                    json.dumps(validacao.get('errors', [])),
+                    json.dumps(validacao.get('warnings', [])),
+                    self._resolve_employee(cursor, data.get('nome'), cpf_digits),
+                    contracheque_id
+                ))
+            
+            cursor.executemany('''
+                UPDATE contracheques SET
+                    nome = ?, cpf = ?, periodo = ?, empresa = ?, cargo = ?,
+                    salario_bruto = ?, salario_liquido = ?, descontos = ?,
+                    validacao_status = ?, validacao_erros = ?, validacao_avisos = ?,
+                    funcionario_id = ?
+                WHERE id = ?
+            ''', rows)
+            conn.commit()
+            
+            updated = cursor.rowcount
+        
+        self.log_action("bulk_update", f"{updated} contracheques atualizados em lote",
+                        {"registros": updated})
+        
+        return updated
+    
+    def get_extracted_fields(self, ids):
+        """Retorna os campos extraídos atuais dos ids informados"""
+        campos = ['nome', 'cpf', 'periodo', 'empresa', 'cargo',
+                  'salario_bruto', 'salario_liquido', 'descontos',
+                  'validacao_status', 'validacao_erros', 'validacao_avisos']
+        
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            placeholders = ','.join('?' * len(ids))
+            cursor.execute(f"SELECT id, {', '.join(campos)} FROM contracheques WHERE id IN ({placeholders})",
+                           list(ids))
+            
+            return {row[0]: dict(zip(campos, row[1:])) for row in cursor.fetchall()}
+    
+    @property
+    def employee_index(self):
+        """Índice de funcionários compartilhado (carregado no primeiro uso)"""
+        if self._employee_index is None:
+            self._employee_index = EmployeeIndex.for_database(self.db_path)
+        return self._employee_index
+    
+    def _resolve_employee(self, cursor, nome, cpf_digits):
+        """Retorna o id do funcionário do contracheque, criando-o se necessário
+        
+        cpf_digits são os dígitos do CPF já validado (ou None).
+        """
+        index = self.employee_index
+        
+        if not cpf_digits and not normalize_name(nome):
+            return None
+        
+        funcionario_id = index.match(nome, cpf_digits)
+        if funcionario_id is None:
+            # Outro processo pode ter criado o funcionário
+            index.refresh(cursor)
+            funcionario_id = index.match(nome, cpf_digits)
+        
+        if funcionario_id is not None:
+            if cpf_digits and funcionario_id not in index.cpf_of:
+                cursor.execute("UPDATE funcionarios SET cpf = ? WHERE id = ?", [cpf_digits, funcionario_id])
+                index.set_cpf(funcionario_id, cpf_digits)
+            return funcionario_id
+        
+        normalized = normalize_name(nome)
+        key = phonetic_key(normalized)
+        cursor.execute('''
+            INSERT INTO funcionarios (cpf, nome, nome_normalizado, chave_fonetica)
+            VALUES (?, ?, ?, ?)
+        ''', [cpf_digits, nome, normalized, key])
+        funcionario_id = cursor.lastrowid
+        index.add(funcionario_id, cpf_digits, normalized, key)
+        
+        return funcionario_id
+    
+    def link_employees(self, batch_size=1000):
+        """Vincula a funcionários os contracheques que ainda não têm vínculo
+        
+        Retorna o número de contracheques vinculados.
+        """
+        vinculados = 0
+        last_id = 0
+        
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            
+            while True:
+                cursor.execute('''
+                    SELECT id, nome, cpf FROM contracheques
+                    WHERE funcionario_id IS NULL AND id > ?
+                    ORDER BY id LIMIT ?
+                ''', [last_id, batch_size])
+                rows = cursor.fetchall()
+                
+                if not rows:
+                    break
+                
+                last_id = rows[-1][0]
+                cpfs = self.employee_index.valid_cpf_digits_batch([row[2] for row in rows])
+                updates = []
+                for (contracheque_id, nome, _), cpf_digits in zip(rows, cpfs):
+                    funcionario_id = self._resolve_employee(cursor, nome, cpf_digits)
+                    if funcionario_id is not None:
+                        updates.append((funcionario_id, contracheque_id))
+                
+                cursor.executemany("UPDATE contracheques SET funcionario_id = ? WHERE id = ?", updates)
+                vinculados += len(updates)
+            
+            conn.commit()
+        
+        if vinculados:
+            self.log_action("funcionarios", f"{vinculados} contracheques vinculados a funcionários",
+                            {"registros": vinculados})
+        
+        return vinculados
+    
+    def get_all_contracheques(self, limit=None):
+        """Retorna todos os contracheques do banco (limit: só os primeiros, lidos no SQL)"""
+        with sqlite3.connect(self.db_path) as conn:
+            df = _read_sql_query(f'''
+                SELECT {self.LIST_COLUMNS}
                 FROM contracheques 
                 ORDER BY created_at DESC
-            ''', conn)
+                LIMIT ?
+            ''', conn, params=[-1 if limit is None else limit])
             
             return df
     
-    def get_contracheques_by_period(self, periodo):
+    def get_contracheques_by_period(self, periodo, limit=None):
         """Retorna contracheques de um período específico"""
         with sqlite3.connect(self.db_path) as conn:
-            df = pd.read_sql_query('''
-                SELECT * FROM contracheques 
+            df = _read_sql_query(f'''
+                SELECT {self.LIST_COLUMNS}
+                FROM contracheques 
                 WHERE periodo = ?
                 ORDER BY nome
-            ''', conn, params=[periodo])
+                LIMIT ?
+            ''', conn, params=[periodo, -1 if limit is None else limit])
             
             return df
     
-    def get_contracheques_by_name(self, nome):
+    def get_contracheques_by_name(self, nome, limit=None):
         """Retorna contracheques de uma pessoa específica"""
         with sqlite3.connect(self.db_path) as conn:
-            df = pd.read_sql_query('''
-                SELECT * FROM contracheques 
+            df = _read_sql_query(f'''
+                SELECT {self.LIST_COLUMNS}
+                FROM contracheques 
                 WHERE nome LIKE ?
                 ORDER BY periodo DESC
-            ''', conn, params=[f"%{nome}%"])
+                LIMIT ?
+            ''', conn, params=[f"%{nome}%", -1 if limit is None else limit])
             
             return df
     
+    def iter_contracheques(self, chunk_size=None, colunas=None, periodo=None, nome=None):
+        """Percorre os contracheques em blocos de DataFrames tipados
+        
+        Paginação keyset por id: cada bloco é uma consulta independente e a
+        memória usada depende só de chunk_size, não do tamanho da tabela.
+        colunas projeta a consulta (padrão: as de listagem); periodo e nome
+        filtram como get_contracheques_by_period e get_contracheques_by_name.
+        """
+        import pandas as pd
+        
+        chunk_size = chunk_size or APP_CONFIG["read_chunk_size"]
+        query, colunas, tipos, params = self._chunk_query(colunas, periodo, nome, '?')
+        
+        last_id = 0
+        with sqlite3.connect(self.db_path) as conn:
+            while True:
+                df = pd.read_sql_query(query, conn, params=[last_id, *params, chunk_size])
+                if df.empty:
+                    return
+                
+                last_id = int(df['id'].iloc[-1])
+                yield df[colunas].astype(tipos)
+                
+                if len(df) < chunk_size:
+                    return
+    
+    def get_employee_salary_stats(self):
+        """Média e desvio-padrão do salário líquido por funcionário (histórico completo)"""
+        with sqlite3.connect(self.db_path) as conn:
+            df = _read_sql_query('''
+                SELECT funcionario_id,
+                       COUNT(salario_liquido) AS qtd,
+                       AVG(salario_liquido) AS media,
+                       AVG(salario_liquido * salario_liquido) - AVG(salario_liquido) * AVG(salario_liquido) AS variancia
+                FROM contracheques
+                WHERE funcionario_id IS NOT NULL AND salario_liquido IS NOT NULL
+                GROUP BY funcionario_id
+            ''', conn)
+            
+            return df
+    
+    def start_audit_run(self):
+        """Registra o início de uma auditoria e retorna seu id"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO auditoria_execucoes DEFAULT VALUES")
+            conn.commit()
+            
+            return cursor.lastrowid
+    
+    def save_audit_findings(self, execucao_id, achados):
+        """Grava em lote os achados (contracheque_id, regra, severidade, detalhe)"""
+        if not achados:
+            return
+        
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany('''
+                INSERT INTO auditoria_achados (execucao_id, contracheque_id, regra, severidade, detalhe)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(execucao_id, *achado) for achado in achados])
+            conn.commit()
+    
+    def finish_audit_run(self, execucao_id, registros, achados, tempo):
+        """Conclui a auditoria e descarta os achados das execuções anteriores"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE auditoria_execucoes
+                SET concluida_em = CURRENT_TIMESTAMP, registros = ?, achados = ?, tempo = ?
+                WHERE id = ?
+            ''', [registros, achados, tempo, execucao_id])
+            cursor.execute("DELETE FROM auditoria_achados WHERE execucao_id < ?", [execucao_id])
+            conn.commit()
+        
+        self.log_action("auditoria", f"Auditoria concluída: {achados} achados em {registros} contracheques",
+                        {"execucao": execucao_id, "tempo": round(tempo, 2)})
+    
+    def _last_audit_run(self, cursor):
+        cursor.execute('''
+            SELECT id, concluida_em, registros, achados, tempo FROM auditoria_execucoes
+            WHERE concluida_em IS NOT NULL
+            ORDER BY id DESC LIMIT 1
+        ''')
+        return cursor.fetchone()
+    
+    def get_audit_summary(self):
+        """Resumo da última auditoria concluída: execução e achados por regra"""
+        with sqlite3.connect(self.db_path) as conn:
+            execucao = self._last_audit_run(conn.cursor())
+            if not execucao:
+                return None
+            
+            por_regra = _read_sql_query('''
+                SELECT regra, severidade, COUNT(*) AS quantidade
+                FROM auditoria_achados
+                WHERE execucao_id = ?
+                GROUP BY regra, severidade
+                ORDER BY quantidade DESC
+            ''', conn, params=[execucao[0]])
+        
+        return {
+            "execucao_id": execucao[0],
+            "concluida_em": execucao[1],
+            "registros": execucao[2],
+            "achados": execucao[3],
+            "tempo": execucao[4],
+            "por_regra": por_regra
+        }
+    
+    def get_audit_findings(self, regra=None, limit=1000):
+        """Achados da última auditoria concluída"""
+        with sqlite3.connect(self.db_path) as conn:
+            execucao = self._last_audit_run(conn.cursor())
+            if not execucao:
+                return _read_sql_query("SELECT * FROM auditoria_achados WHERE 0", conn)
+            
+            query = '''
+                SELECT a.contracheque_id, c.nome, c.periodo, a.regra, a.severidade, a.detalhe
+                FROM auditoria_achados a
+                LEFT JOIN contracheques c ON c.id = a.contracheque_id
+                WHERE a.execucao_id = ?
+            '''
+            params = [execucao[0]]
+            
+            if regra:
+                query += " AND a.regra = ?"
+                params.append(regra)
+            
+            query += " ORDER BY a.contracheque_id LIMIT ?"
+            params.append(limit)
+            
+            return _read_sql_query(query, conn, params=params)
+    
     def get_summary_statistics(self):
         """Retorna estatísticas resumidas"""
         with sqlite3.connect(self.db_path) as conn:
@@ -161,8 +1179,8 @@ class Database:
             cursor.execute("SELECT COUNT(DISTINCT periodo) FROM contracheques WHERE periodo IS NOT NULL")
             stats['periodos_unicos'] = cursor.fetchone()[0]
             
-            # Funcionários únicos
-            cursor.execute("SELECT COUNT(DISTINCT nome) FROM contracheques WHERE nome IS NOT NULL")
+            # Funcionários únicos (identidade resolvida por CPF/nome)
+            cursor.execute("SELECT COUNT(*) FROM resumo_funcionario")
             stats['funcionarios_unicos'] = cursor.fetchone()[0]
             
             # Valor total líquido
@@ -182,17 +1200,77 @@ class Database:
             
             return stats
     
+    def get_period_summary(self):
+        """Retorna o resumo por período a partir dos agregados materializados"""
+        with sqlite3.connect(self.db_path) as conn:
+            df = _read_sql_query('''
+                SELECT p.periodo,
+                       CASE WHEN p.qtd_salarios > 0
+                            THEN ROUND(p.soma_liquido / p.qtd_salarios, 2) END AS salario_medio,
+                       p.qtd_salarios AS qtd_registros,
+                       ROUND(p.soma_liquido, 2) AS total_pago,
+                       (SELECT COUNT(*) FROM resumo_periodo_funcionario f
+                        WHERE f.periodo = p.periodo) AS funcionarios_unicos
+                FROM resumo_periodo p
+                ORDER BY p.periodo
+            ''', conn)
+            
+            return df
+    
+    def get_company_summary(self):
+        """Retorna o resumo por empresa a partir dos agregados materializados"""
+        with sqlite3.connect(self.db_path) as conn:
+            df = _read_sql_query('''
+                SELECT empresa, qtd_registros,
+                       CASE WHEN qtd_salarios > 0
+                            THEN ROUND(soma_liquido / qtd_salarios, 2) END AS salario_medio,
+                       ROUND(soma_liquido, 2) AS total_pago
+                FROM resumo_empresa
+                ORDER BY total_pago DESC
+            ''', conn)
+            
+            return df
+    
+    def get_top_employees(self, limit=10):
+        """Retorna os funcionários com maior salário líquido médio"""
+        with sqlite3.connect(self.db_path) as conn:
+            df = _read_sql_query('''
+                SELECT f.nome, ROUND(r.soma_liquido / r.qtd_salarios, 2) AS salario_medio,
+                       r.qtd_registros
+                FROM resumo_funcionario r
+                JOIN funcionarios f ON f.id = r.funcionario_id
+                WHERE r.qtd_salarios > 0
+                ORDER BY salario_medio DESC
+                LIMIT ?
+            ''', conn, params=[limit])
+            
+            return df
+    
     def delete_contracheque(self, contracheque_id):
         """Remove um contracheque do banco"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
             
             # Buscar dados antes de deletar para log
-            cursor.execute("SELECT nome, arquivo_origem FROM contracheques WHERE id = ?", [contracheque_id])
+            cursor.execute('''
+                SELECT nome, arquivo_origem, texto_hash, arquivo_hash FROM contracheques WHERE id = ?
+            ''', [contracheque_id])
             result = cursor.fetchone()
             
             if result:
                 cursor.execute("DELETE FROM contracheques WHERE id = ?", [contracheque_id])
+                cursor.execute("DELETE FROM ocr_resultados WHERE contracheque_id = ?", [contracheque_id])
+                cursor.execute("DELETE FROM anomalias WHERE contracheque_id = ?", [contracheque_id])
+                
+                # O arquivo volta a ser desconhecido para o manifesto: um novo envio o processa
+                cursor.execute("DELETE FROM manifesto_arquivos WHERE contracheque_id = ?", [contracheque_id])
+                
+                # Blobs compartilhados só saem quando nenhum contracheque os referencia
+                cursor.execute('''
+                    DELETE FROM blobs WHERE hash IN (?, ?)
+                    AND NOT EXISTS (SELECT 1 FROM contracheques WHERE texto_hash = blobs.hash)
+                    AND NOT EXISTS (SELECT 1 FROM contracheques WHERE arquivo_hash = blobs.hash)
+                ''', [result[2], result[3]])
                 conn.commit()
                 
                 # Log da exclusão
@@ -218,6 +1296,15 @@ class Database:
                     fields.append(f"{field} = ?")
                     values.append(value)
             
+            # Nome ou CPF alterados podem mudar o funcionário vinculado
+            if 'nome' in data or 'cpf' in data:
+                cursor.execute("SELECT nome, cpf FROM contracheques WHERE id = ?", [contracheque_id])
+                atual = cursor.fetchone()
+                if atual:
+                    fields.append("funcionario_id = ?")
+                    cpf_digits = self.employee_index.valid_cpf_digits(data.get('cpf', atual[1]))
+                    values.append(self._resolve_employee(cursor, data.get('nome', atual[0]), cpf_digits))
+            
             if fields:
                 query = f"UPDATE contracheques SET {', '.join(fields)} WHERE id = ?"
                 values.append(contracheque_id)
@@ -232,48 +1319,154 @@ class Database:
             
             return False
     
-    def log_action(self, tipo, mensagem, detalhes=None):
-        """Registra uma ação no log"""
+    def get_templates(self):
+        """Retorna os templates de regiões por empresa"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
+            cursor.execute("SELECT empresa, regioes, documentos FROM templates_empresa")
             
+            return {
+                empresa: {"empresa": empresa, "regioes": json.loads(regioes), "documentos": documentos}
+                for empresa, regioes, documentos in cursor.fetchall()
+            }
+    
+    def save_template(self, empresa, regioes, documentos):
+        """Cria ou atualiza o template de regiões de uma empresa"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
             cursor.execute('''
-                INSERT INTO logs (tipo, mensagem, detalhes)
-                VALUES (?, ?, ?)
-            ''', (tipo, mensagem, json.dumps(detalhes) if detalhes else None))
+                INSERT INTO templates_empresa (empresa, regioes, documentos, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(empresa) DO UPDATE SET
+                    regioes = excluded.regioes,
+                    documentos = excluded.documentos,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', (empresa, json.dumps(regioes), documentos))
+            conn.commit()
+    
+    def get_manifest_entries(self, arquivo_hashes=None, estados=None):
+        """Retorna as entradas do manifesto dos hashes ou estados informados (ou todas)"""
+        query, params = self._manifest_query(arquivo_hashes, estados, '?')
+        
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
             
+            return [self._manifest_entry(row) for row in cursor.fetchall()]
+    
+    def save_manifest_entry(self, arquivo_hash, estado, arquivo=None, caminho=None, ocr_result=None,
+                            dados=None, validacao=None, contracheque_id=None, erro=None):
+        """Cria ou avança a entrada de um arquivo; campos None mantêm o valor gravado"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(self._manifest_upsert_sql('?'), self._manifest_row(
+                arquivo_hash, estado, arquivo, caminho, ocr_result, dados, validacao, contracheque_id, erro
+            ))
             conn.commit()
     
-    def get_logs(self, limit=100):
-        """Retorna logs do sistema"""
+    def log_action(self, tipo, mensagem, detalhes=None):
+        """Registra uma ação no log (gravação assíncrona em lote)"""
+        self.log_writer.write(tipo, mensagem, detalhes)
+    
+    def flush_logs(self):
+        """Grava imediatamente os logs pendentes"""
+        self.log_writer.flush()
+    
+    def get_logs_page(self, limit=100, before=None):
+        """Retorna uma página de logs por paginação keyset
+        
+        before é o par (timestamp, id) do último log da página anterior;
+        a consulta percorre o índice de timestamp sem usar OFFSET.
+        """
+        self.flush_logs()
+        
         with sqlite3.connect(self.db_path) as conn:
-            df = pd.read_sql_query('''
-                SELECT * FROM logs 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            ''', conn, params=[limit])
+            if before:
+                df = _read_sql_query('''
+                    SELECT * FROM logs 
+                    WHERE (timestamp, id) < (?, ?)
+                    ORDER BY timestamp DESC, id DESC 
+                    LIMIT ?
+                ''', conn, params=[before[0], before[1], limit])
+            else:
+                df = _read_sql_query('''
+                    SELECT * FROM logs 
+                    ORDER BY timestamp DESC, id DESC 
+                    LIMIT ?
+                ''', conn, params=[limit])
             
             return df
     
-    def export_to_excel(self, filepath, periodo=None):
-        """Exporta dados para Excel"""
-        if periodo:
-            df = self.get_contracheques_by_period(periodo)
-        else:
-            df = self.get_all_contracheques()
+    def rotate_logs(self, max_age_days=None, max_rows=None):
+        """Arquiva em arquivo compactado e remove logs antigos ou excedentes
+        
+        Retorna o número de logs arquivados.
+        """
+        max_age_days = LOG_CONFIG["max_age_days"] if max_age_days is None else max_age_days
+        max_rows = LOG_CONFIG["max_rows"] if max_rows is None else max_rows
         
-        if not df.empty:
-            # Formatar valores monetários
-            for col in ['salario_bruto', 'salario_liquido', 'descontos']:
-                if col in df.columns:
-                    df[col] = df[col].apply(lambda x: f"R$ {x:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.') if pd.notnull(x) else "R$ 0,00")
+        self.flush_logs()
+        
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
             
-            df.to_excel(filepath, index=False)
+            # Limite de corte: o mais recente entre idade e quantidade
+            corte = None
+            if max_age_days:
+                limite = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+                corte = (limite.strftime('%Y-%m-%d %H:%M:%S'), 0)
             
-            # Log da exportação
-            self.log_action("export", f"Dados exportados para {filepath}", 
-                          {"registros": len(df), "periodo": periodo})
+            if max_rows:
+                cursor.execute('''
+                    SELECT timestamp, id FROM logs
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT 1 OFFSET ?
+                ''', [max_rows - 1])
+                ultimo_mantido = cursor.fetchone()
+                if ultimo_mantido and (corte is None or tuple(ultimo_mantido) > corte):
+                    corte = tuple(ultimo_mantido)
             
-            return True
+            if corte is None:
+                return 0
+            
+            cursor.execute('''
+                SELECT id, tipo, mensagem, detalhes, timestamp FROM logs
+                WHERE (timestamp, id) < (?, ?)
+                ORDER BY timestamp, id
+            ''', corte)
+            
+            arquivados = self._write_log_archive(iter(lambda: cursor.fetchmany(1000), []))
+            if not arquivados:
+                return 0
+            
+            cursor.execute("DELETE FROM logs WHERE (timestamp, id) < (?, ?)", corte)
+            conn.commit()
+            
+            return arquivados
+    
+    def _rotate_logs_if_due(self):
+        """Executa a rotação de logs no máximo uma vez por intervalo configurado"""
+        agora = datetime.now(timezone.utc)
+        
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT valor FROM configuracoes WHERE chave = 'logs_ultima_rotacao'")
+            row = cursor.fetchone()
+        
+        if row:
+            ultima = datetime.fromisoformat(row[0])
+            if agora - ultima < timedelta(hours=LOG_CONFIG["rotation_interval_hours"]):
+                return
+        
+        arquivados = self.rotate_logs()
+        
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                INSERT INTO configuracoes (chave, valor, descricao, updated_at)
+                VALUES ('logs_ultima_rotacao', ?, 'Última rotação de logs', CURRENT_TIMESTAMP)
+                ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor, updated_at = CURRENT_TIMESTAMP
+            ''', [agora.isoformat()])
+            conn.commit()
         
-        return False 
\ No newline at end of file
+        if arquivados:
+            self.log_action("rotacao_logs", f"{arquivados} logs arquivados", {"registros": arquivados})
@@ -0,0 +1,155 @@
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+from config import APP_CONFIG
+
+class _MemoryReader(io.RawIOBase):
+    """Leitor somente leitura sobre um memoryview (sem copiar o buffer)"""
+    
+    def __init__(self, view):
+        self._view = view
+        self._position = 0
+    
+    def readable(self):
+        return True
+    
+    def seekable(self):
+        return True
+    
+    def readinto(self, buffer):
+        chunk = self._view[self._position:self._position + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+    
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = max(0, offset)
+        return self._position
+    
+    def tell(self):
+        return self._position
+
+class UploadedDocument:
+    """Documento enviado, lido uma única vez e compartilhado por todas as etapas
+    
+    Guarda um memoryview do buffer do upload (sem cópia). Acima de
+    APP_CONFIG["upload_spill_mb"], o conteúdo vai para um arquivo temporário
+    mapeado em memória. Validação, hash, rasterização e OCR usam o mesmo
+    buffer, que pode ser relido quantas vezes for preciso.
+    """
+    
+    def __init__(self, source, name=None, mime_type=None):
+        self.name = name or getattr(source, 'name', 'documento')
+        self.type = mime_type or getattr(source, 'type', None) or self._guess_type(self.name)
+        
+        self._file = None
+        self._mmap = None
+        self._path = None
+        self._sha256 = None
+        
+        if hasattr(source, 'getbuffer'):
+            # UploadedFile do Streamlit / BytesIO: acesso direto ao buffer
+            view = source.getbuffer()
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            view = memoryview(source)
+        else:
+            view = memoryview(source.read())
+        
+        self.size = view.nbytes
+        
+        if self.size > APP_CONFIG["upload_spill_mb"] * 1024 * 1024:
+            self._spill(view)
+            view.release()
+            self._view = memoryview(self._mmap)
+        else:
+            self._view = view
+    
+    @classmethod
+    def wrap(cls, source, name=None):
+        """Retorna source se já for um documento; senão, cria um"""
+        if isinstance(source, cls):
+            return source
+        return cls(source, name=name)
+    
+    @staticmethod
+    def _guess_type(name):
+        extension = os.path.splitext(name)[1].lower()
+        if extension == '.pdf':
+            return "application/pdf"
+        if extension in ('.jpg', '.jpeg'):
+            return "image/jpeg"
+        if extension in ('.tif', '.tiff'):
+            return "image/tiff"
+        return f"image/{extension.lstrip('.') or 'png'}"
+    
+    def _write_temp_file(self, view, temp_folder=None):
+        temp_folder = temp_folder or APP_CONFIG["temp_folder"]
+        os.makedirs(temp_folder, exist_ok=True)
+        fd, self._path = tempfile.mkstemp(suffix=self.extension, dir=temp_folder)
+        
+        with os.fdopen(fd, "wb") as f:
+            f.write(view)
+    
+    def _spill(self, view):
+        """Grava o conteúdo em arquivo temporário e o mapeia em memória"""
+        self._write_temp_file(view)
+        
+        self._file = open(self._path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    @property
+    def extension(self):
+        return os.path.splitext(self.name)[1].lower()
+    
+    @property
+    def is_pdf(self):
+        return self.type == "application/pdf" or self.extension == '.pdf'
+    
+    @property
+    def view(self):
+        """memoryview do conteúdo completo"""
+        return self._view
+    
+    @property
+    def sha256(self):
+        """Hash SHA-256 do conteúdo (calculado uma vez)"""
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self._view).hexdigest()
+        return self._sha256
+    
+    def header(self, size=16):
+        """Primeiros bytes do arquivo (para validação do formato)"""
+        return bytes(self._view[:size])
+    
+    def open(self):
+        """Abre um leitor posicionado no início, sem copiar o conteúdo"""
+        return io.BufferedReader(_MemoryReader(self._view))
+    
+    def path(self, temp_folder=None):
+        """Caminho de um arquivo com o conteúdo (gravado no máximo uma vez)"""
+        if self._path is None:
+            self._write_temp_file(self._view, temp_folder)
+        return self._path
+    
+    def close(self):
+        """Libera o buffer e remove o arquivo temporário"""
+        self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+        if self._path and os.path.exists(self._path):
+            os.remove(self._path)
+        self._path = None
+    
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
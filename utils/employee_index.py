@@ -0,0 +1,201 @@
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from config import EMPLOYEE_CONFIG
+from .data_extractor import DataExtractor
+
+# Trocas típicas do OCR em nomes (dígito lido no lugar da letra)
+OCR_DIGIT_MAP = str.maketrans({'0': 'O', '1': 'I', '3': 'E', '4': 'A', '5': 'S', '6': 'G', '8': 'B'})
+
+# Partículas ignoradas na comparação aproximada
+NAME_PARTICLES = {'DA', 'DE', 'DO', 'DAS', 'DOS', 'E'}
+
+# Regras fonéticas simplificadas do português (aplicadas em ordem)
+PHONETIC_RULES = [
+    (r'PH', 'F'), (r'LH', 'L'), (r'NH', 'N'), (r'[CS]H', 'X'),
+    (r'C([EI])', r'S\1'), (r'G([EI])', r'J\1'), (r'QU', 'C'), (r'[KQ]', 'C'),
+    (r'Y', 'I'), (r'W', 'V'), (r'Z', 'S'), (r'SS', 'S'),
+    (r'H', ''), (r'M$', 'N'), (r'(.)\1+', r'\1')
+]
+
+def normalize_name(nome):
+    """Normaliza um nome: sem acentos, maiúsculo, dígitos do OCR trocados por letras"""
+    if not nome:
+        return ""
+    
+    nome = unicodedata.normalize('NFKD', str(nome)).encode('ascii', 'ignore').decode('ascii')
+    nome = nome.upper().translate(OCR_DIGIT_MAP)
+    return ' '.join(re.sub(r'[^A-Z\s]', '', nome).split())
+
+def phonetic_key(normalized):
+    """Chave fonética do nome normalizado, sem partículas"""
+    tokens = []
+    for token in normalized.split():
+        if token in NAME_PARTICLES:
+            continue
+        for pattern, replacement in PHONETIC_RULES:
+            token = re.sub(pattern, replacement, token)
+        tokens.append(token)
+    return ' '.join(tokens)
+
+def name_trigrams(normalized):
+    """Trigramas do nome normalizado, sem partículas"""
+    text = ' ' + ' '.join(t for t in normalized.split() if t not in NAME_PARTICLES) + ' '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def blocking_keys(normalized, trigrams):
+    """Chaves de blocagem: trigramas e pares de palavras do nome
+    
+    Um erro de OCR numa palavra preserva os pares formados pelas demais,
+    que são bem mais seletivos que os trigramas de nomes comuns.
+    """
+    tokens = sorted({t for t in normalized.split() if t not in NAME_PARTICLES})
+    pairs = {f"{a}|{b}" for i, a in enumerate(tokens) for b in tokens[i + 1:]}
+    return trigrams | pairs
+
+class EmployeeIndex:
+    """Índice em memória dos funcionários para vincular contracheques
+    
+    A identidade vem do CPF válido; sem ele, o nome é comparado por forma
+    normalizada, chave fonética e, por último, similaridade de trigramas
+    (candidatos escolhidos pelas chaves de blocagem menos frequentes).
+    """
+    
+    # Marcador de parâmetro do driver do banco
+    PARAM = '?'
+    
+    _instances = {}
+    _instances_lock = threading.Lock()
+    
+    @classmethod
+    def for_database(cls, db_path):
+        """Retorna o índice compartilhado de um arquivo de banco"""
+        with cls._instances_lock:
+            index = cls._instances.get(db_path)
+            if index is None:
+                index = cls(db_path)
+                cls._instances[db_path] = index
+            return index
+    
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.data_extractor = DataExtractor()
+        self.threshold = EMPLOYEE_CONFIG["similarity_threshold"]
+        self.max_candidates = EMPLOYEE_CONFIG["max_candidates"]
+        self.blocking_budget = EMPLOYEE_CONFIG["blocking_budget"]
+        
+        self.lock = threading.RLock()
+        self.by_cpf = {}
+        self.cpf_of = {}
+        self.by_name = defaultdict(list)
+        self.by_phonetic = defaultdict(list)
+        self.trigrams = {}
+        self.postings = defaultdict(list)
+        self.last_id = 0
+        
+        self._load()
+    
+    def _load(self):
+        """Carga inicial dos funcionários"""
+        with sqlite3.connect(self.db_path) as conn:
+            self.refresh(conn.cursor())
+    
+    def refresh(self, cursor):
+        """Carrega os funcionários criados desde a última leitura (inclusive por outros processos)"""
+        cursor.execute(f'''
+            SELECT id, cpf, nome_normalizado, chave_fonetica FROM funcionarios
+            WHERE id > {self.PARAM} ORDER BY id
+        ''', [self.last_id])
+        
+        with self.lock:
+            for funcionario_id, cpf, normalized, key in cursor.fetchall():
+                self.add(funcionario_id, cpf, normalized, key)
+    
+    def add(self, funcionario_id, cpf, normalized, key):
+        """Adiciona um funcionário ao índice"""
+        with self.lock:
+            if cpf:
+                self.by_cpf[cpf] = funcionario_id
+                self.cpf_of[funcionario_id] = cpf
+            
+            if normalized:
+                self.by_name[normalized].append(funcionario_id)
+                self.by_phonetic[key].append(funcionario_id)
+                
+                trigrams = name_trigrams(normalized)
+                self.trigrams[funcionario_id] = trigrams
+                for key in blocking_keys(normalized, trigrams):
+                    self.postings[key].append(funcionario_id)
+            
+            self.last_id = max(self.last_id, funcionario_id)
+    
+    def set_cpf(self, funcionario_id, cpf):
+        with self.lock:
+            self.by_cpf[cpf] = funcionario_id
+            self.cpf_of[funcionario_id] = cpf
+    
+    def valid_cpf_digits(self, cpf):
+        """Dígitos do CPF, se válido; senão None"""
+        if not cpf or not self.data_extractor.validate_cpf(str(cpf)):
+            return None
+        return re.sub(r'[^\d]', '', str(cpf))
+    
+    def valid_cpf_digits_batch(self, cpfs):
+        """Versão em lote de valid_cpf_digits (validação vetorizada)"""
+        valid = self.data_extractor.validate_cpf_batch(cpfs)
+        return [re.sub(r'[^\d]', '', str(cpf)) if ok else None for cpf, ok in zip(cpfs, valid)]
+    
+    def match(self, nome, cpf_digits=None):
+        """Retorna o id do funcionário correspondente, ou None
+        
+        Com CPF válido, nomes só são comparados com funcionários ainda sem CPF.
+        """
+        with self.lock:
+            if cpf_digits and cpf_digits in self.by_cpf:
+                return self.by_cpf[cpf_digits]
+            
+            normalized = normalize_name(nome)
+            if not normalized:
+                return None
+            
+            def allowed(funcionario_id):
+                return not cpf_digits or funcionario_id not in self.cpf_of
+            
+            for candidates in (self.by_name.get(normalized, []),
+                               self.by_phonetic.get(phonetic_key(normalized), [])):
+                for funcionario_id in candidates:
+                    if allowed(funcionario_id):
+                        return funcionario_id
+            
+            return self._fuzzy_match(normalized, allowed)
+    
+    def _fuzzy_match(self, normalized, allowed):
+        """Melhor candidato por similaridade de Dice entre trigramas"""
+        trigrams = name_trigrams(normalized)
+        
+        # Blocagem: percorre as chaves mais raras primeiro, até o limite de
+        # ocorrências; as muito frequentes não discriminam e custam caro
+        postings = sorted((self.postings[key] for key in blocking_keys(normalized, trigrams)
+                           if key in self.postings), key=len)
+        
+        shared = Counter()
+        budget = self.blocking_budget
+        for posting in postings:
+            if shared and len(posting) > budget:
+                break
+            shared.update(posting)
+            budget -= len(posting)
+        
+        best_id, best_score = None, self.threshold
+        for funcionario_id, _ in shared.most_common(self.max_candidates):
+            if not allowed(funcionario_id):
+                continue
+            
+            other = self.trigrams[funcionario_id]
+            score = 2 * len(trigrams & other) / (len(trigrams) + len(other))
+            if score >= best_score:
+                best_id, best_score = funcionario_id, score
+        
+        return best_id
@@ -0,0 +1,90 @@
+import hashlib
+import os
+from config import API_CONFIG
+
+# Estados de um arquivo na ingestão, na ordem do processamento
+QUEUED = 'queued'
+OCR_DONE = 'ocr_done'
+EXTRACTED = 'extracted'
+SAVED = 'saved'
+FAILED = 'failed'
+
+# Arquivos com etapas por concluir
+PENDING_STATES = [QUEUED, OCR_DONE, EXTRACTED]
+
+class IngestionManifest:
+    """Manifesto dos arquivos processados, chaveado pelo hash do conteúdo
+    
+    Cada etapa concluída (OCR, extração, gravação) fica registrada com o que
+    produziu. Uma execução interrompida recomeça da etapa seguinte, sem
+    refazer o OCR, e arquivos já gravados não são processados de novo. Com
+    a gravação idempotente dos contracheques, repetir a última etapa não
+    duplica registros. Uma cópia do arquivo fica na pasta de espera
+    (API_CONFIG["spool_folder"]) até ele ser gravado ou falhar, para que a
+    retomada não dependa de um novo envio.
+    """
+    
+    def __init__(self, database):
+        self.database = database
+    
+    @staticmethod
+    def file_hash(conteudo):
+        """Hash (sha256) do conteúdo do arquivo, chave do manifesto"""
+        return hashlib.sha256(conteudo).hexdigest()
+    
+    def get(self, arquivo_hash):
+        """Entrada do arquivo (dict) ou None se ainda não foi visto"""
+        entries = self.database.get_manifest_entries(arquivo_hashes=[arquivo_hash])
+        return entries[0] if entries else None
+    
+    def pending(self):
+        """Entradas interrompidas antes da gravação, das mais antigas às mais recentes"""
+        return self.database.get_manifest_entries(estados=PENDING_STATES)
+    
+    def spool_path(self, arquivo_hash, arquivo):
+        """Cópia em disco do arquivo, pelo hash do conteúdo (com a extensão original)"""
+        return os.path.join(API_CONFIG["spool_folder"], arquivo_hash + os.path.splitext(arquivo or '')[1].lower())
+    
+    def spool(self, arquivo_hash, arquivo, conteudo):
+        """Copia o arquivo para a pasta de espera (gravação atômica) e retorna o caminho"""
+        caminho = self.spool_path(arquivo_hash, arquivo)
+        temporario = f"{caminho}.tmp"
+        with open(temporario, 'wb') as f:
+            f.write(conteudo)
+        os.replace(temporario, caminho)
+        return caminho
+    
+    def discard_spool(self, arquivo_hash, arquivo):
+        """Remove a cópia em disco do arquivo, se houver"""
+        try:
+            os.remove(self.spool_path(arquivo_hash, arquivo))
+        except OSError:
+            pass
+    
+    def resumable(self):
+        """Entradas pendentes que ainda têm a cópia em disco"""
+        return [entrada for entrada in self.pending()
+                if entrada['caminho'] and os.path.exists(entrada['caminho'])]
+    
+    def queue(self, arquivo_hash, arquivo, caminho=None):
+        """Registra o arquivo na fila (caminho: cópia em disco, se houver); conta uma tentativa
+        
+        Etapas já concluídas de um envio anterior são mantidas.
+        """
+        self.database.save_manifest_entry(arquivo_hash, QUEUED, arquivo=arquivo, caminho=caminho)
+    
+    def ocr_done(self, arquivo_hash, ocr_result):
+        """Guarda o resultado do OCR: retomadas partem da extração"""
+        self.database.save_manifest_entry(arquivo_hash, OCR_DONE, ocr_result=ocr_result)
+    
+    def extracted(self, arquivo_hash, dados, validacao):
+        """Guarda os dados extraídos e a validação: retomadas partem da gravação"""
+        self.database.save_manifest_entry(arquivo_hash, EXTRACTED, dados=dados, validacao=validacao)
+    
+    def saved(self, arquivo_hash, contracheque_id):
+        """Marca o arquivo como gravado (descarta o resultado do OCR e a cópia em disco)"""
+        self.database.save_manifest_entry(arquivo_hash, SAVED, contracheque_id=contracheque_id)
+    
+    def failed(self, arquivo_hash, erro):
+        """Marca o arquivo como falho; um novo envio o coloca na fila outra vez"""
+        self.database.save_manifest_entry(arquivo_hash, FAILED, erro=str(erro))
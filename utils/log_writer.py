@@ -0,0 +1,117 @@
+import sqlite3
+import threading
+import queue
+import atexit
+import json
+import sys
+from datetime import datetime, timezone
+from config import LOG_CONFIG
+
+class LogWriter:
+    """Grava logs em lote numa thread de fundo, com uma única conexão
+    
+    A conexão é aberta na primeira gravação e usada só sob _flush_lock (pela
+    thread de fundo ou por flush()); após um erro ela é reaberta.
+    """
+    
+    _instances = {}
+    _instances_lock = threading.Lock()
+    
+    @classmethod
+    def for_database(cls, db_path):
+        """Retorna o escritor compartilhado de um arquivo de banco"""
+        with cls._instances_lock:
+            writer = cls._instances.get(db_path)
+            if writer is None:
+                writer = cls(db_path)
+                cls._instances[db_path] = writer
+            return writer
+    
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.batch_size = LOG_CONFIG["batch_size"]
+        self.flush_interval = LOG_CONFIG["flush_interval"]
+        
+        self._queue = queue.Queue()
+        self._has_entries = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._conn = None
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        
+        atexit.register(self.flush)
+    
+    def write(self, tipo, mensagem, detalhes=None):
+        """Enfileira um registro de log (não bloqueia)"""
+        # Timestamp no mesmo formato do CURRENT_TIMESTAMP do SQLite
+        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        self._queue.put((tipo, mensagem, json.dumps(detalhes) if detalhes else None, timestamp))
+        self._has_entries.set()
+    
+    def flush(self):
+        """Grava imediatamente todos os registros pendentes
+        
+        Como a thread de fundo só retira registros da fila sob o mesmo lock,
+        nenhum lote fica em andamento quando flush() retorna.
+        """
+        with self._flush_lock:
+            self._write_batch(self._take())
+    
+    def _take(self, limit=None):
+        """Retira da fila até limit registros (todos, sem limit)"""
+        batch = []
+        while limit is None or len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        while True:
+            self._has_entries.wait(timeout=self.flush_interval)
+            
+            batch = []
+            try:
+                with self._flush_lock:
+                    self._has_entries.clear()
+                    batch = self._take(self.batch_size)
+                    
+                    # Lote cheio: pode haver mais registros na fila
+                    if len(batch) == self.batch_size:
+                        self._has_entries.set()
+                    
+                    self._write_batch(batch)
+            
+            except Exception as e:
+                # Um erro (banco travado, disco cheio) descarta só este lote
+                print(f"⚠️ Falha ao gravar {len(batch)} registro(s) de log: {e}", file=sys.stderr)
+    
+    def _connection(self):
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+    
+    def _connect(self):
+        """Abre a conexão do escritor (usada só pela thread que detém _flush_lock)"""
+        return sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+    
+    def _insert(self, conn, batch):
+        """Insere um lote de registros (tipo, mensagem, detalhes, timestamp)"""
+        conn.executemany('''
+            INSERT INTO logs (tipo, mensagem, detalhes, timestamp)
+            VALUES (?, ?, ?, ?)
+        ''', batch)
+    
+    def _write_batch(self, batch):
+        if not batch:
+            return
+        
+        try:
+            with self._connection() as conn:
+                self._insert(conn, batch)
+        except Exception:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            raise
@@ -1,13 +1,21 @@
-import pytesseract
-from pdf2image import convert_from_bytes
-from PIL import Image, ImageEnhance, ImageFilter
-import cv2
-import numpy as np
+from PIL import Image, ImageEnhance, ImageFilter, ImageSequence
 import os
-from config import get_tesseract_config, get_poppler_config, OCR_CONFIG
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import get_tesseract_config, get_poppler_config, OCR_CONFIG, TEMPLATE_CONFIG
+from .data_extractor import DataExtractor
+from .document import UploadedDocument
+
+class OCRCancelled(Exception):
+    """Processamento de documento cancelado"""
 
 class OCRProcessor:
-    def __init__(self):
+    def __init__(self, template_registry=None):
+        # Importações pesadas (OpenCV, NumPy, pdf2image) ficam dentro dos métodos
+        import pytesseract
+        
         # Configurar Tesseract
         tesseract_cmd, tessdata_prefix = get_tesseract_config()
         pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
@@ -15,12 +23,21 @@ class OCRProcessor:
         
         # Configurar Poppler
         self.poppler_path = get_poppler_config()
+        
+        # Usado para verificar campos obrigatórios entre os níveis de OCR
+        self.data_extractor = DataExtractor()
+        
+        # Templates de regiões por empresa (opcional)
+        self.template_registry = template_registry
     
     def preprocess_image(self, image):
         """Aplica pré-processamento na imagem para melhorar OCR"""
         if not OCR_CONFIG["preprocessing"]:
             return image
         
+        import cv2
+        import numpy as np
+        
         # Converter PIL para OpenCV
         img_array = np.array(image)
         
@@ -49,96 +66,738 @@ class OCRProcessor:
         
         return sharpened
     
-    def extract_text_from_pdf(self, pdf_file):
-        """Extrai texto de PDF usando OCR"""
+    def _profile_sharpness(self, binary, angle=0.0):
+        """Nitidez do perfil horizontal (soma por linha) após girar a imagem
+        
+        Linhas de texto alinhadas concentram a tinta em faixas separadas por
+        espaços em branco, o que maximiza as diferenças entre linhas vizinhas.
+        """
+        import cv2
+        import numpy as np
+        
+        if angle:
+            height, width = binary.shape
+            matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+            binary = cv2.warpAffine(binary, matrix, (width, height), flags=cv2.INTER_NEAREST)
+        
+        profile = binary.sum(axis=1, dtype=np.float64)
+        return float(np.sum(np.diff(profile) ** 2))
+    
+    def _search_skew(self, binary, angles):
+        """Ângulo mais nítido entre os candidatos, e sua nitidez"""
+        scores = [self._profile_sharpness(binary, angle) for angle in angles]
+        best = max(range(len(scores)), key=scores.__getitem__)
+        return float(angles[best]), scores[best]
+    
+    def _ascender_balance(self, binary):
+        """Predomínio de tinta acima (>0) ou abaixo (<0) da faixa central das linhas
+        
+        Em texto latino na posição correta, hastes, maiúsculas, dígitos e
+        acentos sobem acima da altura-x com mais frequência do que as
+        descendentes descem abaixo; numa página invertida, o sinal se inverte.
+        """
+        import numpy as np
+        
+        profile = binary.sum(axis=1, dtype=np.float64)
+        if not profile.any():
+            return 0.0
+        
+        ink = profile > profile.max() * 0.05
+        acima = abaixo = 0.0
+        
+        # Cada sequência de linhas com tinta é uma linha de texto
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], ink.astype(np.int8), [0]))))
+        for start, end in zip(edges[::2], edges[1::2]):
+            line = profile[start:end]
+            if len(line) < 4:
+                continue
+            
+            core = np.flatnonzero(line >= line.max() * 0.5)
+            acima += line[:core[0]].sum()
+            abaixo += line[core[-1] + 1:].sum()
+        
+        total = acima + abaixo
+        return (acima - abaixo) / total if total else 0.0
+    
+    def detect_orientation(self, image):
+        """Estima a rotação (0, 90, 180 ou 270°, anti-horário) e a inclinação da página
+        
+        Usa perfis de projeção numa cópia reduzida e binarizada, sem o OSD
+        do Tesseract. Inclinações abaixo de min_angle são retornadas como 0.
+        """
+        import cv2
+        import numpy as np
+        
+        config = OCR_CONFIG["deskew"]
+        
+        gray = np.array(image.convert('L'))
+        scale = config["probe_width"] / max(gray.shape)
+        if scale < 1:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        binary = (binary > 0).astype(np.uint8)
+        
+        # Página em branco (ou quase): nada a corrigir
+        if binary.mean() < 0.001:
+            return 0, 0.0
+        
+        # Busca grossa (2°) na página e na página deitada: a mais nítida
+        # indica em qual sentido correm as linhas de texto
+        coarse = np.arange(-config["max_angle"], config["max_angle"] + 1, 2.0)
+        candidates = [(0, binary), (90, np.ascontiguousarray(np.rot90(binary)))]
+        (inclinacao, _), rotacao, binary = max(
+            ((self._search_skew(candidate, coarse), rotacao, candidate) for rotacao, candidate in candidates),
+            key=lambda item: item[0][1]
+        )
+        
+        # Refinamento: passos de 1° e depois de 0,1° em torno do melhor ângulo
+        inclinacao, _ = self._search_skew(binary, np.arange(inclinacao - 2, inclinacao + 2.5, 1.0))
+        inclinacao, _ = self._search_skew(binary, np.arange(inclinacao - 0.9, inclinacao + 0.95, 0.1))
+        inclinacao = round(inclinacao, 1)
+        
+        if abs(inclinacao) < config["min_angle"]:
+            inclinacao = 0.0
+        
+        aligned = binary
+        if inclinacao:
+            height, width = binary.shape
+            matrix = cv2.getRotationMatrix2D((width / 2, height / 2), inclinacao, 1.0)
+            aligned = cv2.warpAffine(binary, matrix, (width, height), flags=cv2.INTER_NEAREST)
+        
+        if self._ascender_balance(aligned) < -config["flip_threshold"]:
+            rotacao += 180
+        
+        return rotacao, inclinacao
+    
+    def correct_orientation(self, image, rotacao, inclinacao):
+        """Aplica a rotação e a inclinação estimadas por detect_orientation"""
+        if not rotacao and not inclinacao:
+            return image
+        
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('L' if image.mode in ('1', 'I;16', 'I', 'F') else 'RGB')
+        
+        # Múltiplos de 90° sem reamostragem
+        if rotacao:
+            image = image.transpose({90: Image.ROTATE_90, 180: Image.ROTATE_180, 270: Image.ROTATE_270}[rotacao])
+        
+        if inclinacao:
+            import cv2
+            import numpy as np
+            
+            pixels = np.array(image)
+            height, width = pixels.shape[:2]
+            matrix = cv2.getRotationMatrix2D((width / 2, height / 2), inclinacao, 1.0)
+            image = Image.fromarray(cv2.warpAffine(pixels, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                                                   borderMode=cv2.BORDER_CONSTANT, borderValue=(255, 255, 255)))
+        
+        return image
+    
+    def _with_orientation(self, render_page):
+        """Envolve render_page corrigindo orientação e inclinação de cada página
+        
+        A estimativa é feita na primeira renderização da página (em geral no
+        nível barato) e reaplicada nos demais DPIs. Retorna (render_page,
+        medições por página).
+        """
+        medicoes = {}
+        
+        if not OCR_CONFIG["deskew"]["enabled"]:
+            return render_page, medicoes
+        
+        def render(i, tier):
+            image = render_page(i, tier)
+            start = time.perf_counter()
+            
+            if i not in medicoes:
+                rotacao, inclinacao = self.detect_orientation(image)
+                medicoes[i] = {"rotacao": rotacao, "inclinacao": inclinacao, "tempo": 0.0}
+            
+            medicao = medicoes[i]
+            image = self.correct_orientation(image, medicao["rotacao"], medicao["inclinacao"])
+            medicao["tempo"] += time.perf_counter() - start
+            
+            return image
+        
+        return render, medicoes
+    
+    def _orientation_summary(self, medicoes, attempted=None, tier_times=None):
+        """Custo da correção de orientação e retentativas que ela evitou (estimativa)
+        
+        Cada página corrigida que parou no nível barato conta como uma
+        passagem pelo segundo nível evitada.
+        """
+        corrigidas = sorted(i for i, medicao in medicoes.items() if medicao["rotacao"] or medicao["inclinacao"])
+        
+        economia = 0.0
+        if attempted is not None and len(OCR_CONFIG["tiers"]) > 1:
+            resolvidas = sum(1 for i in corrigidas if attempted[i] == 0)
+            economia = resolvidas * self._full_tier_mean(tier_times)
+        
+        return {
+            "paginas": [{"pagina": i, "rotacao": medicoes[i]["rotacao"], "inclinacao": medicoes[i]["inclinacao"]}
+                        for i in corrigidas],
+            "tempo": sum(medicao["tempo"] for medicao in medicoes.values()),
+            "economia_estimada": economia
+        }
+    
+    def _tesseract_config(self, tier):
+        """Monta a configuração do Tesseract para um nível de qualidade
+        
+        Usa os idiomas do documento (tier["idiomas"], definidos na escada de
+        níveis) ou OCR_CONFIG["languages"], e os modelos da variante do nível.
+        """
+        languages = tier.get("idiomas") or OCR_CONFIG["languages"]
+        config = f'--oem 3 --psm {tier["psm"]} -l {"+".join(languages)}'
+        
+        tessdata_dir = self._tessdata_dir(tier.get("modelo"), languages)
+        if tessdata_dir:
+            config += f' --tessdata-dir "{tessdata_dir}"'
+        
+        return config
+    
+    def _tessdata_dir(self, modelo, languages):
+        """Pasta da variante de modelo (fast/best), se tiver todos os idiomas; senão None (pasta padrão)"""
+        pasta = OCR_CONFIG["tessdata"].get(modelo) if modelo else None
+        
+        if pasta and all(os.path.exists(os.path.join(pasta, f"{language}.traineddata")) for language in languages):
+            return pasta
+        return None
+    
+    def _detect_languages(self, text):
+        """Idiomas do documento: OCR_CONFIG["languages"] mais os detectados no texto
+        
+        Heurística barata sobre o texto do nível rápido: um idioma extra entra
+        quando palavras frequentes dele são uma parcela relevante do texto.
+        """
+        detection = OCR_CONFIG["language_detection"]
+        languages = list(OCR_CONFIG["languages"])
+        
+        words = re.findall(r"[a-zà-ÿ]+", text.lower())
+        if not detection["enabled"] or not words:
+            return languages
+        
+        for language, vocabulary in detection["vocabulary"].items():
+            vocabulary = set(vocabulary)
+            matches = sum(1 for word in words if word in vocabulary)
+            if language not in languages and matches >= detection["min_matches"] \
+                    and matches / len(words) >= detection["min_ratio"]:
+                languages.append(language)
+        
+        return languages
+    
+    @staticmethod
+    def _image_dpi(image):
+        """DPI horizontal da imagem (300 se não informado)"""
+        return image.info.get('dpi', (300, 300))[0] or 300
+    
+    def _scale_image(self, image, target_dpi):
+        """Reduz a imagem para o DPI alvo (nunca amplia)"""
+        scale = target_dpi / self._image_dpi(image)
+        
+        if scale >= 1:
+            return image
+        
+        new_size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        return image.resize(new_size, Image.LANCZOS)
+    
+    def _ocr_image(self, image, tier):
+        """Executa o OCR de uma página em um nível de qualidade
+        
+        Imagens acima de OCR_CONFIG["max_tile_pixels"] são divididas em faixas
+        horizontais sobrepostas, para limitar memória e latência por chamada.
+        """
+        start = time.perf_counter()
+        
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('L' if image.mode in ('1', 'I;16', 'I', 'F') else 'RGB')
+        
+        if tier["preprocessing"]:
+            image = self.preprocess_image(image)
+        
+        if image.width * image.height > OCR_CONFIG["max_tile_pixels"]:
+            result = self._ocr_tiled(image, tier)
+        else:
+            result = self._ocr_single(image, tier)
+        
+        threshold = OCR_CONFIG["confidence_threshold"]
+        all_confidences = result.pop("all_confidences")
+        
+        result.update(
+            confidences=[c for c in all_confidences if c > threshold],
+            mean_confidence=sum(all_confidences) / len(all_confidences) if all_confidences else 0,
+            tier=tier["nome"],
+            elapsed=time.perf_counter() - start
+        )
+        
+        return result
+    
+    def _ocr_single(self, image, tier):
+        """OCR de uma imagem numa única chamada ao Tesseract"""
+        import pytesseract
+        
+        threshold = OCR_CONFIG["confidence_threshold"]
+        
+        # Extrair texto com dados de confiança
         try:
-            # Converter PDF para imagens
-            if self.poppler_path:
-                images = convert_from_bytes(pdf_file.read(), poppler_path=self.poppler_path)
-            else:
-                images = convert_from_bytes(pdf_file.read())
+            data = pytesseract.image_to_data(image, config=self._tesseract_config(tier), 
+                                           output_type=pytesseract.Output.DICT)
+            
+            # Confiança de todas as palavras reconhecidas
+            all_confidences = [float(conf) for conf, text in zip(data['conf'], data['text'])
+                               if float(conf) >= 0 and text.strip()]
+            
+            # Filtrar por confiança
+            kept = [i for i, conf in enumerate(data['conf']) 
+                    if float(conf) > threshold and data['text'][i].strip()]
             
-            all_text = ""
-            confidence_scores = []
+            text = ' '.join(data['text'][i] for i in kept)
             
-            for i, image in enumerate(images):
-                # Pré-processar imagem
-                processed_image = self.preprocess_image(image)
+            # Caixas das palavras em coordenadas relativas (0-1) à página
+            width, height = image.size
+            words = [{
+                "texto": data['text'][i],
+                "x": data['left'][i] / width,
+                "y": data['top'][i] / height,
+                "w": data['width'][i] / width,
+                "h": data['height'][i] / height,
+                "conf": float(data['conf'][i])
+            } for i in kept]
+        
+        except Exception:
+            # Fallback para OCR simples, com os mesmos idiomas e modelos
+            text = pytesseract.image_to_string(image, config=self._tesseract_config(tier))
+            all_confidences = []
+            words = []
+        
+        return {"text": text, "words": words, "all_confidences": all_confidences}
+    
+    def _ocr_tiled(self, image, tier):
+        """OCR por faixas horizontais sobrepostas, unindo as palavras
+        
+        Cada faixa só mantém as palavras cujo centro vertical cai na sua área
+        própria (metade da sobreposição para cada lado), eliminando duplicatas.
+        """
+        width, height = image.size
+        overlap = OCR_CONFIG["tile_overlap"]
+        tile_height = max(overlap * 2, OCR_CONFIG["max_tile_pixels"] // width)
+        step = tile_height - overlap
+        
+        words = []
+        all_confidences = []
+        fallback_texts = []
+        
+        top = 0
+        while top < height:
+            bottom = min(height, top + tile_height)
+            tile = self._ocr_single(image.crop((0, top, width, bottom)), tier)
+            
+            own_top = top + overlap / 2 if top > 0 else 0
+            own_bottom = bottom - overlap / 2 if bottom < height else height
+            scale = (bottom - top) / height
+            
+            if not tile["words"] and tile["text"]:
+                fallback_texts.append(tile["text"])
+            
+            for word in tile["words"]:
+                center = top + (word["y"] + word["h"] / 2) * (bottom - top)
+                if own_top <= center < own_bottom:
+                    words.append(dict(word, y=top / height + word["y"] * scale, h=word["h"] * scale))
+                    all_confidences.append(word["conf"])
+            
+            if bottom >= height:
+                break
+            top += step
+        
+        text = ' '.join(word["texto"] for word in words) or '\n'.join(fallback_texts)
+        
+        return {"text": text, "words": words, "all_confidences": all_confidences}
+    
+    def _missing_required_fields(self, text):
+        """Lista os campos obrigatórios que não aparecem no texto"""
+        return [field for field in OCR_CONFIG["required_fields"]
+                if not self.data_extractor.extract_field(text, field)]
+    
+    def _iter_quality_ladder(self, render_page, page_count, join_pages, cancel_event=None, orientation=None):
+        """Aplica os níveis de OCR do mais barato ao mais caro, página a página
+        
+        render_page(indice, tier) devolve a imagem da página no DPI do nível;
+        join_pages(textos) monta o texto final do documento. Gera um evento
+        por página concluída (na ordem de término) e, por último, o resultado.
+        orientation são as medições de _with_orientation, resumidas no resultado.
+        """
+        tiers = OCR_CONFIG["tiers"]
+        threshold = OCR_CONFIG["confidence_threshold"]
+        start = time.perf_counter()
+        
+        # Interrompido quando o consumidor cancela ou abandona o gerador
+        stop = threading.Event()
+        
+        def cancelled():
+            return stop.is_set() or (cancel_event is not None and cancel_event.is_set())
+        
+        def run(i, tier):
+            if cancelled():
+                raise OCRCancelled()
+            return self._ocr_image(render_page(i, tier), tier)
+        
+        # Páginas processadas em paralelo (o Tesseract roda em subprocessos)
+        executor = ThreadPoolExecutor(max_workers=OCR_CONFIG["page_workers"])
+        
+        try:
+            results = [None] * page_count
+            attempted = [0] * page_count
+            tier_times = {tier["nome"]: [] for tier in tiers}
+            languages = used_languages = list(OCR_CONFIG["languages"])
+            
+            for level in range(len(tiers)):
+                if level == 0:
+                    pending = list(range(page_count))
+                else:
+                    text = join_pages([r["text"] for r in results])
+                    missing = self._missing_required_fields(text)
+                    
+                    # Idiomas extras decididos pelo texto do nível rápido
+                    if level == 1:
+                        languages = self._detect_languages(text)
+                    
+                    # Só sobem páginas que passaram por todos os níveis anteriores
+                    pending = [i for i in range(page_count)
+                               if attempted[i] == level - 1
+                               and (missing or results[i]["mean_confidence"] < threshold)]
+                
+                if not pending:
+                    break
                 
-                # Configurar OCR
-                custom_config = f'--oem 3 --psm 6 -l {"+".join(OCR_CONFIG["languages"])}'
+                used_languages = languages
+                tier = dict(tiers[level], idiomas=languages)
+                futures = {executor.submit(run, i, tier): i for i in pending}
                 
-                # Extrair texto com dados de confiança
-                try:
-                    data = pytesseract.image_to_data(processed_image, config=custom_config, 
-                                                   output_type=pytesseract.Output.DICT)
+                for done, future in enumerate(as_completed(futures), start=1):
+                    i = futures[future]
+                    result = future.result()
+                    attempted[i] = level
+                    tier_times[tiers[level]["nome"]].append(result["elapsed"])
                     
-                    # Filtrar por confiança
-                    confidences = [int(conf) for conf in data['conf'] if int(conf) > OCR_CONFIG["confidence_threshold"]]
-                    words = [data['text'][i] for i, conf in enumerate(data['conf']) 
-                           if int(conf) > OCR_CONFIG["confidence_threshold"] and data['text'][i].strip()]
+                    if results[i] is None or result["mean_confidence"] >= results[i]["mean_confidence"]:
+                        results[i] = result
                     
-                    page_text = ' '.join(words)
-                    all_text += f"\n--- Página {i+1} ---\n{page_text}\n"
+                    yield {
+                        "tipo": "pagina",
+                        "pagina": i,
+                        "total": page_count,
+                        "concluidas": done,
+                        "pendentes": len(pending),
+                        "nivel": tiers[level]["nome"],
+                        "texto": results[i]["text"],
+                        "confianca": results[i]["mean_confidence"]
+                    }
                     
-                    if confidences:
-                        confidence_scores.extend(confidences)
-                
-                except Exception as e:
-                    # Fallback para OCR simples
-                    page_text = pytesseract.image_to_string(processed_image, lang='por+eng')
-                    all_text += f"\n--- Página {i+1} ---\n{page_text}\n"
+                    if cancelled():
+                        raise OCRCancelled()
             
+            confidence_scores = [c for r in results for c in r["confidences"]]
             avg_confidence = sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0
             
-            return {
-                "text": all_text,
-                "pages": len(images),
+            tier_distribution = {tier["nome"]: 0 for tier in tiers}
+            for result in results:
+                tier_distribution[result["tier"]] += 1
+            
+            yield {"tipo": "resultado", "resultado": {
+                "text": join_pages([r["text"] for r in results]),
+                "words": [dict(word, pagina=i) for i, r in enumerate(results) for word in r["words"]],
+                "pages": page_count,
                 "confidence": avg_confidence,
+                "tiers": tier_distribution,
+                "tempo_ocr": time.perf_counter() - start,
+                "tempo_economizado": self._estimate_time_saved(tier_times, attempted),
+                "idiomas": used_languages,
+                "orientacao": self._orientation_summary(orientation or {}, attempted, tier_times),
                 "status": "success"
-            }
-            
-        except Exception as e:
-            return {
-                "text": "",
-                "pages": 0,
+            }}
+        
+        except OCRCancelled:
+            yield {"tipo": "resultado", "resultado": {
+                "text": join_pages([r["text"] if r else "" for r in results]),
+                "pages": page_count,
                 "confidence": 0,
-                "status": "error",
-                "error": str(e)
-            }
+                "status": "cancelled",
+                "error": "Processamento cancelado"
+            }}
+        
+        finally:
+            # Libera os workers: páginas ainda não iniciadas são descartadas
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
     
-    def extract_text_from_image(self, image_file):
-        """Extrai texto de imagem usando OCR"""
+    def _estimate_time_saved(self, tier_times, attempted):
+        """Estima o tempo poupado pelas páginas que pararam no nível barato"""
+        tiers = OCR_CONFIG["tiers"]
+        if len(tiers) < 2:
+            return 0.0
+        
+        cheap_times = tier_times[tiers[0]["nome"]]
+        cheap_pages = sum(1 for level in attempted if level == 0)
+        
+        if not cheap_pages or not cheap_times:
+            return 0.0
+        
+        cheap_mean = sum(cheap_times) / len(cheap_times)
+        return max(0.0, (self._full_tier_mean(tier_times) - cheap_mean) * cheap_pages)
+    
+    def _full_tier_mean(self, tier_times):
+        """Tempo médio de uma página no segundo nível
+        
+        Sem medição, estima pelo nível barato e pela razão de pixels entre os DPIs.
+        """
+        tiers = OCR_CONFIG["tiers"]
+        cheap_times = tier_times[tiers[0]["nome"]]
+        full_times = tier_times[tiers[1]["nome"]]
+        
+        if full_times:
+            return sum(full_times) / len(full_times)
+        if cheap_times:
+            return sum(cheap_times) / len(cheap_times) * (tiers[1]["dpi"] / tiers[0]["dpi"]) ** 2
+        return 0.0
+    
+    def _ocr_with_template(self, render_page):
+        """Tenta o OCR só das regiões de um template aprendido da empresa
+        
+        Lê uma faixa do cabeçalho para identificar a empresa e, se houver
+        template ativo, reconhece apenas os recortes dos campos. Retorna
+        None quando não há template ou faltam campos obrigatórios.
+        """
+        if not self.template_registry or not self.template_registry.has_templates():
+            return None
+        
+        start = time.perf_counter()
+        tiers = OCR_CONFIG["tiers"]
+        
+        # Cabeçalho no nível barato para descobrir a empresa
+        page = render_page(0, tiers[0])
+        header = page.crop((0, 0, page.width, int(page.height * TEMPLATE_CONFIG["header_fraction"])))
+        template = self.template_registry.match(self._ocr_image(header, tiers[0])["text"])
+        if not template:
+            return None
+        
+        # Recortes no DPI do nível completo
+        tier = tiers[min(1, len(tiers) - 1)]
+        page = render_page(0, tier)
+        
+        fields = {}
+        confidence_scores = []
+        for field, (x, y, w, h) in template["regioes"].items():
+            box = (int(x * page.width), int(y * page.height),
+                   int((x + w) * page.width), int((y + h) * page.height))
+            crop_result = self._ocr_image(page.crop(box), tier)
+            fields[field] = crop_result["text"]
+            confidence_scores.extend(crop_result["confidences"])
+        
+        if any(not self.data_extractor.extract_field(fields.get(field, ""), field)
+               for field in OCR_CONFIG["required_fields"]):
+            return None
+        
+        return {
+            "text": "\n".join(f"[{field}] {text}" for field, text in fields.items()),
+            "fields": fields,
+            "words": [],
+            "template": template["empresa"],
+            "pages": 1,
+            "confidence": sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0,
+            "tiers": {"template": 1},
+            "idiomas": list(OCR_CONFIG["languages"]),
+            "tempo_ocr": time.perf_counter() - start,
+            "tempo_economizado": 0.0,
+            "status": "success"
+        }
+    
+    def _estimate_x_height(self, image):
+        """Estima a altura-x do texto (pixels) pelos componentes conectados
+        
+        Usa o quantil inferior das alturas dos componentes com forma de
+        caractere (letras sem haste). Retorna None com poucos caracteres.
+        """
+        import cv2
+        import numpy as np
+        
+        gray = np.array(image.convert('L'))
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        
+        widths = stats[1:, cv2.CC_STAT_WIDTH]
+        heights = stats[1:, cv2.CC_STAT_HEIGHT]
+        areas = stats[1:, cv2.CC_STAT_AREA]
+        
+        # Descarta ruído, pontuação, linhas de tabela e blocos preenchidos
+        characters = ((heights >= 3) & (heights <= gray.shape[0] / 20)
+                      & (widths <= heights * 3) & (areas >= widths * heights * 0.1))
+        
+        if characters.sum() < OCR_CONFIG["dpi_autotune"]["min_characters"]:
+            return None
+        
+        return float(np.percentile(heights[characters], 20))
+    
+    def _tune_dpis(self, probe, probe_dpi=None):
+        """DPI de cada nível para o documento, a partir da primeira página renderizada a probe_dpi
+        
+        probe_dpi é a resolução real do probe (padrão: a configurada); imagens
+        com DPI menor não são ampliadas e são medidas no DPI nativo. Retorna o
+        dict registrado no resultado: DPIs por nível, altura-x medida (pixels
+        no DPI do probe), DPI do probe e tempo do probe.
+        """
+        autotune = OCR_CONFIG["dpi_autotune"]
+        tiers = OCR_CONFIG["tiers"]
+        probe_dpi = probe_dpi or autotune["probe_dpi"]
+        start = time.perf_counter()
+        
+        x_height = self._estimate_x_height(probe) if probe is not None else None
+        dpis = {tier["nome"]: tier["dpi"] for tier in tiers}
+        
+        if x_height:
+            # Menor DPI que leva o texto à altura-x alvo no nível de maior DPI
+            target_dpi = probe_dpi * autotune["target_x_height"] / x_height
+            scale = target_dpi / max(dpis.values())
+            dpis = {nome: int(min(max(round(dpi * scale / 10) * 10, autotune["min_dpi"]), autotune["max_dpi"]))
+                    for nome, dpi in dpis.items()}
+        
+        return {
+            "niveis": dpis,
+            "altura_x": x_height,
+            "dpi_probe": probe_dpi,
+            "tempo_probe": time.perf_counter() - start
+        }
+    
+    def _check_page_count(self, page_count):
+        if page_count > OCR_CONFIG["max_pages"]:
+            raise ValueError(f"Documento com {page_count} páginas (máximo: {OCR_CONFIG['max_pages']})")
+    
+    def _open_pdf(self, document):
+        """Prepara a renderização das páginas de um PDF"""
+        from pdf2image import convert_from_path, pdfinfo_from_path
+        
+        # Converter PDF para imagens a partir de um único arquivo no disco
+        pdf_path = document.path()
+        poppler_kwargs = {"poppler_path": self.poppler_path} if self.poppler_path else {}
+        
+        # Recusar antes de rasterizar
+        page_count = pdfinfo_from_path(pdf_path, **poppler_kwargs)["Pages"]
+        self._check_page_count(page_count)
+        
+        # Primeira página em baixa resolução para medir o texto
+        probe = None
+        if OCR_CONFIG["dpi_autotune"]["enabled"]:
+            probe = convert_from_path(pdf_path, dpi=OCR_CONFIG["dpi_autotune"]["probe_dpi"], first_page=1,
+                                      last_page=1, grayscale=True, **poppler_kwargs)[0]
+        ajuste_dpi = self._tune_dpis(probe)
+        dpis = ajuste_dpi["niveis"]
+        
+        # Uma página por vez, quando o nível precisa dela: a primeira página
+        # sai sem esperar o documento inteiro e só as páginas em OCR ficam em memória
+        def render_page(i, tier):
+            return convert_from_path(pdf_path, dpi=dpis[tier["nome"]], first_page=i + 1,
+                                     last_page=i + 1, **poppler_kwargs)[0]
+        
+        def join_pages(texts):
+            return "".join(f"\n--- Página {i+1} ---\n{text}\n" for i, text in enumerate(texts))
+        
+        return render_page, page_count, join_pages, ajuste_dpi
+    
+    def _open_image(self, document):
+        """Prepara a renderização dos frames de uma imagem"""
+        image = Image.open(document.open())
+        self._check_page_count(getattr(image, 'n_frames', 1))
+        
+        # TIFFs podem ter várias páginas (frames)
+        frames = []
+        for frame in ImageSequence.Iterator(image):
+            frame_copy = frame.copy()
+            frame_copy.info.setdefault('dpi', image.info.get('dpi', (300, 300)))
+            frames.append(frame_copy)
+        
+        # Abaixo do DPI do probe a imagem não é ampliada: a medida fica no DPI nativo
+        probe = None
+        probe_dpi = min(OCR_CONFIG["dpi_autotune"]["probe_dpi"], self._image_dpi(frames[0]))
+        if OCR_CONFIG["dpi_autotune"]["enabled"]:
+            probe = self._scale_image(frames[0], probe_dpi)
+        ajuste_dpi = self._tune_dpis(probe, probe_dpi)
+        dpis = ajuste_dpi["niveis"]
+        
+        def render_page(i, tier):
+            return self._scale_image(frames[i], dpis[tier["nome"]])
+        
+        def join_pages(texts):
+            if len(texts) == 1:
+                return texts[0]
+            return "".join(f"\n--- Página {i+1} ---\n{text}\n" for i, text in enumerate(texts))
+        
+        return render_page, len(frames), join_pages, ajuste_dpi
+    
+    def iter_document(self, document, cancel_event=None, is_pdf=None):
+        """Processa um documento gerando eventos de progresso por página
+        
+        Eventos {"tipo": "pagina", ...} chegam na ordem em que as páginas
+        terminam (não necessariamente em ordem); o último evento é sempre
+        {"tipo": "resultado", "resultado": {...}}. Definir cancel_event ou
+        fechar o gerador interrompe o documento e libera os workers.
+        """
         try:
-            image = Image.open(image_file)
-            processed_image = self.preprocess_image(image)
-            
-            custom_config = f'--oem 3 --psm 6 -l {"+".join(OCR_CONFIG["languages"])}'
-            
-            # Extrair texto com dados de confiança
-            data = pytesseract.image_to_data(processed_image, config=custom_config, 
-                                           output_type=pytesseract.Output.DICT)
+            document = UploadedDocument.wrap(document)
+            is_pdf = document.is_pdf if is_pdf is None else is_pdf
             
-            # Filtrar por confiança
-            confidences = [int(conf) for conf in data['conf'] if int(conf) > OCR_CONFIG["confidence_threshold"]]
-            words = [data['text'][i] for i, conf in enumerate(data['conf']) 
-                   if int(conf) > OCR_CONFIG["confidence_threshold"] and data['text'][i].strip()]
+            if is_pdf:
+                render_page, page_count, join_pages, ajuste_dpi = self._open_pdf(document)
+            else:
+                render_page, page_count, join_pages, ajuste_dpi = self._open_image(document)
             
-            text = ' '.join(words)
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+            # Páginas giradas ou inclinadas corrigidas antes do OCR (todos os níveis e templates)
+            render_page, orientation = self._with_orientation(render_page)
             
-            return {
-                "text": text,
-                "pages": 1,
-                "confidence": avg_confidence,
-                "status": "success"
-            }
+            if page_count == 1:
+                template_result = self._ocr_with_template(render_page)
+                if template_result:
+                    yield {"tipo": "pagina", "pagina": 0, "total": 1, "concluidas": 1, "pendentes": 1,
+                           "nivel": "template", "texto": template_result["text"],
+                           "confianca": template_result["confidence"]}
+                    yield {"tipo": "resultado", "resultado": dict(template_result, dpi=ajuste_dpi,
+                                                                  orientacao=self._orientation_summary(orientation))}
+                    return
             
+            # DPIs usados registrados no resultado, para calibrar o ajuste
+            for event in self._iter_quality_ladder(render_page, page_count, join_pages, cancel_event, orientation):
+                if event["tipo"] == "resultado":
+                    event["resultado"]["dpi"] = ajuste_dpi
+                yield event
+        
         except Exception as e:
-            return {
+            yield {"tipo": "resultado", "resultado": {
                 "text": "",
                 "pages": 0,
                 "confidence": 0,
                 "status": "error",
                 "error": str(e)
-            } 
\ No newline at end of file
+            }}
+    
+    def _consume(self, events, on_page=None):
+        """Percorre os eventos chamando on_page e devolve o resultado final"""
+        for event in events:
+            if event["tipo"] == "resultado":
+                return event["resultado"]
+            if on_page:
+                on_page(event)
+    
+    def extract_text_from_pdf(self, pdf_file, on_page=None, cancel_event=None):
+        """Extrai texto de PDF usando OCR
+        
+        pdf_file pode ser um UploadedDocument ou qualquer upload/bytes;
+        on_page(evento) é chamado a cada página concluída.
+        """
+        return self._consume(self.iter_document(pdf_file, cancel_event, is_pdf=True), on_page)
+    
+    def extract_text_from_image(self, image_file, on_page=None, cancel_event=None):
+        """Extrai texto de imagem usando OCR
+        
+        image_file pode ser um UploadedDocument ou qualquer upload/bytes;
+        on_page(evento) é chamado a cada página (frame) concluída.
+        """
+        return self._consume(self.iter_document(image_file, cancel_event, is_pdf=False), on_page)
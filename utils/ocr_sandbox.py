@@ -0,0 +1,241 @@
+"""
+Isolamento do OCR em processos de trabalho
+
+Cada documento roda num processo separado, com o OCRProcessor completo; o
+Tesseract e o Poppler ficam no grupo de processos do trabalhador. O processo
+principal acompanha os eventos pelo pipe e, quando o documento estoura o
+tempo total, passa tempo demais sem concluir uma página ou derruba o
+trabalhador, encerra o grupo inteiro e devolve um resultado de erro: um
+arquivo hostil não trava nem derruba o app ou a API. O espaço de memória de
+cada trabalhador é limitado (RLIMIT_AS, herdado pelo Tesseract e pelo
+Poppler) e os processos são substituídos após alguns documentos. O
+trabalhador não abre o banco: os templates de regiões vêm com cada documento.
+"""
+
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from config import OCR_SANDBOX_CONFIG
+from .document import UploadedDocument
+
+def _error_result(mensagem):
+    return {"text": "", "pages": 0, "confidence": 0, "status": "error", "error": mensagem}
+
+def _limit_resources(max_memory_mb):
+    # Grupo próprio: ao encerrar o trabalhador, os filhos vão junto
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    
+    try:
+        import resource
+    except ImportError:
+        return
+    
+    if max_memory_mb:
+        limite = max_memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limite, limite))
+
+def _worker_main(conn, cancel_event, max_memory_mb):
+    """Laço do trabalhador: recebe documentos e devolve os eventos do OCR"""
+    # Ctrl+C é tratado pelo processo principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _limit_resources(max_memory_mb)
+    
+    from .ocr_processor import OCRProcessor
+    from .template_registry import TemplateRegistry
+    
+    ocr_processor = OCRProcessor(TemplateRegistry(templates={}))
+    
+    while True:
+        try:
+            tarefa = conn.recv()
+        except EOFError:
+            return
+        
+        if tarefa is None:
+            return
+        
+        conteudo, nome, is_pdf, templates = tarefa
+        
+        # Templates atuais do processo principal
+        ocr_processor.template_registry.templates = templates
+        
+        document = UploadedDocument(conteudo, name=nome)
+        try:
+            for event in ocr_processor.iter_document(document, cancel_event, is_pdf):
+                conn.send(event)
+        finally:
+            document.close()
+
+class _Worker:
+    """Processo de trabalho com seu pipe e evento de cancelamento"""
+    
+    def __init__(self, context, max_memory_mb):
+        self.conn, child_conn = context.Pipe()
+        self.cancel_event = context.Event()
+        self.process = context.Process(target=_worker_main, args=(child_conn, self.cancel_event, max_memory_mb),
+                                       daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.documents = 0
+    
+    def kill(self):
+        """Encerra o trabalhador e os processos filhos (Tesseract, Poppler)"""
+        try:
+            # Só o grupo próprio: antes do setpgrp o grupo ainda é o do processo principal
+            if os.getpgid(self.process.pid) == self.process.pid:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            else:
+                self.process.kill()
+        except (AttributeError, OSError):
+            self.process.kill()
+        
+        self.process.join(5)
+        self.conn.close()
+    
+    def stop(self):
+        """Encerra o trabalhador ocioso"""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        
+        self.process.join(5)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+class OCRSandbox:
+    """OCR em processos isolados, com o mesmo contrato de OCRProcessor.iter_document
+    
+    Até `workers` documentos são processados ao mesmo tempo; os processos
+    são criados sob demanda e reaproveitados entre documentos.
+    """
+    
+    _shared = None
+    _shared_lock = threading.Lock()
+    
+    @classmethod
+    def shared(cls):
+        """Retorna a instância compartilhada do app"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(OCR_SANDBOX_CONFIG["workers"])
+            return cls._shared
+    
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.document_timeout = OCR_SANDBOX_CONFIG["document_timeout"]
+        self.page_timeout = OCR_SANDBOX_CONFIG["page_timeout"]
+        self.max_memory_mb = OCR_SANDBOX_CONFIG["max_memory_mb"]
+        self.max_documents = OCR_SANDBOX_CONFIG["max_documents_per_worker"]
+        
+        # spawn: o trabalhador não herda threads nem conexões do processo principal
+        self.context = multiprocessing.get_context('spawn')
+        
+        # Vagas livres: um trabalhador ocioso ou None (criado na próxima tarefa)
+        self._idle = queue.Queue()
+        for _ in range(workers):
+            self._idle.put(None)
+    
+    def _acquire(self):
+        worker = self._idle.get()
+        if worker is None or not worker.process.is_alive():
+            worker = _Worker(self.context, self.max_memory_mb)
+        return worker
+    
+    def _release(self, worker, reusable):
+        if not reusable:
+            worker.kill()
+            worker = None
+        else:
+            worker.documents += 1
+            if worker.documents >= self.max_documents:
+                worker.stop()
+                worker = None
+        
+        self._idle.put(worker)
+    
+    def iter_document(self, document, cancel_event=None, is_pdf=None, templates=None):
+        """Processa um documento num trabalhador, gerando os eventos de OCRProcessor.iter_document
+        
+        templates são os templates de regiões (TemplateRegistry.templates) a
+        usar no documento; sem eles, o OCR é feito na página inteira. O último
+        evento é sempre {"tipo": "resultado", ...}; tempo esgotado ou falha do
+        trabalhador viram um resultado com status "error". Fechar o gerador
+        antes do fim encerra o trabalhador.
+        """
+        document = UploadedDocument.wrap(document)
+        is_pdf = document.is_pdf if is_pdf is None else is_pdf
+        
+        worker = self._acquire()
+        try:
+            worker.cancel_event.clear()
+            worker.conn.send((bytes(document.view), document.name, is_pdf, templates or {}))
+            
+            inicio = ultima_pagina = time.monotonic()
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    worker.cancel_event.set()
+                
+                agora = time.monotonic()
+                if agora - inicio > self.document_timeout:
+                    erro = f"Tempo limite do documento excedido ({self.document_timeout}s)"
+                    break
+                if agora - ultima_pagina > self.page_timeout:
+                    erro = f"Tempo limite por página excedido ({self.page_timeout}s)"
+                    break
+                
+                if not worker.conn.poll(0.5):
+                    continue
+                
+                try:
+                    event = worker.conn.recv()
+                except EOFError:
+                    worker.process.join(1)
+                    erro = f"Processo de OCR encerrado inesperadamente (código {worker.process.exitcode})"
+                    break
+                
+                if event['tipo'] == 'resultado':
+                    # Vaga devolvida antes do último evento: o consumidor pode parar aqui
+                    self._release(worker, reusable=True)
+                    worker = None
+                    yield event
+                    return
+                
+                ultima_pagina = time.monotonic()
+                yield event
+            
+            self._release(worker, reusable=False)
+            worker = None
+            yield {"tipo": "resultado", "resultado": _error_result(erro)}
+        
+        finally:
+            # Gerador abandonado no meio do documento
+            if worker is not None:
+                self._release(worker, reusable=False)
+    
+    def extract_text(self, document, on_page=None, cancel_event=None, is_pdf=None, templates=None):
+        """Processa um documento e retorna o resultado final
+        
+        on_page, se informado, recebe cada evento de página concluída.
+        """
+        for event in self.iter_document(document, cancel_event, is_pdf, templates):
+            if event['tipo'] == 'resultado':
+                return event['resultado']
+            if on_page:
+                on_page(event)
+    
+    def shutdown(self):
+        """Encerra os trabalhadores ociosos"""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if worker is not None:
+                worker.stop()
@@ -0,0 +1,740 @@
+import csv
+import hashlib
+import io
+import json
+import threading
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta, timezone
+from config import APP_CONFIG, LOG_CONFIG, STORAGE_CONFIG
+from .employee_index import EmployeeIndex, normalize_name, phonetic_key
+from .log_writer import LogWriter
+from .storage import StorageBackend
+
+try:
+    import psycopg2
+    from psycopg2.extras import execute_values
+    from psycopg2.pool import ThreadedConnectionPool
+except ImportError as e:
+    raise ImportError("O backend PostgreSQL requer o psycopg2 (pip install psycopg2-binary)") from e
+
+# Chave do lock consultivo que serializa a criação do esquema entre os nós
+SCHEMA_LOCK_KEY = 0x636f6e74
+
+# Chave do lock consultivo que serializa a criação de funcionários entre os nós
+EMPLOYEE_LOCK_KEY = 0x66756e63
+
+# Marcador de nulo no CSV enviado ao COPY (vazio continua sendo string vazia)
+COPY_NULL = r'\N'
+
+class PostgresLogWriter(LogWriter):
+    """LogWriter do PostgreSQL: mesma fila e thread de fundo, com uma conexão própria fora do pool"""
+    
+    _instances = {}
+    
+    def _connect(self):
+        return psycopg2.connect(self.db_path)
+    
+    def _insert(self, conn, batch):
+        execute_values(conn.cursor(), '''
+            INSERT INTO logs (tipo, mensagem, detalhes, timestamp) VALUES %s
+        ''', batch, page_size=self.batch_size)
+
+class PostgresEmployeeIndex(EmployeeIndex):
+    """EmployeeIndex carregado da tabela funcionarios do PostgreSQL"""
+    
+    PARAM = '%s'
+    
+    _instances = {}
+    
+    def _load(self):
+        with closing(psycopg2.connect(self.db_path)) as conn:
+            self.refresh(conn.cursor())
+
+class PostgresDatabase(StorageBackend):
+    """Armazenamento em PostgreSQL, compartilhado por vários nós de ingestão
+    
+    Conexões vêm de um pool por processo e inserções em lote usam COPY. O
+    texto do OCR, os arquivos originais (só o hash é gravado), as anomalias
+    e a auditoria continuam exclusivos do SQLite (ver FEATURES).
+    """
+    
+    FEATURES = frozenset({'funcionarios'})
+    
+    # Colunas gravadas na inserção de contracheques
+    INSERT_COLUMNS = [
+        'nome', 'cpf', 'periodo', 'empresa', 'cargo', 'salario_bruto',
+        'salario_liquido', 'descontos', 'data_processamento',
+        'texto_original', 'confianca_ocr', 'arquivo_origem',
+        'validacao_status', 'validacao_erros', 'validacao_avisos', 'arquivo_hash',
+        'funcionario_id'
+    ]
+    
+    _pools = {}
+    _pools_lock = threading.Lock()
+    
+    @classmethod
+    def _pool_for(cls, dsn):
+        """Retorna o pool de conexões compartilhado de uma DSN"""
+        with cls._pools_lock:
+            pool = cls._pools.get(dsn)
+            if pool is None:
+                pool = ThreadedConnectionPool(STORAGE_CONFIG["pool_min"], STORAGE_CONFIG["pool_max"], dsn)
+                cls._pools[dsn] = pool
+            return pool
+    
+    def __init__(self, dsn=None):
+        self.dsn = dsn or STORAGE_CONFIG["postgres_dsn"]
+        self.pool = self._pool_for(self.dsn)
+        self._employee_index = None
+        self.init_database()
+        self.log_writer = PostgresLogWriter.for_database(self.dsn)
+        
+        if self._vincular_funcionarios:
+            self.link_employees()
+    
+    @contextmanager
+    def _connection(self):
+        """Conexão do pool: commit ao sair, rollback em caso de erro"""
+        conn = self.pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn)
+    
+    def _read_query(self, query, params=None):
+        """Executa uma consulta e retorna um DataFrame"""
+        import pandas as pd
+        
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            columns = [column.name for column in cursor.description]
+            return pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+    
+    def init_database(self):
+        """Inicializa o banco de dados com as tabelas necessárias"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            # Vários nós podem subir ao mesmo tempo
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [SCHEMA_LOCK_KEY])
+            
+            # Tabela principal de contracheques
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS contracheques (
+                    id BIGSERIAL PRIMARY KEY,
+                    nome TEXT,
+                    cpf TEXT,
+                    periodo TEXT,
+                    empresa TEXT,
+                    cargo TEXT,
+                    salario_bruto DOUBLE PRECISION,
+                    salario_liquido DOUBLE PRECISION,
+                    descontos DOUBLE PRECISION,
+                    data_processamento TEXT,
+                    texto_original TEXT,
+                    confianca_ocr DOUBLE PRECISION,
+                    arquivo_origem TEXT,
+                    validacao_status TEXT,
+                    validacao_erros TEXT,
+                    validacao_avisos TEXT,
+                    arquivo_hash TEXT,
+                    funcionario_id BIGINT,
+                    created_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')
+                )
+            ''')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_contracheques_periodo ON contracheques(periodo)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_contracheques_nome ON contracheques(nome)")
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_contracheques_funcionario_periodo
+                ON contracheques(funcionario_id, periodo)
+            ''')
+            
+            # Funcionários (identidade por CPF ou nome aproximado, como no SQLite);
+            # bancos anteriores deixavam funcionario_id nulo e são vinculados na abertura
+            cursor.execute("SELECT to_regclass('funcionarios') IS NULL")
+            self._vincular_funcionarios = cursor.fetchone()[0]
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS funcionarios (
+                    id BIGSERIAL PRIMARY KEY,
+                    cpf TEXT UNIQUE,
+                    nome TEXT,
+                    nome_normalizado TEXT,
+                    chave_fonetica TEXT,
+                    created_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')
+                )
+            ''')
+            
+            # Bancos anteriores: hash do arquivo de origem; mesmo arquivo, CPF e
+            # período identificam uma única gravação
+            cursor.execute("ALTER TABLE contracheques ADD COLUMN IF NOT EXISTS arquivo_hash TEXT")
+            cursor.execute(f'''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_contracheques_arquivo_cpf_periodo
+                ON contracheques {self.UPSERT_TARGET}
+            ''')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS configuracoes (
+                    chave TEXT PRIMARY KEY,
+                    valor TEXT,
+                    descricao TEXT,
+                    updated_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS logs (
+                    id BIGSERIAL PRIMARY KEY,
+                    tipo TEXT,
+                    mensagem TEXT,
+                    detalhes TEXT,
+                    timestamp TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')
+                )
+            ''')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp)")
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS templates_empresa (
+                    empresa TEXT PRIMARY KEY,
+                    regioes TEXT NOT NULL,
+                    documentos INTEGER NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')
+                )
+            ''')
+            
+            # Manifesto de ingestão: etapa de cada arquivo, para retomar lotes interrompidos
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS manifesto_arquivos (
+                    arquivo_hash TEXT PRIMARY KEY,
+                    arquivo TEXT,
+                    estado TEXT NOT NULL,
+                    caminho TEXT,
+                    resultado_ocr BYTEA,
+                    dados TEXT,
+                    validacao TEXT,
+                    contracheque_id BIGINT,
+                    erro TEXT,
+                    tentativas INTEGER NOT NULL DEFAULT 0,
+                    atualizado_em TIMESTAMP
+                )
+            ''')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_manifesto_estado ON manifesto_arquivos(estado)")
+    
+    def _row(self, cursor, data, ocr_confidence, arquivo_origem, validacao, arquivo_conteudo, cpf_digits):
+        """Resolve o funcionário e monta a linha de inserção na ordem de INSERT_COLUMNS"""
+        validacao_status, validacao_erros, validacao_avisos = self._validation_fields(validacao)
+        arquivo_hash = hashlib.sha256(arquivo_conteudo).hexdigest() if arquivo_conteudo is not None else None
+        funcionario_id = self._resolve_employee(cursor, data.get('nome'), cpf_digits)
+        
+        return (
+            data.get('nome'),
+            data.get('cpf'),
+            data.get('periodo'),
+            data.get('empresa'),
+            data.get('cargo'),
+            data.get('salario_bruto'),
+            data.get('salario_liquido'),
+            data.get('descontos'),
+            data.get('data_processamento'),
+            data.get('texto_original'),
+            ocr_confidence,
+            arquivo_origem,
+            validacao_status,
+            validacao_erros,
+            validacao_avisos,
+            arquivo_hash,
+            funcionario_id
+        )
+    
+    def _upsert_sql(self, colunas, origem):
+        """INSERT (de VALUES ou SELECT) que atualiza o contracheque já gravado do mesmo arquivo, CPF e período
+        
+        Retorna id, se a linha foi inserida (xmax = 0; numa atualização é o
+        id da transação) e a chave do índice único.
+        """
+        return f'''
+            INSERT INTO contracheques ({colunas})
+            {origem}
+            ON CONFLICT {self.UPSERT_TARGET} DO UPDATE SET
+                {', '.join(f"{coluna} = excluded.{coluna}" for coluna in self.INSERT_COLUMNS)}
+            RETURNING id, xmax = 0, arquivo_hash, COALESCE(cpf, ''), COALESCE(periodo, '')
+        '''
+    
+    def insert_contracheque(self, data, ocr_confidence=None, arquivo_origem=None,
+                            validacao=None, ocr_result=None, arquivo_conteudo=None):
+        """Insere um novo contracheque no banco
+        
+        ocr_result é aceito por compatibilidade, mas não é guardado (recurso
+        'ocr' exclusivo do SQLite); de arquivo_conteudo só o hash é gravado,
+        o que torna a gravação idempotente como no SQLite.
+        """
+        cpf_digits = self.employee_index.valid_cpf_digits(data.get('cpf'))
+        
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            row = self._row(cursor, data, ocr_confidence, arquivo_origem, validacao,
+                            arquivo_conteudo, cpf_digits)
+            cursor.execute(self._upsert_sql(
+                ', '.join(self.INSERT_COLUMNS),
+                f"VALUES ({', '.join(['%s'] * len(self.INSERT_COLUMNS))})"
+            ), row)
+            
+            contracheque_id, novo = cursor.fetchone()[:2]
+        
+        # Log da inserção (ou da regravação)
+        if novo:
+            self.log_action("insert", f"Contracheque inserido para {data.get('nome', 'N/A')}",
+                          {"id": contracheque_id, "arquivo": arquivo_origem})
+        else:
+            self.log_action("update", f"Contracheque atualizado para {data.get('nome', 'N/A')}",
+                            {"id": contracheque_id, "arquivo": arquivo_origem})
+        
+        return contracheque_id
+    
+    def insert_contracheques(self, registros):
+        """Insere vários contracheques numa única transação com COPY
+        
+        registros segue o formato de Database.insert_contracheques. Os ids são
+        reservados na sequência antes do COPY, então continuam na ordem dos
+        registros mesmo com outros nós inserindo ao mesmo tempo. O COPY vai
+        para uma tabela temporária, de onde um upsert atualiza os
+        contracheques já gravados (mesmo arquivo, CPF e período).
+        """
+        if not registros:
+            return []
+        
+        cpfs = self.employee_index.valid_cpf_digits_batch(
+            [registro['dados'].get('cpf') for registro in registros]
+        )
+        
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            rows = []
+            for registro, cpf_digits in zip(registros, cpfs):
+                ocr_result = registro.get('ocr')
+                rows.append(self._row(
+                    cursor,
+                    registro['dados'],
+                    ocr_result.get('confidence') if ocr_result else None,
+                    registro.get('arquivo'),
+                    registro.get('validacao'),
+                    registro.get('conteudo'),
+                    cpf_digits
+                ))
+            
+            cursor.execute('''
+                SELECT nextval(pg_get_serial_sequence('contracheques', 'id'))
+                FROM generate_series(1, %s)
+            ''', [len(rows)])
+            ids = [row[0] for row in cursor.fetchall()]
+            
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for contracheque_id, row in zip(ids, rows):
+                writer.writerow([contracheque_id] + [COPY_NULL if value is None else value for value in row])
+            buffer.seek(0)
+            
+            cursor.execute('''
+                CREATE TEMP TABLE contracheques_lote ON COMMIT DROP AS
+                SELECT * FROM contracheques WITH NO DATA
+            ''')
+            cursor.copy_expert(f'''
+                COPY contracheques_lote (id, {', '.join(self.INSERT_COLUMNS)})
+                FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')
+            ''', buffer)
+            
+            # Repetições dentro do lote entram uma vez, com a última versão
+            colunas = f"id, {', '.join(self.INSERT_COLUMNS)}"
+            cursor.execute(self._upsert_sql(colunas, f'''
+                SELECT DISTINCT ON (COALESCE(arquivo_hash, id::text), COALESCE(cpf, ''), COALESCE(periodo, ''))
+                    {colunas}
+                FROM contracheques_lote
+                ORDER BY COALESCE(arquivo_hash, id::text), COALESCE(cpf, ''), COALESCE(periodo, ''), id DESC
+            '''))
+            retorno = cursor.fetchall()
+            inseridos = sum(1 for row in retorno if row[1])
+            atualizados = len(retorno) - inseridos
+            gravados = {tuple(row[2:]): row[0] for row in retorno if row[2] is not None}
+            
+            # Regravações ficam com o id do contracheque existente
+            for posicao, row in enumerate(rows):
+                valores = dict(zip(self.INSERT_COLUMNS, row))
+                if valores['arquivo_hash'] is not None:
+                    ids[posicao] = gravados[(valores['arquivo_hash'], valores['cpf'] or '', valores['periodo'] or '')]
+        
+        self.log_action("bulk_insert", f"{inseridos} contracheques inseridos e {atualizados} atualizados em lote",
+                        {"registros": len(ids), "inseridos": inseridos, "atualizados": atualizados,
+                         "arquivos": [r.get('arquivo') for r in registros]})
+        
+        return ids
+    
+    def update_contracheque(self, contracheque_id, data):
+        """Atualiza um contracheque existente"""
+        fields = []
+        values = []
+        
+        for field, value in data.items():
+            if field in ['nome', 'cpf', 'periodo', 'empresa', 'cargo',
+                       'salario_bruto', 'salario_liquido', 'descontos']:
+                fields.append(f"{field} = %s")
+                values.append(value)
+        
+        if not fields:
+            return False
+        
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            # Nome ou CPF alterados podem mudar o funcionário vinculado
+            if 'nome' in data or 'cpf' in data:
+                cursor.execute("SELECT nome, cpf FROM contracheques WHERE id = %s", [contracheque_id])
+                atual = cursor.fetchone()
+                if atual:
+                    fields.append("funcionario_id = %s")
+                    cpf_digits = self.employee_index.valid_cpf_digits(data.get('cpf', atual[1]))
+                    values.append(self._resolve_employee(cursor, data.get('nome', atual[0]), cpf_digits))
+            
+            cursor.execute(f"UPDATE contracheques SET {', '.join(fields)} WHERE id = %s",
+                           values + [contracheque_id])
+            atualizado = cursor.rowcount > 0
+        
+        # Log da atualização
+        self.log_action("update", f"Contracheque atualizado ID {contracheque_id}", data)
+        
+        return atualizado
+    
+    def delete_contracheque(self, contracheque_id):
+        """Remove um contracheque do banco"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM contracheques WHERE id = %s RETURNING nome, arquivo_origem",
+                           [contracheque_id])
+            result = cursor.fetchone()
+            
+            # O arquivo volta a ser desconhecido para o manifesto: um novo envio o processa
+            cursor.execute("DELETE FROM manifesto_arquivos WHERE contracheque_id = %s", [contracheque_id])
+        
+        if not result:
+            return False
+        
+        # Log da exclusão
+        self.log_action("delete", f"Contracheque deletado para {result[0]}",
+                      {"id": contracheque_id, "arquivo": result[1]})
+        
+        return True
+    
+    @property
+    def employee_index(self):
+        """Índice de funcionários compartilhado (carregado no primeiro uso)"""
+        if self._employee_index is None:
+            self._employee_index = PostgresEmployeeIndex.for_database(self.dsn)
+        return self._employee_index
+    
+    def _resolve_employee(self, cursor, nome, cpf_digits):
+        """Retorna o id do funcionário do contracheque, criando-o se necessário
+        
+        Como no SQLite, mas com vários nós criando funcionários: sem
+        correspondência no índice local, o nó toma o lock consultivo e relê
+        o índice antes de criar. A criação fica serializada até o commit, o
+        que mantém os ids confirmados em ordem para a leitura incremental.
+        """
+        index = self.employee_index
+        
+        if not cpf_digits and not normalize_name(nome):
+            return None
+        
+        funcionario_id = index.match(nome, cpf_digits)
+        if funcionario_id is None:
+            # Outro nó pode ter criado o funcionário
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [EMPLOYEE_LOCK_KEY])
+            index.refresh(cursor)
+            funcionario_id = index.match(nome, cpf_digits)
+        
+        if funcionario_id is not None:
+            if cpf_digits and funcionario_id not in index.cpf_of:
+                cursor.execute("UPDATE funcionarios SET cpf = %s WHERE id = %s", [cpf_digits, funcionario_id])
+                index.set_cpf(funcionario_id, cpf_digits)
+            return funcionario_id
+        
+        normalized = normalize_name(nome)
+        key = phonetic_key(normalized)
+        cursor.execute('''
+            INSERT INTO funcionarios (cpf, nome, nome_normalizado, chave_fonetica)
+            VALUES (%s, %s, %s, %s)
+            RETURNING id
+        ''', [cpf_digits, nome, normalized, key])
+        funcionario_id = cursor.fetchone()[0]
+        index.add(funcionario_id, cpf_digits, normalized, key)
+        
+        return funcionario_id
+    
+    def link_employees(self, batch_size=1000):
+        """Vincula a funcionários os contracheques que ainda não têm vínculo
+        
+        Retorna o número de contracheques vinculados.
+        """
+        vinculados = 0
+        last_id = 0
+        
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            while True:
+                cursor.execute('''
+                    SELECT id, nome, cpf FROM contracheques
+                    WHERE funcionario_id IS NULL AND id > %s
+                    ORDER BY id LIMIT %s
+                ''', [last_id, batch_size])
+                rows = cursor.fetchall()
+                
+                if not rows:
+                    break
+                
+                last_id = rows[-1][0]
+                cpfs = self.employee_index.valid_cpf_digits_batch([row[2] for row in rows])
+                updates = []
+                for (contracheque_id, nome, _), cpf_digits in zip(rows, cpfs):
+                    funcionario_id = self._resolve_employee(cursor, nome, cpf_digits)
+                    if funcionario_id is not None:
+                        updates.append((funcionario_id, contracheque_id))
+                
+                cursor.executemany("UPDATE contracheques SET funcionario_id = %s WHERE id = %s", updates)
+                vinculados += len(updates)
+        
+        if vinculados:
+            self.log_action("funcionarios", f"{vinculados} contracheques vinculados a funcionários",
+                            {"registros": vinculados})
+        
+        return vinculados
+    
+    def get_all_contracheques(self, limit=None):
+        """Retorna todos os contracheques do banco (limit: só os primeiros; LIMIT NULL lê todos)"""
+        return self._read_query(f'''
+            SELECT {self.LIST_COLUMNS}
+            FROM contracheques
+            ORDER BY created_at DESC
+            LIMIT %s
+        ''', [limit])
+    
+    def get_contracheques_by_period(self, periodo, limit=None):
+        """Retorna contracheques de um período específico"""
+        return self._read_query(f'''
+            SELECT {self.LIST_COLUMNS}
+            FROM contracheques
+            WHERE periodo = %s
+            ORDER BY nome
+            LIMIT %s
+        ''', [periodo, limit])
+    
+    def get_contracheques_by_name(self, nome, limit=None):
+        """Retorna contracheques de uma pessoa específica"""
+        return self._read_query(f'''
+            SELECT {self.LIST_COLUMNS}
+            FROM contracheques
+            WHERE nome LIKE %s
+            ORDER BY periodo DESC
+            LIMIT %s
+        ''', [f"%{nome}%", limit])
+    
+    def iter_contracheques(self, chunk_size=None, colunas=None, periodo=None, nome=None):
+        """Percorre os contracheques em blocos de DataFrames tipados
+        
+        Mesma paginação keyset por id do SQLite; a conexão volta ao pool
+        entre um bloco e outro.
+        """
+        chunk_size = chunk_size or APP_CONFIG["read_chunk_size"]
+        query, colunas, tipos, params = self._chunk_query(colunas, periodo, nome, '%s')
+        
+        last_id = 0
+        while True:
+            df = self._read_query(query, [last_id, *params, chunk_size])
+            if df.empty:
+                return
+            
+            last_id = int(df['id'].iloc[-1])
+            yield df[colunas].astype(tipos)
+            
+            if len(df) < chunk_size:
+                return
+    
+    def get_summary_statistics(self):
+        """Retorna estatísticas resumidas (uma única varredura)
+        
+        funcionarios_unicos conta os funcionários vinculados, como o agregado
+        resumo_funcionario do SQLite.
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT COUNT(*),
+                       COUNT(*) FILTER (WHERE validacao_status = 'válido'),
+                       COUNT(DISTINCT periodo),
+                       COUNT(DISTINCT funcionario_id),
+                       COALESCE(SUM(salario_liquido), 0),
+                       COALESCE(AVG(salario_liquido), 0),
+                       COALESCE(AVG(confianca_ocr), 0)
+                FROM contracheques
+            ''')
+            row = cursor.fetchone()
+        
+        return dict(zip(['total_registros', 'registros_validos', 'periodos_unicos', 'funcionarios_unicos',
+                         'total_liquido', 'media_liquido', 'media_confianca_ocr'], row))
+    
+    def get_period_summary(self):
+        """Retorna o resumo por período"""
+        return self._read_query('''
+            SELECT periodo,
+                   ROUND(AVG(salario_liquido)::numeric, 2)::float8 AS salario_medio,
+                   COUNT(salario_liquido) AS qtd_registros,
+                   ROUND(COALESCE(SUM(salario_liquido), 0)::numeric, 2)::float8 AS total_pago,
+                   COUNT(DISTINCT funcionario_id) AS funcionarios_unicos
+            FROM contracheques
+            WHERE periodo IS NOT NULL
+            GROUP BY periodo
+            ORDER BY periodo
+        ''')
+    
+    def get_company_summary(self):
+        """Retorna o resumo por empresa"""
+        return self._read_query('''
+            SELECT empresa, COUNT(*) AS qtd_registros,
+                   ROUND(AVG(salario_liquido)::numeric, 2)::float8 AS salario_medio,
+                   ROUND(COALESCE(SUM(salario_liquido), 0)::numeric, 2)::float8 AS total_pago
+            FROM contracheques
+            WHERE empresa IS NOT NULL
+            GROUP BY empresa
+            ORDER BY total_pago DESC
+        ''')
+    
+    def get_top_employees(self, limit=10):
+        """Retorna os funcionários com maior salário líquido médio"""
+        return self._read_query('''
+            SELECT f.nome, ROUND(AVG(c.salario_liquido)::numeric, 2)::float8 AS salario_medio,
+                   COUNT(*) AS qtd_registros
+            FROM contracheques c
+            JOIN funcionarios f ON f.id = c.funcionario_id
+            GROUP BY f.id, f.nome
+            HAVING COUNT(c.salario_liquido) > 0
+            ORDER BY salario_medio DESC
+            LIMIT %s
+        ''', [limit])
+    
+    def get_templates(self):
+        """Retorna os templates de regiões por empresa"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT empresa, regioes, documentos FROM templates_empresa")
+            
+            return {
+                empresa: {"empresa": empresa, "regioes": json.loads(regioes), "documentos": documentos}
+                for empresa, regioes, documentos in cursor.fetchall()
+            }
+    
+    def save_template(self, empresa, regioes, documentos):
+        """Cria ou atualiza o template de regiões de uma empresa"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO templates_empresa (empresa, regioes, documentos, updated_at)
+                VALUES (%s, %s, %s, now() AT TIME ZONE 'utc')
+                ON CONFLICT (empresa) DO UPDATE SET
+                    regioes = excluded.regioes,
+                    documentos = excluded.documentos,
+                    updated_at = excluded.updated_at
+            ''', (empresa, json.dumps(regioes), documentos))
+    
+    def get_manifest_entries(self, arquivo_hashes=None, estados=None):
+        """Retorna as entradas do manifesto dos hashes ou estados informados (ou todas)"""
+        query, params = self._manifest_query(arquivo_hashes, estados, '%s')
+        
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            
+            return [self._manifest_entry(row) for row in cursor.fetchall()]
+    
+    def save_manifest_entry(self, arquivo_hash, estado, arquivo=None, caminho=None, ocr_result=None,
+                            dados=None, validacao=None, contracheque_id=None, erro=None):
+        """Cria ou avança a entrada de um arquivo; campos None mantêm o valor gravado"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self._manifest_upsert_sql('%s'), self._manifest_row(
+                arquivo_hash, estado, arquivo, caminho, ocr_result, dados, validacao, contracheque_id, erro
+            ))
+    
+    def log_action(self, tipo, mensagem, detalhes=None):
+        """Registra uma ação no log (gravação assíncrona em lote)"""
+        self.log_writer.write(tipo, mensagem, detalhes)
+    
+    def flush_logs(self):
+        """Grava imediatamente os logs pendentes"""
+        self.log_writer.flush()
+    
+    def get_logs_page(self, limit=100, before=None):
+        """Retorna uma página de logs por paginação keyset"""
+        if before:
+            return self._read_query('''
+                SELECT * FROM logs
+                WHERE (timestamp, id) < (%s, %s)
+                ORDER BY timestamp DESC, id DESC
+                LIMIT %s
+            ''', [before[0], before[1], limit])
+        
+        return self._read_query('''
+            SELECT * FROM logs
+            ORDER BY timestamp DESC, id DESC
+            LIMIT %s
+        ''', [limit])
+    
+    def rotate_logs(self, max_age_days=None, max_rows=None):
+        """Arquiva em arquivo compactado e remove logs antigos ou excedentes
+        
+        Retorna o número de logs arquivados.
+        """
+        max_age_days = LOG_CONFIG["max_age_days"] if max_age_days is None else max_age_days
+        max_rows = LOG_CONFIG["max_rows"] if max_rows is None else max_rows
+        
+        self.flush_logs()
+        
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            # Limite de corte: o mais recente entre idade e quantidade
+            corte = None
+            if max_age_days:
+                limite = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=max_age_days)
+                corte = (limite, 0)
+            
+            if max_rows:
+                cursor.execute('''
+                    SELECT timestamp, id FROM logs
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT 1 OFFSET %s
+                ''', [max_rows - 1])
+                ultimo_mantido = cursor.fetchone()
+                if ultimo_mantido and (corte is None or tuple(ultimo_mantido) > corte):
+                    corte = tuple(ultimo_mantido)
+            
+            if corte is None:
+                return 0
+            
+            # Cursor no servidor: os logs arquivados não são carregados de uma vez
+            arquivo_cursor = conn.cursor(name='logs_rotacao')
+            arquivo_cursor.execute('''
+                SELECT id, tipo, mensagem, detalhes, timestamp FROM logs
+                WHERE (timestamp, id) < (%s, %s)
+                ORDER BY timestamp, id
+            ''', corte)
+            
+            arquivados = self._write_log_archive(iter(lambda: arquivo_cursor.fetchmany(1000), []))
+            arquivo_cursor.close()
+            
+            if arquivados:
+                cursor.execute("DELETE FROM logs WHERE (timestamp, id) < (%s, %s)", corte)
+        
+        return arquivados
@@ -0,0 +1,131 @@
+"""
+Reextração de dados a partir do OCR guardado
+
+Roda o DataExtractor novamente sobre o texto completo de todos os
+contracheques, em lotes processados em paralelo, e atualiza em lote apenas
+as linhas cujos dados mudaram. Útil depois de ajustar as regex em
+config.REGEX_PATTERNS, sem precisar refazer o OCR.
+
+Uso:
+    python -m utils.reextraction [--lote 500] [--workers N]
+"""
+
+import argparse
+import json
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Campos comparados para decidir se a linha mudou
+COMPARED_FIELDS = ['nome', 'cpf', 'periodo', 'empresa', 'cargo',
+                   'salario_bruto', 'salario_liquido', 'descontos']
+
+_extractor = None
+
+def reextract_batch(rows):
+    """Reextrai um lote de (id, texto, compressao, campos) compactados (roda no pool de processos)"""
+    global _extractor
+    
+    from .database import Database
+    
+    if _extractor is None:
+        from .data_extractor import DataExtractor
+        _extractor = DataExtractor()
+    
+    ids = []
+    extracted = []
+    for contracheque_id, texto, compressao, campos in rows:
+        text = Database.unpack_blob(texto, compressao).decode('utf-8')
+        fields = json.loads(zlib.decompress(campos)) if campos else None
+        
+        if fields:
+            data = _extractor.extract_from_fields(fields, text)
+        else:
+            data = _extractor.extract_all_data(text)
+        
+        ids.append(contracheque_id)
+        extracted.append(data)
+    
+    # CPFs do lote validados de uma vez
+    validations = _extractor.validate_data_batch(extracted)
+    
+    return list(zip(ids, extracted, validations))
+
+def _changed(current, data, validacao):
+    if current is None:
+        return False
+    
+    for field in COMPARED_FIELDS:
+        if current.get(field) != data.get(field):
+            return True
+    
+    status = "válido" if validacao.get('is_valid', False) else "inválido"
+    return (current.get('validacao_status') != status
+            or current.get('validacao_erros') != json.dumps(validacao.get('errors', []))
+            or current.get('validacao_avisos') != json.dumps(validacao.get('warnings', [])))
+
+def reextract_all(database, batch_size=500, workers=None, progress=None):
+    """Reextrai todos os contracheques com OCR guardado
+    
+    progress, se informado, recebe (processados, total) após cada lote.
+    Retorna estatísticas da execução.
+    """
+    start = time.time()
+    workers = workers or os.cpu_count() or 1
+    total = database.count_ocr_results()
+    
+    stats = {"total": total, "processados": 0, "atualizados": 0, "tempo": 0.0}
+    
+    def apply(results):
+        current = database.get_extracted_fields([row[0] for row in results])
+        updates = [row for row in results if _changed(current.get(row[0]), row[1], row[2])]
+        
+        stats["atualizados"] += database.bulk_update_contracheques(updates)
+        stats["processados"] += len(results)
+        
+        if progress:
+            progress(stats["processados"], total)
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        
+        for rows in database.iter_ocr_batches(batch_size):
+            pending.add(pool.submit(reextract_batch, rows))
+            
+            # Limitar os lotes em memória
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    apply(future.result())
+        
+        for future in pending:
+            apply(future.result())
+    
+    stats["tempo"] = time.time() - start
+    
+    database.log_action("reextraction", "Reextração de dados concluída", stats)
+    
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Reextrai os dados a partir do OCR guardado")
+    parser.add_argument("--lote", type=int, default=500, help="Contracheques por lote")
+    parser.add_argument("--workers", type=int, default=None, help="Processos paralelos")
+    args = parser.parse_args()
+    
+    from .storage import create_database
+    
+    database = create_database()
+    if not database.supports('ocr'):
+        parser.error(f"o banco configurado ({type(database).__name__}) não guarda o OCR para reextração")
+    
+    def mostrar_progresso(processados, total):
+        print(f"\r🔁 {processados}/{total} contracheques", end="", flush=True)
+    
+    stats = reextract_all(database, args.lote, args.workers, mostrar_progresso)
+    print(f"\n✅ {stats['atualizados']} de {stats['processados']} contracheques atualizados "
+          f"em {stats['tempo']:.1f}s")
+
+if __name__ == "__main__":
+    main()
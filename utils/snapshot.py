@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from config import SNAPSHOT_CONFIG
+from .database import Database
+from .storage import StorageBackend
+
+class SnapshotDatabase(Database):
+    """Cópia somente leitura do banco para os painéis de análise
+    
+    A cópia leva só as tabelas e colunas que os painéis consultam (TABLES)
+    num arquivo separado, trocado de uma vez (os.replace): blobs, OCR
+    guardado, logs e manifesto ficam de fora. Os painéis consultam a cópia,
+    então as leituras pesadas não disputam o arquivo principal com a
+    ingestão. Os logs continuam indo para o banco de origem.
+    """
+    
+    # Tabelas copiadas e suas colunas (None: todas)
+    TABLES = {
+        'contracheques': list(StorageBackend.COLUMN_TYPES),
+        'funcionarios': ['id', 'nome'],
+        'resumo_periodo': None,
+        'resumo_periodo_funcionario': None,
+        'resumo_empresa': None,
+        'resumo_funcionario': None
+    }
+    
+    _instances = {}
+    _instances_lock = threading.Lock()
+    
+    @classmethod
+    def for_database(cls, source):
+        """Retorna a cópia compartilhada de um banco"""
+        with cls._instances_lock:
+            snapshot = cls._instances.get(source.db_path)
+            if snapshot is None:
+                snapshot = cls(source)
+                cls._instances[source.db_path] = snapshot
+            return snapshot
+    
+    def __init__(self, source):
+        # Sem init_database: a cópia não é migrada nem recebe gravações
+        self.source = source
+        self.db_path = SNAPSHOT_CONFIG["path"] or f"{os.path.splitext(source.db_path)[0]}_snapshot.db"
+        self.refresh_seconds = SNAPSHOT_CONFIG["refresh_minutes"] * 60
+        self._employee_index = None
+        self.anomaly_detector = source.anomaly_detector
+        self.log_writer = source.log_writer
+        self._refresh_lock = threading.Lock()
+    
+    @property
+    def snapshot_time(self):
+        """Momento da cópia atual (None se ainda não existe)"""
+        if not os.path.exists(self.db_path):
+            return None
+        return datetime.fromtimestamp(os.path.getmtime(self.db_path))
+    
+    def age_seconds(self):
+        """Idade da cópia atual em segundos (None se ainda não existe)"""
+        if not os.path.exists(self.db_path):
+            return None
+        return time.time() - os.path.getmtime(self.db_path)
+    
+    def refresh(self, wait=False):
+        """Copia as tabelas dos painéis e troca a cópia atual
+        
+        Sem wait, retorna False se outra atualização já estiver em andamento.
+        """
+        if not self._refresh_lock.acquire(blocking=wait):
+            return False
+        
+        try:
+            start = time.time()
+            temporario = f"{self.db_path}.tmp"
+            
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            
+            destino = sqlite3.connect(temporario, isolation_level=None)
+            try:
+                destino.execute("ATTACH DATABASE ? AS origem", [self.source.db_path])
+                
+                # Uma única transação: em WAL a leitura não bloqueia as
+                # gravações, e todas as tabelas saem do mesmo instante
+                destino.execute("BEGIN")
+                for tabela, colunas in self.TABLES.items():
+                    self._copy_table(destino, tabela, colunas)
+                destino.execute("COMMIT")
+                
+                destino.execute("DETACH DATABASE origem")
+            finally:
+                destino.close()
+            
+            os.replace(temporario, self.db_path)
+        finally:
+            self._refresh_lock.release()
+        
+        self.log_action("snapshot", "Cópia dos painéis atualizada",
+                        {"tempo": round(time.time() - start, 2)})
+        
+        return True
+    
+    def _copy_table(self, conn, tabela, colunas):
+        """Cria a tabela na cópia (tipos e chave primária da origem) e copia as colunas"""
+        definicoes = conn.execute(f"PRAGMA origem.table_info({tabela})").fetchall()
+        if colunas:
+            definicoes = [row for row in definicoes if row[1] in colunas]
+        
+        nomes = ', '.join(row[1] for row in definicoes)
+        chave = [row[1] for row in sorted(definicoes, key=lambda row: row[5]) if row[5]]
+        
+        estrutura = [f"{row[1]} {row[2]}" for row in definicoes]
+        if chave:
+            estrutura.append(f"PRIMARY KEY ({', '.join(chave)})")
+        
+        conn.execute(f"CREATE TABLE {tabela} ({', '.join(estrutura)})")
+        conn.execute(f"INSERT INTO {tabela} ({nomes}) SELECT {nomes} FROM origem.{tabela}")
+    
+    def ensure_fresh(self):
+        """Garante uma cópia utilizável
+        
+        Sem cópia, atualiza na hora; com cópia vencida, atualiza em segundo
+        plano e continua servindo a atual.
+        """
+        idade = self.age_seconds()
+        
+        if idade is None:
+            self.refresh(wait=True)
+        elif idade > self.refresh_seconds and not self._refresh_lock.locked():
+            threading.Thread(target=self.refresh, daemon=True).start()
+        
+        return self
@@ -0,0 +1,454 @@
+"""
+Interface de armazenamento dos contracheques
+
+StorageBackend reúne as operações usadas pelo app, pela API e pelos jobs
+(inserção, inserção em lote, consultas, estatísticas, templates, manifesto
+de ingestão, logs e exportação). Database (SQLite, arquivo local) é a implementação padrão;
+PostgresDatabase permite vários nós de ingestão gravando no mesmo banco.
+create_database escolhe a implementação por STORAGE_CONFIG["backend"].
+"""
+
+import gzip
+import json
+import os
+import zlib
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from config import APP_CONFIG, LOG_CONFIG, STORAGE_CONFIG
+
+class StorageBackend(ABC):
+    """Operações de armazenamento comuns a todos os bancos"""
+    
+    # Colunas das consultas de listagem: nunca incluem textos longos nem blobs
+    LIST_COLUMNS = """
+        id, nome, cpf, periodo, empresa, cargo,
+        salario_bruto, salario_liquido, descontos,
+        data_processamento, confianca_ocr, arquivo_origem,
+        validacao_status, funcionario_id, created_at
+    """
+    
+    # Tipos das colunas lidas em blocos (iter_contracheques): estáveis entre
+    # blocos mesmo quando uma coluna vem toda nula
+    COLUMN_TYPES = {
+        'id': 'int64', 'nome': 'string', 'cpf': 'string', 'periodo': 'string',
+        'empresa': 'string', 'cargo': 'string', 'salario_bruto': 'float64',
+        'salario_liquido': 'float64', 'descontos': 'float64',
+        'data_processamento': 'string', 'confianca_ocr': 'float64',
+        'arquivo_origem': 'string', 'validacao_status': 'string',
+        'funcionario_id': 'Int64', 'created_at': 'datetime64[ns]'
+    }
+    
+    # Alvo do ON CONFLICT da gravação idempotente: índice único parcial por
+    # arquivo, CPF e período (CPF e período ausentes contam como vazios)
+    UPSERT_TARGET = "(arquivo_hash, COALESCE(cpf, ''), COALESCE(periodo, '')) WHERE arquivo_hash IS NOT NULL"
+    
+    # Colunas monetárias formatadas em R$ na exportação
+    MONEY_COLUMNS = ['salario_bruto', 'salario_liquido', 'descontos']
+    
+    # Recursos além desta interface: 'ocr' (texto e arquivos guardados,
+    # reextração), 'funcionarios', 'anomalias' e 'auditoria'
+    FEATURES = frozenset()
+    
+    # Momento da cópia lida, quando o banco é um snapshot (ver read_replica)
+    snapshot_time = None
+    
+    def supports(self, feature):
+        """Indica se o banco oferece um recurso opcional (ver FEATURES)"""
+        return feature in self.FEATURES
+    
+    def read_replica(self):
+        """Banco das consultas pesadas dos painéis (padrão: o próprio banco)"""
+        return self
+    
+    # Contracheques
+    
+    @abstractmethod
+    def insert_contracheque(self, data, ocr_confidence=None, arquivo_origem=None,
+                            validacao=None, ocr_result=None, arquivo_conteudo=None):
+        """Insere um contracheque e retorna seu id
+        
+        Com arquivo_conteudo, a gravação é idempotente: o mesmo arquivo, CPF
+        e período atualizam o contracheque já gravado (mesmo id).
+        """
+    
+    @abstractmethod
+    def insert_contracheques(self, registros):
+        """Insere vários contracheques (idempotente como insert_contracheque) e retorna os ids na ordem dos registros"""
+    
+    @abstractmethod
+    def update_contracheque(self, contracheque_id, data):
+        """Atualiza campos de um contracheque"""
+    
+    @abstractmethod
+    def delete_contracheque(self, contracheque_id):
+        """Remove um contracheque"""
+    
+    @abstractmethod
+    def get_all_contracheques(self, limit=None):
+        """Retorna todos os contracheques (ou os limit primeiros)"""
+    
+    @abstractmethod
+    def get_contracheques_by_period(self, periodo, limit=None):
+        """Retorna os contracheques de um período (ou os limit primeiros)"""
+    
+    @abstractmethod
+    def get_contracheques_by_name(self, nome, limit=None):
+        """Retorna os contracheques de uma pessoa (ou os limit primeiros)"""
+    
+    @abstractmethod
+    def iter_contracheques(self, chunk_size=None, colunas=None, periodo=None, nome=None):
+        """Percorre os contracheques em blocos de DataFrames tipados"""
+    
+    # Estatísticas
+    
+    @abstractmethod
+    def get_summary_statistics(self):
+        """Retorna estatísticas resumidas"""
+    
+    @abstractmethod
+    def get_period_summary(self):
+        """Retorna o resumo por período"""
+    
+    @abstractmethod
+    def get_company_summary(self):
+        """Retorna o resumo por empresa"""
+    
+    @abstractmethod
+    def get_top_employees(self, limit=10):
+        """Retorna os funcionários com maior salário líquido médio"""
+    
+    # Templates de regiões por empresa
+    
+    @abstractmethod
+    def get_templates(self):
+        """Retorna os templates de regiões por empresa"""
+    
+    @abstractmethod
+    def save_template(self, empresa, regioes, documentos):
+        """Cria ou atualiza o template de regiões de uma empresa"""
+    
+    # Manifesto de ingestão (ver IngestionManifest)
+    
+    @abstractmethod
+    def get_manifest_entries(self, arquivo_hashes=None, estados=None):
+        """Retorna as entradas do manifesto dos hashes ou estados informados (ou todas)"""
+    
+    @abstractmethod
+    def save_manifest_entry(self, arquivo_hash, estado, arquivo=None, caminho=None, ocr_result=None,
+                            dados=None, validacao=None, contracheque_id=None, erro=None):
+        """Cria ou avança a entrada de um arquivo; campos None mantêm o valor gravado"""
+    
+    # Logs
+    
+    @abstractmethod
+    def log_action(self, tipo, mensagem, detalhes=None):
+        """Registra uma ação no log"""
+    
+    @abstractmethod
+    def flush_logs(self):
+        """Grava imediatamente os logs pendentes"""
+    
+    @abstractmethod
+    def get_logs_page(self, limit=100, before=None):
+        """Retorna uma página de logs (keyset por timestamp e id)"""
+    
+    @abstractmethod
+    def rotate_logs(self, max_age_days=None, max_rows=None):
+        """Arquiva e remove logs antigos ou excedentes"""
+    
+    def get_logs(self, limit=100):
+        """Retorna logs do sistema"""
+        return self.get_logs_page(limit=limit)
+    
+    # Auxiliares das implementações
+    
+    @staticmethod
+    def _validation_fields(validacao):
+        """Status, erros e avisos da validação, como gravados no banco"""
+        validacao = validacao or {}
+        return (
+            "válido" if validacao.get('is_valid', False) else "inválido",
+            json.dumps(validacao.get('errors', [])),
+            json.dumps(validacao.get('warnings', []))
+        )
+    
+    # Colunas do manifesto, na ordem de _manifest_row e das consultas
+    MANIFEST_COLUMNS = [
+        'arquivo_hash', 'arquivo', 'estado', 'caminho', 'resultado_ocr', 'dados',
+        'validacao', 'contracheque_id', 'erro', 'tentativas', 'atualizado_em'
+    ]
+    
+    def _manifest_upsert_sql(self, placeholder):
+        """Upsert de uma entrada do manifesto (SQLite e PostgreSQL)
+        
+        Ao chegar em 'saved', o resultado do OCR e o arquivo em espera deixam
+        de ser necessários e são descartados. Cada 'queued' conta uma
+        tentativa, sem voltar atrás num arquivo com OCR ou extração concluídos.
+        """
+        def keep(coluna):
+            return f"{coluna} = COALESCE(excluded.{coluna}, manifesto_arquivos.{coluna})"
+        
+        def drop_when_saved(coluna):
+            return (f"{coluna} = CASE WHEN excluded.estado = 'saved' THEN NULL "
+                    f"ELSE COALESCE(excluded.{coluna}, manifesto_arquivos.{coluna}) END")
+        
+        return f'''
+            INSERT INTO manifesto_arquivos ({', '.join(self.MANIFEST_COLUMNS)})
+            VALUES ({', '.join([placeholder] * len(self.MANIFEST_COLUMNS))})
+            ON CONFLICT (arquivo_hash) DO UPDATE SET
+                estado = CASE WHEN excluded.estado = 'queued'
+                              AND manifesto_arquivos.estado IN ('ocr_done', 'extracted')
+                         THEN manifesto_arquivos.estado ELSE excluded.estado END,
+                {keep('arquivo')},
+                {drop_when_saved('caminho')},
+                {drop_when_saved('resultado_ocr')},
+                {keep('dados')},
+                {keep('validacao')},
+                {keep('contracheque_id')},
+                erro = excluded.erro,
+                tentativas = manifesto_arquivos.tentativas + excluded.tentativas,
+                atualizado_em = excluded.atualizado_em
+        '''
+    
+    @staticmethod
+    def _manifest_row(arquivo_hash, estado, arquivo, caminho, ocr_result, dados, validacao,
+                      contracheque_id, erro):
+        """Linha do manifesto na ordem de MANIFEST_COLUMNS (OCR compactado, dados em JSON)"""
+        def dump(value):
+            return json.dumps(value, ensure_ascii=False, default=str) if value is not None else None
+        
+        return (
+            arquivo_hash,
+            arquivo,
+            estado,
+            caminho,
+            zlib.compress(dump(ocr_result).encode('utf-8')) if ocr_result is not None else None,
+            dump(dados),
+            dump(validacao),
+            contracheque_id,
+            erro,
+            1 if estado == 'queued' else 0,
+            datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        )
+    
+    def _manifest_entry(self, row):
+        """Entrada do manifesto (dict) a partir de uma linha na ordem de MANIFEST_COLUMNS"""
+        entry = dict(zip(self.MANIFEST_COLUMNS, row))
+        
+        if entry['resultado_ocr'] is not None:
+            entry['resultado_ocr'] = json.loads(zlib.decompress(bytes(entry['resultado_ocr'])))
+        for coluna in ('dados', 'validacao'):
+            if entry[coluna] is not None:
+                entry[coluna] = json.loads(entry[coluna])
+        
+        return entry
+    
+    def _manifest_query(self, arquivo_hashes, estados, placeholder):
+        """Consulta de get_manifest_entries: retorna (query, params)"""
+        filtros = []
+        params = []
+        
+        if arquivo_hashes is not None:
+            filtros.append(f"arquivo_hash IN ({', '.join([placeholder] * len(arquivo_hashes)) or 'NULL'})")
+            params.extend(arquivo_hashes)
+        if estados is not None:
+            filtros.append(f"estado IN ({', '.join([placeholder] * len(estados)) or 'NULL'})")
+            params.extend(estados)
+        
+        query = f'''
+            SELECT {', '.join(self.MANIFEST_COLUMNS)}
+            FROM manifesto_arquivos
+            {'WHERE ' + ' AND '.join(filtros) if filtros else ''}
+            ORDER BY atualizado_em, arquivo_hash
+        '''
+        
+        return query, params
+    
+    def _chunk_query(self, colunas, periodo, nome, placeholder):
+        """Monta a consulta de iter_contracheques
+        
+        Retorna (query, colunas, tipos, params); a query recebe como
+        parâmetros o último id lido, params e o tamanho do bloco.
+        """
+        colunas = list(colunas or self.COLUMN_TYPES)
+        
+        desconhecidas = [coluna for coluna in colunas if coluna not in self.COLUMN_TYPES]
+        if desconhecidas:
+            raise ValueError(f"Colunas desconhecidas: {', '.join(desconhecidas)}")
+        
+        # O id é sempre lido, pois é a chave da paginação
+        selecionadas = colunas if 'id' in colunas else ['id'] + colunas
+        tipos = {coluna: self.COLUMN_TYPES[coluna] for coluna in colunas}
+        
+        filtros = [f"id > {placeholder}"]
+        params = []
+        if periodo:
+            filtros.append(f"periodo = {placeholder}")
+            params.append(periodo)
+        if nome:
+            filtros.append(f"nome LIKE {placeholder}")
+            params.append(f"%{nome}%")
+        
+        query = f'''
+            SELECT {', '.join(selecionadas)}
+            FROM contracheques
+            WHERE {' AND '.join(filtros)}
+            ORDER BY id
+            LIMIT {placeholder}
+        '''
+        
+        return query, colunas, tipos, params
+    
+    @staticmethod
+    def _write_log_archive(batches):
+        """Grava lotes de logs (id, tipo, mensagem, detalhes, timestamp) num arquivo compactado
+        
+        Retorna o número de logs arquivados; sem logs, nenhum arquivo fica no disco.
+        """
+        os.makedirs(LOG_CONFIG["archive_folder"], exist_ok=True)
+        arquivo = os.path.join(
+            LOG_CONFIG["archive_folder"],
+            f"logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl.gz"
+        )
+        
+        arquivados = 0
+        with gzip.open(arquivo, "wt", encoding="utf-8") as f:
+            for rows in batches:
+                for row in rows:
+                    f.write(json.dumps(dict(zip(['id', 'tipo', 'mensagem', 'detalhes', 'timestamp'], row)),
+                                       ensure_ascii=False, default=str) + "\n")
+                arquivados += len(rows)
+        
+        if not arquivados:
+            os.remove(arquivo)
+        
+        return arquivados
+    
+    # Operações construídas sobre iter_contracheques
+    
+    def get_salary_statistics(self, chunk_size=None):
+        """Estatísticas do salário líquido e da confiança do OCR, lidas em blocos
+        
+        Soma, mínimo e máximo são acumulados por bloco; para os quartis só a
+        coluna do salário (float64) é mantida em memória.
+        """
+        import numpy as np
+        
+        salarios = []
+        confianca_min = None
+        
+        for df in self.iter_contracheques(chunk_size, ['salario_liquido', 'confianca_ocr']):
+            valores = df['salario_liquido'].dropna().to_numpy()
+            if len(valores):
+                salarios.append(valores)
+            
+            confianca = df['confianca_ocr'].min()
+            if confianca == confianca and (confianca_min is None or confianca < confianca_min):
+                confianca_min = float(confianca)
+        
+        if not salarios:
+            return None
+        
+        valores = np.concatenate(salarios)
+        q1, mediana, q3 = np.percentile(valores, [25, 50, 75])
+        
+        return {
+            "quantidade": len(valores),
+            "media": float(valores.mean()),
+            "desvio": float(valores.std(ddof=1)) if len(valores) > 1 else 0.0,
+            "minimo": float(valores.min()),
+            "q1": float(q1),
+            "mediana": float(mediana),
+            "q3": float(q3),
+            "maximo": float(valores.max()),
+            "confianca_min": confianca_min
+        }
+    
+    def get_salary_distribution(self, minimo, maximo, bins, chunk_size=None):
+        """Histograma do salário líquido, geral e por empresa, acumulado em blocos
+        
+        Com os limites de get_salary_statistics, cada bloco só soma contagens
+        em faixas fixas: a memória depende das faixas e das empresas, não do
+        número de contracheques. Retorna dict com 'faixas' (bordas),
+        'contagens' (geral), 'empresas' (empresa -> contagens) e 'somas'
+        (empresa -> soma dos líquidos).
+        """
+        import numpy as np
+        
+        if maximo <= minimo:
+            minimo, maximo = minimo - 0.5, maximo + 0.5
+        faixas = np.linspace(minimo, maximo, bins + 1)
+        
+        contagens = np.zeros(bins, dtype=np.int64)
+        empresas = {}
+        somas = {}
+        
+        for df in self.iter_contracheques(chunk_size, ['salario_liquido', 'empresa']):
+            df = df.dropna(subset=['salario_liquido'])
+            contagens += np.histogram(df['salario_liquido'].to_numpy(), bins=faixas)[0]
+            
+            for empresa, valores in df.dropna(subset=['empresa']).groupby('empresa')['salario_liquido']:
+                if empresa not in empresas:
+                    empresas[empresa] = np.zeros(bins, dtype=np.int64)
+                    somas[empresa] = 0.0
+                empresas[empresa] += np.histogram(valores.to_numpy(), bins=faixas)[0]
+                somas[empresa] += float(valores.sum())
+        
+        return {"faixas": faixas, "contagens": contagens, "empresas": empresas, "somas": somas}
+    
+    def export_to_excel(self, filepath, periodo=None, chunk_size=None):
+        """Exporta dados para Excel
+        
+        Os contracheques são lidos em blocos e gravados com a planilha em modo
+        somente escrita do openpyxl, sem montar o resultado inteiro em memória.
+        """
+        from openpyxl import Workbook
+        
+        colunas = list(self.COLUMN_TYPES)
+        workbook = None
+        registros = 0
+        
+        for df in self.iter_contracheques(chunk_size, colunas, periodo=periodo):
+            if workbook is None:
+                workbook = Workbook(write_only=True)
+                sheet = workbook.create_sheet()
+                sheet.append(colunas)
+            
+            # Formatar valores monetários
+            for col in self.MONEY_COLUMNS:
+                df[col] = df[col].map(lambda x: f"R$ {x:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+                                      if x == x else "R$ 0,00")
+            
+            for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+                sheet.append(row)
+            
+            registros += len(df)
+        
+        if workbook is None:
+            return False
+        
+        workbook.save(filepath)
+        
+        # Log da exportação
+        self.log_action("export", f"Dados exportados para {filepath}",
+                      {"registros": registros, "periodo": periodo})
+        
+        return True
+
+def create_database(db_path=None):
+    """Cria o banco configurado em STORAGE_CONFIG["backend"]
+    
+    'sqlite' (padrão) usa o arquivo db_path ou APP_CONFIG["database_file"];
+    'postgresql' usa STORAGE_CONFIG["postgres_dsn"] com conexões em pool.
+    """
+    backend = STORAGE_CONFIG["backend"]
+    
+    if backend == "sqlite":
+        from .database import Database
+        return Database(db_path or APP_CONFIG["database_file"])
+    
+    if backend == "postgresql":
+        from .postgres_database import PostgresDatabase
+        return PostgresDatabase(STORAGE_CONFIG["postgres_dsn"])
+    
+    raise ValueError(f"Backend de armazenamento desconhecido: {backend}")
@@ -0,0 +1,159 @@
+from config import TEMPLATE_CONFIG
+from .data_extractor import DataExtractor
+
+class TemplateRegistry:
+    """Registro de templates de regiões de campos por empresa
+    
+    Os templates são aprendidos a partir das caixas de palavras dos primeiros
+    documentos bem-sucedidos de cada empresa e ficam ativos após
+    TEMPLATE_CONFIG["min_documents"] documentos. Sem banco (nos processos
+    de OCR isolados), o registro só consulta os templates recebidos.
+    """
+    
+    # Campos de texto com tamanho variável: região vai até a margem direita
+    VARIABLE_WIDTH_FIELDS = ['nome', 'empresa', 'cargo']
+    
+    def __init__(self, database=None, templates=None):
+        self.database = database
+        self.data_extractor = DataExtractor()
+        self.templates = database.get_templates() if templates is None else templates
+    
+    def reload(self):
+        """Relê os templates do banco (aprendidos por outros processos)"""
+        self.templates = self.database.get_templates()
+    
+    @staticmethod
+    def normalize_key(empresa):
+        """Normaliza o nome da empresa para uso como chave"""
+        if not empresa:
+            return ""
+        return ' '.join(str(empresa).upper().split())
+    
+    def has_templates(self):
+        """Indica se há algum template ativo"""
+        return TEMPLATE_CONFIG["enabled"] and any(self._is_active(t) for t in self.templates.values())
+    
+    def get(self, empresa):
+        """Retorna o template ativo da empresa, se houver"""
+        template = self.templates.get(self.normalize_key(empresa))
+        if template and self._is_active(template):
+            return template
+        return None
+    
+    def match(self, header_text):
+        """Retorna o template ativo cuja empresa aparece no texto do cabeçalho"""
+        header = self.normalize_key(header_text)
+        if not header:
+            return None
+        
+        # Chaves mais longas primeiro, para não confundir empresas com prefixo comum
+        for key in sorted(self.templates, key=len, reverse=True):
+            template = self.templates[key]
+            if self._is_active(template) and key in header:
+                return template
+        
+        return None
+    
+    def _is_active(self, template):
+        return template["documentos"] >= TEMPLATE_CONFIG["min_documents"]
+    
+    def learn(self, extracted_data, ocr_result):
+        """Aprende/atualiza o template da empresa a partir de um documento
+        
+        Só usa documentos de uma página processados na página inteira.
+        Retorna True se o template foi atualizado.
+        """
+        if not TEMPLATE_CONFIG["enabled"] or ocr_result.get('template') or ocr_result.get('pages') != 1:
+            return False
+        
+        regions, empresa_line = self._detect_regions(extracted_data, ocr_result.get('words', []))
+        
+        # A chave vem só da linha da empresa: as regex podem se estender às linhas seguintes
+        key = self.normalize_key(self.data_extractor.extract_field(empresa_line, 'empresa')
+                                 or extracted_data.get('empresa'))
+        if not key:
+            return False
+        
+        # Sem todos os campos obrigatórios o template não serve para o OCR por regiões
+        if any(field not in regions for field in ['nome', 'salario_liquido']):
+            return False
+        
+        template = self.templates.get(key)
+        if template:
+            regions = self._merge_regions(template["regioes"], regions)
+            documentos = template["documentos"] + 1
+        else:
+            documentos = 1
+        
+        self.database.save_template(key, regions, documentos)
+        self.templates[key] = {"empresa": key, "regioes": regions, "documentos": documentos}
+        
+        return True
+    
+    def _detect_regions(self, extracted_data, words):
+        """Localiza a região (x, y, w, h relativos) de cada campo na página
+        
+        Retorna também o texto da linha onde a empresa foi encontrada.
+        """
+        words = [w for w in words if w.get('pagina', 0) == 0]
+        if not words:
+            return {}, ""
+        
+        # Posição de cada palavra no texto da página (palavras unidas por espaço)
+        offsets = []
+        position = 0
+        for word in words:
+            offsets.append((position, position + len(word['texto'])))
+            position += len(word['texto']) + 1
+        text = ' '.join(word['texto'] for word in words)
+        
+        margin = TEMPLATE_CONFIG["margin"]
+        regions = {}
+        empresa_line = ""
+        
+        for field in TEMPLATE_CONFIG["fields"]:
+            if not extracted_data.get(field):
+                continue
+            
+            span = self.data_extractor.locate_field(text, field)
+            if not span:
+                continue
+            
+            matched = [w for w, (start, end) in zip(words, offsets)
+                       if start < span[1] and end > span[0]]
+            if not matched:
+                continue
+            
+            x0 = max(0.0, min(w['x'] for w in matched) - margin)
+            y0 = max(0.0, min(w['y'] for w in matched) - margin)
+            x1 = min(1.0, max(w['x'] + w['w'] for w in matched) + margin)
+            y1 = min(1.0, max(w['y'] + w['h'] for w in matched) + margin)
+            
+            if field in self.VARIABLE_WIDTH_FIELDS:
+                x1 = 1.0
+            
+            regions[field] = [x0, y0, x1 - x0, y1 - y0]
+            
+            if field == 'empresa':
+                first = matched[0]
+                center = first['y'] + first['h'] / 2
+                empresa_line = ' '.join(w['texto'] for w in matched
+                                        if w['y'] <= center <= w['y'] + w['h'])
+        
+        return regions, empresa_line
+    
+    def _merge_regions(self, old_regions, new_regions):
+        """Une as regiões de documentos diferentes (caixa envolvente)"""
+        merged = dict(old_regions)
+        
+        for field, (x, y, w, h) in new_regions.items():
+            if field not in merged:
+                merged[field] = [x, y, w, h]
+                continue
+            
+            ox, oy, ow, oh = merged[field]
+            x0, y0 = min(x, ox), min(y, oy)
+            x1, y1 = max(x + w, ox + ow), max(y + h, oy + oh)
+            merged[field] = [x0, y0, x1 - x0, y1 - y0]
+        
+        return merged